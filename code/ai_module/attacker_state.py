@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Per-attacker state for adaptive decision selection, keyed by src_ip
+
+An OrderedDict used as an LRU gives O(1) lookup and update. Entries idle for longer than
+FYP_ATTACKER_TTL are dropped from the cold end, and the least recently seen IP is evicted
+once FYP_ATTACKER_MAX are tracked, so memory stays bounded however many scanners show up.
+Each entry keeps counters, a decaying event rate ("heat") and hashes of the last few
+decoys served. The store is snapshotted to FYP_ATTACKER_SNAPSHOT (JSON) periodically and
+at exit, so restarts and subprocess-mode engines keep what each attacker has already seen.
+"""
+
+import os
+import json
+import time
+import zlib
+import atexit
+import threading
+import collections
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+ATTACKER_MAX = int(os.environ.get("FYP_ATTACKER_MAX", "100000"))
+ATTACKER_TTL = float(os.environ.get("FYP_ATTACKER_TTL", str(6 * 3600)))
+# empty disables snapshots
+ATTACKER_SNAPSHOT = os.environ.get("FYP_ATTACKER_SNAPSHOT", os.path.join(PROJECT_ROOT, "data", "attacker_state.json"))
+ATTACKER_SNAPSHOT_INTERVAL = float(os.environ.get("FYP_ATTACKER_SNAPSHOT_INTERVAL", "60"))
+# heat halves after this many seconds without events; levels start at these heat values
+HEAT_HALF_LIFE = float(os.environ.get("FYP_ATTACKER_HEAT_HALF_LIFE", "60"))
+ESCALATION_LEVELS = (5.0, 20.0)
+SERVED_KEEP = 16  # decoy choices remembered per attacker
+EVENT_KINDS_KEEP = 8  # distinct eventids counted per attacker; the rest go to "other"
+SAVE_CHUNK = 1000  # entries copied per lock hold while snapshotting
+
+def served_key(kind, value):
+    """Compact hash of a served choice ("prompt", "template", "lure", ...)."""
+    return zlib.crc32(f"{kind}:{value}".encode("utf-8", errors="replace"))
+
+class AttackerState:
+    __slots__ = ("events", "by_event", "first_seen", "last_seen", "heat", "served")
+
+    def __init__(self, now):
+        self.events = 0
+        self.by_event = {}
+        self.first_seen = now
+        self.last_seen = now
+        self.heat = 0.0
+        self.served = collections.deque(maxlen=SERVED_KEEP)
+
+    def touch(self, eventid, now, count=1, half_life=HEAT_HALF_LIFE):
+        self.heat = self.heat * 0.5 ** (max(0.0, now - self.last_seen) / half_life) + count
+        self.last_seen = now
+        self.events += count
+        key = eventid if eventid in self.by_event or len(self.by_event) < EVENT_KINDS_KEEP else "other"
+        self.by_event[key] = self.by_event.get(key, 0) + count
+
+    def level(self):
+        return sum(1 for t in ESCALATION_LEVELS if self.heat >= t)
+
+    def view(self, eventid):
+        """Immutable summary used by the decision path outside the store lock."""
+        return {
+            "events": self.events,
+            "same_event": self.by_event.get(eventid, self.by_event.get("other", 0)),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "heat": round(self.heat, 2),
+            "level": self.level(),
+        }, frozenset(self.served)
+
+    def copy(self):
+        st = AttackerState(self.first_seen)
+        st.events = self.events
+        st.by_event = dict(self.by_event)
+        st.last_seen = self.last_seen
+        st.heat = self.heat
+        st.served.extend(self.served)
+        return st
+
+    def to_dict(self):
+        return {"events": self.events, "by_event": self.by_event, "first_seen": self.first_seen,
+                "last_seen": self.last_seen, "heat": self.heat, "served": list(self.served)}
+
+    @classmethod
+    def from_dict(cls, d):
+        st = cls(d["first_seen"])
+        st.events = d.get("events", 0)
+        st.by_event = dict(d.get("by_event") or {})
+        st.last_seen = d.get("last_seen", st.first_seen)
+        st.heat = d.get("heat", 0.0)
+        st.served.extend(d.get("served") or [])
+        return st
+
+class AttackerStore:
+    def __init__(self, max_entries=ATTACKER_MAX, ttl=ATTACKER_TTL, snapshot_path=ATTACKER_SNAPSHOT,
+                 snapshot_interval=ATTACKER_SNAPSHOT_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.stats = collections.Counter()
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._saving = threading.Lock()
+        self._last_save = time.time()
+        self.load()
+
+    def _expire(self, now):
+        while self._data:
+            ip, st = next(iter(self._data.items()))
+            if now - st.last_seen <= self.ttl:
+                break
+            del self._data[ip]
+            self.stats["expired"] += 1
+
+    def observe(self, src_ip, eventid, now=None, count=1):
+        """Count `count` events and return (summary, served hashes) for the attacker after them."""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._expire(now)
+            st = self._data.get(src_ip)
+            if st is None:
+                st = self._data[src_ip] = AttackerState(now)
+                if len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+                    self.stats["evicted"] += 1
+            else:
+                self._data.move_to_end(src_ip)
+            st.touch(eventid, now, count)
+            out = st.view(eventid)
+        self.maybe_save(now)
+        return out
+
+    def mark_served(self, src_ip, choices):
+        """Remember (kind, value) choices served to `src_ip`."""
+        with self._lock:
+            st = self._data.get(src_ip)
+            if st is not None:
+                st.served.extend(served_key(k, v) for k, v in choices)
+
+    def get(self, src_ip):
+        with self._lock:
+            st = self._data.get(src_ip)
+            return st.to_dict() if st is not None else None
+
+    def __len__(self):
+        return len(self._data)
+
+    def load(self):
+        if not self.snapshot_path:
+            return
+        try:
+            with open(self.snapshot_path, "r") as fh:
+                doc = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            # saved least recently seen first, so insertion order rebuilds the LRU order
+            for ip, d in doc.get("attackers", []):
+                try:
+                    st = AttackerState.from_dict(d)
+                except (KeyError, TypeError):
+                    continue
+                if now - st.last_seen <= self.ttl:
+                    self._data[ip] = st
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        self.stats["loaded"] = len(self._data)
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+        with self._saving:
+            entries = self._copy_entries()
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as fh:
+                # one entry per encode call: the C encoder keeps the GIL for a whole document
+                fh.write(f'{{"saved": {time.time()!r}, "attackers": [')
+                for i, (ip, st) in enumerate(entries):
+                    fh.write(("," if i else "") + json.dumps([ip, st.to_dict()]))
+                fh.write("]}")
+            os.replace(tmp, self.snapshot_path)
+            self.stats["snapshots"] += 1
+
+    def _copy_entries(self, chunk=SAVE_CHUNK):
+        """Copies of the entries, least recently seen first, taking the lock for one chunk at a
+        time so observe() never waits for the whole store."""
+        with self._lock:
+            ips = list(self._data)
+        out = []
+        for i in range(0, len(ips), chunk):
+            with self._lock:
+                for ip in ips[i:i + chunk]:
+                    st = self._data.get(ip)
+                    if st is not None:
+                        out.append((ip, st.copy()))
+        return out
+
+    def maybe_save(self, now):
+        if not self.snapshot_path or now - self._last_save < self.snapshot_interval:
+            return
+        self._last_save = now
+        threading.Thread(target=self._save_quietly, name="attacker-snapshot", daemon=True).start()
+
+    def _save_quietly(self):
+        try:
+            self.save()
+        except Exception as e:
+            print("Error saving attacker state:", e)
+
+    def snapshot(self):
+        return {
+            "tracked": len(self._data),
+            "max": self.max_entries,
+            "ttl": self.ttl,
+            "evicted": self.stats["evicted"],
+            "expired": self.stats["expired"],
+            "snapshots": self.stats["snapshots"],
+            "snapshot_path": self.snapshot_path or None,
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AttackerStore()
+            atexit.register(_store._save_quietly)
+    return _store
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pre-generated decoy pool for local_generate / api_generate
+
+Lure content that does not depend on the attacker is built ahead of time and kept in one
+deque per key. Keys are prompt sets ("auth.failed", "session.connect", "port.scan",
+"default" and "escalated" auth), so each category has its own pool. In API mode
+this part includes the LLM round trip. The decision path takes a ready artifact in O(1)
+and only personalises it (IP, gen_id, timestamp).
+
+A background thread keeps every key between FYP_DECOY_POOL_LOW and FYP_DECOY_POOL_HIGH.
+A take that leaves a key below the low watermark wakes the thread. An empty pool is a
+miss, and the caller builds the artifact synchronously. Artifacts older than
+FYP_DECOY_POOL_MAX_AGE are dropped rather than served.
+"""
+
+import os
+import time
+import threading
+import collections
+
+from common import profiling
+
+DECOY_POOL = os.environ.get("FYP_DECOY_POOL", "1").lower() not in ("", "0", "false", "no", "off")
+DECOY_POOL_LOW = int(os.environ.get("FYP_DECOY_POOL_LOW", "4"))
+DECOY_POOL_HIGH = int(os.environ.get("FYP_DECOY_POOL_HIGH", "16"))
+DECOY_POOL_MAX_AGE = float(os.environ.get("FYP_DECOY_POOL_MAX_AGE", "600"))
+TAKE_SCAN = 4  # artifacts looked at from the head for one the attacker has not been served
+
+Decoy = collections.namedtuple("Decoy", "key prompt lure_hint contact llm_text created")
+
+class DecoyPool:
+    def __init__(self, factory, keys=(), low=DECOY_POOL_LOW, high=DECOY_POOL_HIGH, max_age=DECOY_POOL_MAX_AGE):
+        self.factory = factory
+        self.low = max(1, low)
+        self.high = max(self.low + 1, high)
+        self.max_age = max_age
+        self.stats = collections.Counter()
+        self.refill_ms = profiling.Histogram()
+        self._pools = {key: collections.deque() for key in keys}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._refill_loop, name="decoy-pool", daemon=True)
+        self._thread.start()
+
+    def take(self, key, accept=None):
+        """A pooled artifact for `key` that `accept` approves; None on a miss."""
+        now = time.monotonic()
+        with self._cond:
+            pool = self._pools.get(key)
+            if pool is None:
+                # unusual combination; pool it from now on
+                pool = self._pools[key] = collections.deque()
+            while pool and now - pool[0].created > self.max_age:
+                pool.popleft()
+                self.stats["expired"] += 1
+            item = None
+            if pool:
+                index = 0
+                if accept is not None:
+                    # nothing acceptable near the head is a miss, not a repeat
+                    index = next((i for i in range(min(TAKE_SCAN, len(pool))) if accept(pool[i])), None)
+                if index is not None:
+                    item = pool[index]
+                    del pool[index]
+            self.stats["hits" if item is not None else "misses"] += 1
+            if len(pool) < self.low:
+                self._cond.notify()
+        return item
+
+    def _wanted(self):
+        return [key for key, pool in self._pools.items() if len(pool) < self.high]
+
+    def _refill_loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not any(len(p) < self.low for p in self._pools.values()):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                wanted = self._wanted()
+            # top every short key up to the high watermark, one artifact per key per round
+            while wanted and not self._stopped:
+                for key in wanted:
+                    t0 = time.perf_counter()
+                    try:
+                        item = self.factory(key)
+                    except Exception as e:
+                        self.stats["refill_errors"] += 1
+                        print("Error pre-generating decoy:", e)
+                        time.sleep(1.0)
+                        continue
+                    ms = (time.perf_counter() - t0) * 1000.0
+                    with self._cond:
+                        self._pools[key].append(item)
+                        self.refill_ms.add(ms)
+                        self.stats["refilled"] += 1
+                with self._cond:
+                    wanted = self._wanted()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            hits, misses = self.stats["hits"], self.stats["misses"]
+            return {
+                "low": self.low,
+                "high": self.high,
+                "max_age": self.max_age,
+                "depth": {key: len(p) for key, p in self._pools.items()},
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+                "refilled": self.stats["refilled"],
+                "refill_errors": self.stats["refill_errors"],
+                "expired": self.stats["expired"],
+                "refill_ms": {k: v for k, v in self.refill_ms.snapshot().items() if k != "buckets"},
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(factory, keys=()):
+    """The process-wide pool; `factory` and `keys` are only used by the first call."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DecoyPool(factory, keys)
+    return _pool
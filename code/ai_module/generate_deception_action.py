@@ -14,6 +14,13 @@ import string
 import sys
 import secrets
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import appender, codec, decoystore, indexwriter, profiling, tracing
+import template_registry
+import attacker_state
+import redaction
+import decoy_pool
+
 BASE_DIR = os.path.expanduser("~/FYP-Project/code/ai_module")
 INPUT = os.path.join(BASE_DIR, "inputs", "incoming_event.json")
 OUTPUT_LOG = os.path.join(BASE_DIR, "outputs", "deception_responses.log")
@@ -29,6 +36,12 @@ os.makedirs(os.path.join(BASE_DIR, "outputs"), exist_ok=True)
 os.makedirs(os.path.join(BASE_DIR, "logs"), exist_ok=True)
 
 AI_MODE = os.environ.get("FYP_AI_MODE", "local")
+# deception_responses.log format: "pretty" (indent=2), "compact" (one line per decision) or "off"
+OUTPUT_LOG_FORMAT = os.environ.get("FYP_OUTPUT_LOG_FORMAT", "pretty")
+# print each decision; on for command-line runs, off in the webhook and pipeline
+DECISION_STDOUT = os.environ.get("FYP_DECISION_STDOUT", "0").lower() not in ("", "0", "false", "no", "off")
+# take lure content from the pre-generated pool; main() turns it off for one-shot runs
+USE_DECOY_POOL = decoy_pool.DECOY_POOL
 
 PROMPTS = {
     "auth.failed": [
@@ -51,6 +64,27 @@ PROMPTS = {
     ]
 }
 
+# used instead of PROMPTS["auth.failed"] once an attacker's failed-login burst escalates
+ESCALATED_AUTH_PROMPTS = [
+    "Write a helpdesk ticket granting a temporary break-glass account after repeated lockouts.",
+    "Create an ops handover note listing a service account exempt from lockout and where its token is kept.",
+    "Produce a change request re-enabling legacy VPN access for a locked-out administrator."
+]
+
+LURE_HINTS = [
+    "admin.conf.bak", "db_backup.old", "dev_notes.md",
+    "network_config.ini", "archived_users.csv", "ssh_known_hosts.tmp"
+]
+
+ESCALATED_LURE_HINTS = [
+    "breakglass_account.txt", "vpn_legacy_access.conf", "svc_backup_token.old", "prod_db_dump.sql.gz"
+]
+
+CONTACTS = ["it-admin@corp.local", "infra-team@corp.local", "sec-team@corp.local"]
+
+# decoy pool keys: one per prompt set
+DECOY_KEYS = list(PROMPTS) + ["escalated"]
+
 def now_iso_ts():
     return datetime.datetime.now(datetime.timezone.utc).isoformat()
 
@@ -60,16 +94,14 @@ def now_readable_ts():
 def safe_response(text):
     if text is None:
         return ""
-    banned = ["password", "ssh-rsa", "-----BEGIN", "secretkey", "PRIVATE", "PRIVATE KEY"]
-    s = str(text)
-    for b in banned:
-        if b.lower() in s.lower():
-            return "[REDACTED: sensitive content]"
-    return s
-
-def read_event():
+    return redaction.get_redactor().redact(str(text))
+
+def read_event(path=None):
+    path = path or INPUT
     try:
-        with open(INPUT, "r", encoding="utf-8") as fh:
+        if path == "-":
+            return json.load(sys.stdin)
+        with open(path, "r", encoding="utf-8") as fh:
             return json.load(fh)
     except Exception:
         return None
@@ -81,75 +113,117 @@ def random_token(n=8):
 def make_event_id():
     return "evt-" + ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
 
-def random_template(eventid):
-    tpl_dir = os.path.expanduser("~/FYP-Project/config/templates")
-    try:
-        files = [f for f in os.listdir(tpl_dir) if f.endswith(".tpl")]
-        if files:
-            chosen = random.choice(files)
-            tpl_path = os.path.join(tpl_dir, chosen)
-            try:
-                with open(tpl_path, "r", encoding="utf-8") as fh:
-                    content = fh.read()
-            except Exception:
-                content = ""
-            return chosen, content
-    except Exception:
-        pass
+def choose_unseen(options, served, kind, key=str):
+    """Random option not yet served to this attacker, or any option once all have been."""
+    fresh = [o for o in options if attacker_state.served_key(kind, key(o)) not in served]
+    return random.choice(fresh or options)
+
+def random_template(eventid, served=frozenset()):
+    tpl = template_registry.get_registry().pick(
+        eventid, lambda c: choose_unseen(c, served, "template", key=lambda t: t.name))
+    if tpl is not None:
+        return tpl.name, tpl.content
     fallback_text = PROMPTS.get(eventid, PROMPTS["default"])[0]
     return "builtin", fallback_text
 
-def local_generate(event):
+def prompt_set(evt, incoming_eventid):
+    if incoming_eventid in PROMPTS:
+        return incoming_eventid
+    etype = (evt.get("event") or evt.get("type") or "").lower()
+    if "auth" in etype or "login" in etype or "failed" in etype:
+        return "auth.failed"
+    if "session" in etype or "connect" in etype:
+        return "session.connect"
+    if "scan" in etype or "port" in etype:
+        return "port.scan"
+    return "default"
+
+def build_decoy(key, served=frozenset(), with_llm=False):
+    """Attacker-independent lure content for a prompt set; local_generate personalises it."""
+    escalated = key == "escalated"
+    prompt_choice = choose_unseen(ESCALATED_AUTH_PROMPTS if escalated else PROMPTS.get(key, PROMPTS["default"]),
+                                  served, "prompt")
+    lure_hint = choose_unseen(ESCALATED_LURE_HINTS if escalated else LURE_HINTS, served, "lure")
+    llm_text = None
+    if with_llm:
+        # errors propagate: the pool counts them and backs off
+        import llm_backend
+        stub = {"eventid": "auth.failed" if escalated else key} if key != "default" else {}
+        llm_text, _ = llm_backend.get_backend().generate(stub, prompt_choice)
+    return decoy_pool.Decoy(key, prompt_choice, lure_hint, random.choice(CONTACTS), llm_text, time.monotonic())
+
+def take_decoy(key, served):
+    """(decoy, "hit" | "miss" | None), from the pool when it is enabled."""
+    if not USE_DECOY_POOL:
+        return build_decoy(key, served), None
+    pool = decoy_pool.get_pool(lambda k: build_decoy(k, with_llm=AI_MODE != "local"), DECOY_KEYS)
+    accept = None
+    if served:
+        accept = lambda d: (attacker_state.served_key("prompt", d.prompt) not in served
+                            and attacker_state.served_key("lure", d.lure_hint) not in served)
+    decoy = pool.take(key, accept)
+    if decoy is None:
+        return build_decoy(key, served), "miss"
+    return decoy, "hit"
+
+# used when no timer is passed in; never records anything
+NO_TIMER = profiling.StageTimer(enabled=False)
+
+def local_generate(event, timer=NO_TIMER, now=None):
+    """`now` (epoch seconds) replaces the wall clock for attacker state, as in a replay."""
     evt = event or {}
     incoming_eventid = evt.get("eventid") or evt.get("event_id") or make_event_id()
-    tpl_name, tpl_content = random_template(incoming_eventid)
+    src_ip = evt.get("src_ip")
+    if src_ip:
+        # a coalesced event stands for a whole burst of identical events
+        count = (evt.get("coalesced") or {}).get("count", 1)
+        attacker, served = attacker_state.get_store().observe(str(src_ip), incoming_eventid, now=now, count=count)
+    else:
+        attacker, served = None, frozenset()
+    timer.lap("attacker_state")
+    is_auth = "auth" in (evt.get("eventid","") or "").lower() or "login" in (evt.get("event","") or "").lower()
+    level = attacker["level"] if attacker else 0
+    escalated = is_auth and level > 0
+    tpl_name, tpl_content = random_template(incoming_eventid, served)
+    timer.lap("template")
     nonce = random_token(6)
     gen_id = hashlib.md5((str(evt.get("src_ip", "")) + nonce + str(time.time())).encode()).hexdigest()[:8]
 
     tsstamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     safe_ip = str(evt.get("src_ip", "unknown")).replace(":", "-").replace("/", "-")
     base_name = f"create_decoy_file_{safe_ip}_{tsstamp}_{gen_id}.txt"
-    file_path = os.path.join(AI_GEN_DIR, base_name)
-
-    chosen_prompts = PROMPTS.get(incoming_eventid)
-    if not chosen_prompts:
-        etype = (evt.get("event") or evt.get("type") or "").lower()
-        if "auth" in etype or "login" in etype or "failed" in etype:
-            chosen_prompts = PROMPTS["auth.failed"]
-        elif "session" in etype or "connect" in etype:
-            chosen_prompts = PROMPTS["session.connect"]
-        elif "scan" in etype or "port" in etype:
-            chosen_prompts = PROMPTS["port.scan"]
-        else:
-            chosen_prompts = PROMPTS["default"]
-
-    prompt_choice = random.choice(chosen_prompts)
+    # where the executor will store this decoy (sharded per attacker)
+    file_path = decoystore.get_store().decoy_path(safe_ip, base_name)
+
+    decoy, pooled = take_decoy("escalated" if escalated else prompt_set(evt, incoming_eventid), served)
+    prompt_choice = decoy.prompt
+    lure_hint = decoy.lure_hint
 
     random_suffix = random.choice(["#", "//", "--", "!!"])
     variation_tag = f"{random_suffix}{random.randint(10,999)}"
-    confidence_score = round(random.uniform(0.72, 0.96), 2)
-    lure_hint = random.choice([
-        "admin.conf.bak", "db_backup.old", "dev_notes.md",
-        "network_config.ini", "archived_users.csv", "ssh_known_hosts.tmp"
-    ])
+    # a returning attacker that keeps engaging is worth a more confident, longer-lived lure
+    confidence_score = round(min(0.99, random.uniform(0.72, 0.96) + 0.02 * level), 2)
+    timer.lap("select")
 
     content_lines = []
     content_lines.append(f"// Generated (local stub) at {now_iso_ts()} {variation_tag}")
     content_lines.append(f"PROMPT: {prompt_choice}")
     content_lines.append("-- SAMPLE LURE CONTENT --")
 
-    if "auth" in (evt.get("eventid","") or "").lower() or "login" in (evt.get("event","") or "").lower():
+    if is_auth:
         content_lines.append(f"Temporary access token: TOK-{hashlib.sha1((safe_ip + gen_id).encode()).hexdigest()[:8]}")
         content_lines.append("Note: Rotate after use.")
-        contact = random.choice(["it-admin@corp.local", "infra-team@corp.local", "sec-team@corp.local"])
-        content_lines.append(f"Contact: {contact}")
+        content_lines.append(f"Contact: {decoy.contact}")
+        if escalated:
+            content_lines.append(f"Lockout exemption on file: /home/admin/{lure_hint}")
     else:
         content_lines.append(f"Readme hint: /home/admin/{lure_hint}")
         content_lines.append("Note: this is a simulated lure.")
         content_lines.append(f"Reference ID: {hashlib.sha1((str(time.time()) + gen_id).encode()).hexdigest()[:6]}")
 
     generated_text = "\n".join(content_lines)
-    engage_duration_min = round(random.uniform(1.0, 15.0), 2)
+    engage_duration_min = round(random.uniform(1.0, 15.0) * (1 + 0.5 * level), 2)
+    timer.lap("render")
 
     meta = {
         "gen_id": gen_id,
@@ -163,6 +237,13 @@ def local_generate(event):
         "mime": mimetypes.guess_type(base_name)[0] or "text/plain",
         "engage_duration_min": engage_duration_min
     }
+    if pooled:
+        meta["decoy_pool"] = pooled
+    if attacker:
+        meta["attacker"] = dict(attacker, escalated=escalated, repeat=attacker["events"] > 1)
+        attacker_state.get_store().mark_served(str(src_ip), [
+            ("prompt", prompt_choice), ("template", tpl_name), ("lure", lure_hint)])
+    timer.lap("meta")
 
     resp = {
         "text": generated_text,
@@ -173,41 +254,44 @@ def local_generate(event):
         "selected_action": "create_decoy_file",
         "incoming_eventid": incoming_eventid
     }
+    if decoy.llm_text is not None:
+        resp["llm_text"] = decoy.llm_text
     return resp
 
-def api_generate(event):
-    try:
-        import openai
-        openai.api_key = os.environ.get("OPENAI_API_KEY")
-        base_prompt = f"You are a cybersecurity deception assistant. Generate a harmless, believable internal artifact. Event: {event}"
-        ai_output = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Generate harmless deception artifacts. No secrets."},
-                {"role": "user", "content": base_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=200
-        )
-        text = ai_output["choices"][0]["message"]["content"]
-        resp = local_generate(event)
-        resp["text"] = safe_response(text)
-        resp["mode"] = "api"
-        resp["prompt"] = "genai-openai"
-        resp["confidence"] = 0.90
-        return resp
-    except Exception:
-        return local_generate(event)
+def api_generate(event, timer=NO_TIMER):
+    resp = local_generate(event, timer)
+    text = resp.pop("llm_text", None)
+    if text is not None:
+        # pre-generated with the pooled decoy; no round trip on the decision path
+        cache_state = "pool"
+    else:
+        try:
+            import llm_backend
+            text, cache_hit = llm_backend.get_backend().generate(event, resp["prompt"])
+        except Exception as e:
+            print("LLM backend unavailable, using local generation:", e)
+            timer.lap("llm")
+            return resp
+        cache_state = "hit" if cache_hit else "miss"
+    timer.lap("llm")
+    resp["text"] = safe_response(text)
+    resp["mode"] = "api"
+    resp["prompt"] = "genai-openai"
+    resp["confidence"] = 0.90
+    resp["meta"]["llm_cache"] = cache_state
+    return resp
 
-def write_decision(event, resp):
+def write_decision(event, resp, timer=NO_TIMER):
     incoming_eventid = event.get("eventid") or event.get("event_id") or resp.get("incoming_eventid") or make_event_id()
-    decision_id = "dec-" + secrets.token_hex(4)
+    decision_id = "dec-" + secrets.token_hex(8)
     readable_ts = now_readable_ts()
     meta = resp.get("meta", {})
     meta.setdefault("gen_id", hashlib.md5(str(time.time()).encode()).hexdigest()[:8])
     meta.setdefault("file_path", "")
     meta.setdefault("engage_duration_min", round(random.uniform(1.0, 15.0),2))
     meta.setdefault("template_file", "builtin")
+    response = safe_response(resp.get("text"))
+    timer.lap("redact")
 
     rec = {
         "timestamp": readable_ts,
@@ -216,42 +300,75 @@ def write_decision(event, resp):
         "decision_id": decision_id,
         "src_ip": event.get("src_ip"),
         "response_mode": resp.get("mode"),
-        "response": safe_response(resp.get("text")),
+        "response": response,
         "prompt": resp.get("prompt"),
         "selected_action": resp.get("selected_action") or "create_decoy_file",
         "confidence": resp.get("confidence", 0.85),
         "meta": meta
     }
+    if event.get("coalesced"):
+        rec["coalesced"] = event["coalesced"]
+    trace = resp.get("trace") or tracing.copy(event.get("trace"))
+    if trace:
+        rec["trace"] = tracing.mark(trace, "decided")
+    timer.lap("build")
+    if timer.enabled:
+        # stages up to here; the writes below only reach the /api/profile histograms
+        meta["timings_ms"] = timer.as_meta()
 
+    line = codec.encode_record(rec)
+    # one indented encoding serves both the pretty output log and stdout
+    pretty = codec.dumps_pretty(rec) if DECISION_STDOUT or OUTPUT_LOG_FORMAT == "pretty" else None
+    timer.lap("serialize")
     try:
-        with open(DECISIONS, "a", encoding="utf-8") as fh:
-            fh.write(json.dumps(rec) + "\n")
+        appender.append(DECISIONS, line)
     except Exception as e:
+        tracing.error("decision_write")
         print("Error writing decisions:", e)
+    timer.lap("write_decisions")
+    indexwriter.submit("decisions", [rec])
+    timer.lap("index")
 
-    try:
-        with open(OUTPUT_LOG, "a", encoding="utf-8") as fh:
-            fh.write(json.dumps(rec, indent=2) + "\n")
-    except Exception as e:
-        print("Error writing output log:", e)
+    if OUTPUT_LOG_FORMAT != "off":
+        try:
+            appender.append(OUTPUT_LOG, (pretty if OUTPUT_LOG_FORMAT == "pretty" else codec.dumps(rec)) + "\n")
+        except Exception as e:
+            tracing.error("output_log_write")
+            print("Error writing output log:", e)
+        timer.lap("output_log")
 
-    print("AI Decision logged:")
-    print(json.dumps(rec, indent=2))
+    if DECISION_STDOUT:
+        print("AI Decision logged:")
+        print(pretty)
+        timer.lap("stdout")
+    profiling.finish(timer)
     return rec
 
-def main():
-    ev = read_event()
-    if not ev:
-        print("No event found; exiting.")
-        return
+def decide(ev):
+    timer = profiling.StageTimer()
+    trace = tracing.mark(tracing.copy(ev.get("trace")), "decide")
     if AI_MODE == "local":
-        resp = local_generate(ev)
+        resp = local_generate(ev, timer)
     else:
-        resp = api_generate(ev)
+        resp = api_generate(ev, timer)
+    if trace:
+        resp["trace"] = trace
     resp_meta = resp.get("meta", {})
     resp_meta.setdefault("selected_action", resp.get("selected_action", "create_decoy_file"))
     resp["meta"] = resp_meta
-    write_decision(ev, resp)
+    return write_decision(ev, resp, timer)
+
+def main():
+    global USE_DECOY_POOL, DECISION_STDOUT
+    # a one-shot run would exit before a background refill paid off
+    USE_DECOY_POOL = False
+    DECISION_STDOUT = True
+    # optional argv[1]: event file path, or "-" to read the event from stdin
+    ev = read_event(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not ev:
+        print("No event found; exiting.")
+        return
+    decide(ev)
 
 if __name__ == "__main__":
     main()
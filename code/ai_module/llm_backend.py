@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Async LLM backend for api_generate: persistent keep-alive connection pool, bounded concurrency,
+per-request timeouts, a circuit breaker and a TTL/LRU response cache keyed on the normalised event.
+
+Speaks the OpenAI-compatible /chat/completions API, so FYP_LLM_BASE_URL can point at a local stub.
+"""
+
+import os
+import ssl
+import json
+import time
+import queue
+import asyncio
+import threading
+import collections
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+LLM_BASE_URL = os.environ.get("FYP_LLM_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.environ.get("FYP_LLM_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT = float(os.environ.get("FYP_LLM_TIMEOUT", "10"))
+LLM_CONCURRENCY = int(os.environ.get("FYP_LLM_CONCURRENCY", "8"))
+LLM_POOL_SIZE = int(os.environ.get("FYP_LLM_POOL_SIZE", "8"))
+LLM_CACHE_SIZE = int(os.environ.get("FYP_LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.environ.get("FYP_LLM_CACHE_TTL", "600"))
+LLM_BREAKER_FAILURES = int(os.environ.get("FYP_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.environ.get("FYP_LLM_BREAKER_RESET", "30"))
+
+SYSTEM_PROMPT = "Generate harmless deception artifacts. No secrets."
+
+class LLMError(Exception):
+    pass
+
+class CircuitOpenError(LLMError):
+    pass
+
+class TTLCache:
+    def __init__(self, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive errors; one half-open probe after `reset_timeout`."""
+
+    def __init__(self, failures=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive = 0
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half_open" or self.consecutive >= self.failures:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class ConnectionPool:
+    """Keep-alive http.client connections to one host, reused across requests."""
+
+    def __init__(self, base_url, size=LLM_POOL_SIZE, timeout=LLM_TIMEOUT):
+        u = urllib.parse.urlsplit(base_url)
+        self.scheme = u.scheme
+        self.host = u.hostname
+        self.port = u.port
+        self.prefix = u.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._ssl = ssl.create_default_context() if u.scheme == "https" else None
+
+    def _new(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body, headers):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._new()
+        try:
+            conn.request(method, self.prefix + path, body=body, headers=headers)
+            r = conn.getresponse()
+            data = r.read()
+        except Exception:
+            conn.close()
+            raise
+        if r.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+        return r.status, data
+
+def normalise_event(event, prompt_choice):
+    evt = event or {}
+    etype = (evt.get("event") or evt.get("type") or "").lower()
+    return (str(evt.get("eventid") or evt.get("event_id") or ""), etype, prompt_choice)
+
+class LLMBackend:
+    def __init__(self, base_url=LLM_BASE_URL, model=LLM_MODEL, api_key=None, timeout=LLM_TIMEOUT,
+                 concurrency=LLM_CONCURRENCY, pool_size=LLM_POOL_SIZE, cache=None, breaker=None):
+        self.model = model
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+        self.timeout = timeout
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self.cache = cache or TTLCache()
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = collections.Counter()
+        self._io = ThreadPoolExecutor(max_workers=max(1, pool_size), thread_name_prefix="llm-io")
+        self._loop = asyncio.new_event_loop()
+        self._inflight = {}
+        threading.Thread(target=self._loop.run_forever, name="llm-loop", daemon=True).start()
+        self._sem = asyncio.run_coroutine_threadsafe(self._make_semaphore(concurrency), self._loop).result()
+
+    async def _make_semaphore(self, n):
+        return asyncio.Semaphore(max(1, n))
+
+    def _post(self, payload):
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        status, data = self.pool.request("POST", "/chat/completions", json.dumps(payload), headers)
+        if status != 200:
+            raise LLMError(f"HTTP {status}: {data[:200]!r}")
+        return json.loads(data)["choices"][0]["message"]["content"]
+
+    async def _call(self, key):
+        eventid, etype, prompt_choice = key
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": (
+                    "You are a cybersecurity deception assistant. Generate a harmless, believable internal artifact. "
+                    f"Event: {eventid or 'unknown'} ({etype or 'n/a'}). Task: {prompt_choice}")},
+            ],
+            "temperature": 0.7,
+            "max_tokens": 200,
+        }
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError("LLM circuit open")
+        async with self._sem:
+            self.stats["requests"] += 1
+            try:
+                text = await asyncio.wait_for(
+                    self._loop.run_in_executor(self._io, self._post, payload), self.timeout)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.breaker.failure()
+                raise LLMError(str(e) or type(e).__name__) from e
+        self.breaker.success()
+        self.cache.put(key, text)
+        return text
+
+    async def complete(self, key):
+        """Cached completion; concurrent identical keys share one upstream request."""
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, True
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._call(key))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(fut), False
+
+    def generate(self, event, prompt_choice):
+        """Blocking entry point for the synchronous decision path; returns (text, cache_hit)."""
+        key = normalise_event(event, prompt_choice)
+        return asyncio.run_coroutine_threadsafe(self.complete(key), self._loop).result(self.timeout + 1)
+
+    def snapshot(self):
+        return {
+            "requests": self.stats["requests"],
+            "errors": self.stats["errors"],
+            "short_circuited": self.stats["short_circuited"],
+            "coalesced": self.stats["coalesced"],
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache),
+            "breaker": self.breaker.state,
+        }
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LLMBackend()
+    return _backend
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Compiled redaction engine behind safe_response
+
+Indicators are compiled once into two regexes. Literal terms are folded into a prefix trie
+("pass(?:word|phrase)") and matched case-sensitively against the lowercased response. That
+lets sre skip ahead on the set of first characters, and each position costs about the
+length of the longest matching prefix rather than one comparison per term. Regex
+indicators (key formats, token shapes, hostnames) are alternated into a second pattern
+run on the original text; they are case-sensitive unless they use (?i:...). Each pattern
+scans the response once, in either mode:
+
+  whole  the first hit replaces the whole response (the original safe_response behaviour)
+  mask   every matching span is replaced in place by FYP_REDACT_MASK
+
+With up to FYP_REDACT_SCAN_TERMS literals (the built-in set is 6), whole mode instead checks
+each literal with `in` on the lowercased text; at that size the trie costs more than it saves.
+
+Extra indicators come from FYP_REDACT_PATTERNS, one per line: a plain line is a literal,
+"re:" starts a regex, and "#" starts a comment.
+"""
+
+import os
+import re
+import threading
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+REDACT_PATTERNS = os.environ.get("FYP_REDACT_PATTERNS", os.path.join(PROJECT_ROOT, "config", "redaction_patterns.txt"))
+REDACT_MODE = os.environ.get("FYP_REDACT_MODE", "whole")  # whole | mask
+REDACT_MASK = os.environ.get("FYP_REDACT_MASK", "[REDACTED]")
+WHOLE_RESPONSE = "[REDACTED: sensitive content]"
+REDACT_SCAN_TERMS = int(os.environ.get("FYP_REDACT_SCAN_TERMS", "16"))
+
+# always redacted, whatever the patterns file says
+BUILTIN_TERMS = ["password", "ssh-rsa", "-----BEGIN", "secretkey", "PRIVATE", "PRIVATE KEY"]
+
+def trie_pattern(terms):
+    """Regex source matching any of `terms` (case-folded), factored on common prefixes."""
+    trie = {}
+    for term in terms:
+        if not term:
+            continue
+        node = trie
+        for ch in term.lower():
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # a term ends here but longer ones continue; prefer the longer match
+            return "(?:" + body + ")?" if len(branches) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+def load_patterns(path):
+    """(literals, regexes) from a patterns file; empty when it does not exist."""
+    literals, regexes = [], []
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.rstrip("\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                if line.startswith("re:"):
+                    regexes.append(line[3:])
+                else:
+                    literals.append(line.strip())
+    except FileNotFoundError:
+        pass
+    return literals, regexes
+
+class Redactor:
+    def __init__(self, literals=(), regexes=(), mode=REDACT_MODE, mask=REDACT_MASK, scan_terms=REDACT_SCAN_TERMS):
+        if mode not in ("whole", "mask"):
+            raise ValueError(f"unknown redaction mode: {mode}")
+        self.mode = mode
+        self.mask = mask
+        self.literals = sorted(set(t.lower() for t in literals if t))
+        # few literals: plain substring scans beat the trie regex
+        self.scan = mode == "whole" and len(self.literals) <= scan_terms
+        self.regexes = list(regexes)
+        self.terms = self.terms_ci = self.regex = None
+        if self.literals:
+            source = trie_pattern(self.literals)
+            self.terms = re.compile(source)
+            # for text whose lowercase form changes length, so spans would not line up
+            self.terms_ci = re.compile(source, re.IGNORECASE)
+        for rx in self.regexes:
+            re.compile(rx)  # fail on the offending pattern, not on the combined one
+        if self.regexes:
+            self.regex = re.compile("|".join("(?:" + rx + ")" for rx in self.regexes))
+
+    def _term_matches(self, text):
+        if self.terms is None:
+            return iter(())
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return self.terms.finditer(lowered)
+        return self.terms_ci.finditer(text)
+
+    def find(self, text):
+        """(start, end) spans of every indicator in `text`, merged where they overlap."""
+        spans = [m.span() for m in self._term_matches(text)]
+        if self.regex is not None:
+            spans.extend(m.span() for m in self.regex.finditer(text) if m.end() > m.start())
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def redact(self, text):
+        if self.mode == "whole":
+            if self.scan:
+                lowered = text.lower()
+                for t in self.literals:
+                    if t in lowered:
+                        return WHOLE_RESPONSE
+            elif next(self._term_matches(text), None) is not None:
+                return WHOLE_RESPONSE
+            if self.regex is not None and self.regex.search(text) is not None:
+                return WHOLE_RESPONSE
+            return text
+        spans = self.find(text)
+        if not spans:
+            return text
+        out, pos = [], 0
+        for start, end in spans:
+            out.append(text[pos:start])
+            out.append(self.mask)
+            pos = end
+        out.append(text[pos:])
+        return "".join(out)
+
+_redactor = None
+_redactor_lock = threading.Lock()
+
+def get_redactor():
+    global _redactor
+    if _redactor is not None:
+        return _redactor
+    with _redactor_lock:
+        if _redactor is None:
+            literals, regexes = load_patterns(REDACT_PATTERNS)
+            _redactor = Redactor(BUILTIN_TERMS + literals, regexes)
+    return _redactor
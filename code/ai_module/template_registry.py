@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Preloaded template registry for random_template
+
+Templates are read once, indexed by event category and kept in memory. Only files whose
+mtime/size changed are re-read; changes are noticed through inotify on the template
+directory when available, otherwise by a stat scan at most every FYP_TEMPLATE_RELOAD seconds.
+
+A template belongs to a category when its file name starts with the category
+("auth.failed_note.tpl") or its first component ("auth_note.tpl"); others serve any event.
+"""
+
+import os
+import time
+import random
+import threading
+import collections
+
+from common.follower import Inotify
+
+TEMPLATE_DIR = os.environ.get("FYP_TEMPLATE_DIR", os.path.expanduser("~/FYP-Project/config/templates"))
+TEMPLATE_RELOAD_S = float(os.environ.get("FYP_TEMPLATE_RELOAD", "5"))
+CATEGORIES = ("auth.failed", "session.connect", "port.scan")
+
+Template = collections.namedtuple("Template", "name path mtime size category content lines")
+
+def template_category(name):
+    for cat in CATEGORIES:
+        if name.startswith(cat) or name.startswith(cat.split(".")[0] + "_"):
+            return cat
+    return "default"
+
+class TemplateRegistry:
+    def __init__(self, tpl_dir=TEMPLATE_DIR, reload_interval=TEMPLATE_RELOAD_S):
+        self.tpl_dir = tpl_dir
+        self.reload_interval = reload_interval
+        self.templates = {}
+        self.by_category = {}
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._notifier = None
+        self._watch()
+        self.scan()
+
+    def _watch(self):
+        if self._notifier is None and os.path.isdir(self.tpl_dir):
+            try:
+                self._notifier = Inotify(self.tpl_dir, directory=True)
+            except (OSError, AttributeError):
+                self._notifier = None
+
+    def _load(self, name, st):
+        path = os.path.join(self.tpl_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                content = fh.read()
+        except Exception:
+            content = ""
+        self.stats["loads"] += 1
+        return Template(name, path, st.st_mtime, st.st_size, template_category(name), content,
+                        tuple(content.splitlines()))
+
+    def scan(self):
+        """Re-read added or modified templates and forget deleted ones."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                names = [f for f in os.listdir(self.tpl_dir) if f.endswith(".tpl")]
+            except OSError:
+                names = []
+            current = {}
+            for name in names:
+                try:
+                    st = os.stat(os.path.join(self.tpl_dir, name))
+                except OSError:
+                    continue
+                old = self.templates.get(name)
+                if old and old.mtime == st.st_mtime and old.size == st.st_size:
+                    current[name] = old
+                else:
+                    current[name] = self._load(name, st)
+            by_category = collections.defaultdict(list)
+            for t in current.values():
+                by_category[t.category].append(t)
+            self.templates = current
+            self.by_category = dict(by_category)
+            self.stats["scans"] += 1
+
+    def maybe_reload(self):
+        if self._notifier is not None:
+            if self._notifier.wait(0):
+                self.scan()
+        elif time.monotonic() - self._checked >= self.reload_interval:
+            self._watch()
+            self.scan()
+
+    def pick(self, eventid, choose=random.choice):
+        """Template for the event's category; `choose` picks from the candidate list."""
+        self.maybe_reload()
+        cat = eventid if eventid in CATEGORIES else "default"
+        candidates = self.by_category.get(cat) or list(self.templates.values())
+        if not candidates:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return choose(candidates)
+
+    def snapshot(self):
+        return {
+            "dir": self.tpl_dir,
+            "templates": len(self.templates),
+            "by_category": {c: len(v) for c, v in self.by_category.items()},
+            "watch": "inotify" if self._notifier is not None else "stat",
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "loads": self.stats["loads"],
+            "scans": self.stats["scans"],
+        }
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry()
+    return _registry
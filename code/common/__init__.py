@@ -0,0 +1,3 @@
+"""
+Components shared by the webhook, AI decision engine and executor
+"""
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Group-commit appender for the pipeline logs
+
+Writers hand over encoded records, and they are appended to the log in commits. The log
+keeps its file open, and each commit is a single O_APPEND write under the rotation flock,
+so no record is split or interleaved, whatever the number of writer threads and processes.
+
+With FYP_APPEND_FLUSH_MS=0 (the default) a record is written before append() returns. The
+thread that finds no commit in progress writes everything queued so far, including
+records that arrived while the previous commit was running. A positive value holds records
+for up to that long, or until FYP_APPEND_FLUSH_BYTES are queued, and a background thread
+commits them.
+
+A failed write raises from every append() call waiting on it. Records that were left to the
+background thread have no caller to raise in, so they are only printed and counted as
+lost_records.
+
+Durability is set per stream. FYP_APPEND_DURABILITY sets the default and
+FYP_APPEND_DURABILITY_<STREAM> overrides it, where STREAM is the upper-cased file name
+before its first dot, e.g. AI_DECISIONS or RECEIVED_LOGS:
+
+  none      leave flushing to the OS (default)
+  interval  fdatasync every FYP_APPEND_FSYNC_INTERVAL seconds
+  always    fdatasync each commit; append() returns once its record is on disk
+"""
+
+import os
+import time
+import atexit
+import threading
+import collections
+
+from common import rotation
+
+DURABILITY = os.environ.get("FYP_APPEND_DURABILITY", "none")
+FLUSH_MS = float(os.environ.get("FYP_APPEND_FLUSH_MS", "0"))
+FLUSH_BYTES = int(os.environ.get("FYP_APPEND_FLUSH_BYTES", str(256 * 1024)))
+FSYNC_INTERVAL = float(os.environ.get("FYP_APPEND_FSYNC_INTERVAL", "1.0"))
+
+POLICIES = ("none", "interval", "always")
+
+def stream_name(path):
+    return os.path.basename(path).split(".", 1)[0].upper()
+
+def durability_for(path):
+    return os.environ.get("FYP_APPEND_DURABILITY_" + stream_name(path), DURABILITY)
+
+class Appender:
+    def __init__(self, path, durability=None, flush_ms=FLUSH_MS, flush_bytes=FLUSH_BYTES,
+                 fsync_interval=FSYNC_INTERVAL, log=None):
+        self.durability = durability or durability_for(path)
+        if self.durability not in POLICIES:
+            raise ValueError(f"unknown durability policy for {path}: {self.durability}")
+        self.path = path
+        self.log = log or rotation.get_log(path)
+        self.flush_s = max(0.0, flush_ms) / 1000.0
+        self.flush_bytes = max(1, flush_bytes)
+        self.fsync_interval = fsync_interval
+        self.stats = collections.Counter()
+        self._buf = []
+        self._bytes = 0
+        self._oldest = None  # monotonic time the oldest queued record arrived
+        self._queued = 0  # records handed over so far
+        self._written = 0  # records committed (and synced under "always")
+        self._committing = False
+        self._waiters = {}  # sequence number of each blocked append() -> the error of its commit, if any
+        self._cond = threading.Condition()
+        self._last_sync = time.monotonic()
+        self._thread = None
+        if self.flush_s > 0 or self.durability == "interval":
+            self._thread = threading.Thread(target=self._flush_loop, name="appender", daemon=True)
+            self._thread.start()
+
+    def append(self, data):
+        """Queue one or more complete records (str or bytes); see the module docstring for when they land."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            return
+        with self._cond:
+            self._buf.append(data)
+            self._bytes += len(data)
+            self._queued += 1
+            mine = self._queued
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self.flush_s > 0 and self._bytes < self.flush_bytes and self.durability != "always":
+                if len(self._buf) == 1:
+                    # the flusher sleeps without a deadline while nothing is queued
+                    self._cond.notify_all()
+                return
+            self._wait_written(mine)
+
+    def _wait_written(self, seq):
+        """Commit, or wait for the commit in progress or the flusher, until record `seq` is written; holds _cond.
+        Raises the commit's error if it failed."""
+        self._waiters[seq] = None
+        try:
+            while self._written < seq:
+                if self._committing or self.flush_s > 0 and self._buf and self._bytes < self.flush_bytes:
+                    self._cond.notify_all()
+                    self._cond.wait(self.flush_s or None)
+                else:
+                    self._commit()
+        finally:
+            error = self._waiters.pop(seq)
+        if error is not None:
+            raise error
+
+    def _commit(self):
+        """Write everything queued as one commit; called with _cond held and released while writing."""
+        batch, first, upto, n = self._buf, self._written + 1, self._queued, len(self._buf)
+        self._buf, self._bytes, self._oldest = [], 0, None
+        self._committing = True
+        self._cond.release()
+        t0 = time.perf_counter()
+        try:
+            data = batch[0] if n == 1 else b"".join(batch)
+            self.log.append(data, fsync=self.durability == "always")
+            error = None
+        except Exception as e:
+            error = e
+        finally:
+            self._cond.acquire()
+        self._committing = False
+        self._written = upto
+        if error is None:
+            self.stats["commits"] += 1
+            self.stats["records"] += n
+            self.stats["bytes"] += len(data)
+            self.stats["max_batch"] = max(self.stats["max_batch"], n)
+            self.stats["commit_us"] += int((time.perf_counter() - t0) * 1e6)
+            if self.durability == "always":
+                self.stats["fsyncs"] += 1
+        else:
+            self.stats["errors"] += 1
+            waiting = [seq for seq in self._waiters if first <= seq <= upto]
+            for seq in waiting:
+                self._waiters[seq] = error
+            if n > len(waiting):
+                print(f"Error appending to {self.path}:", error)
+                self.stats["lost_records"] += n - len(waiting)
+        self._cond.notify_all()
+
+    def _due(self, now):
+        return self._buf and (self._bytes >= self.flush_bytes or now - self._oldest >= self.flush_s)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                waits = []
+                if self._buf:
+                    waits.append(self._oldest + self.flush_s - now)
+                elif self.flush_s > 0:
+                    waits.append(None)
+                if self.durability == "interval":
+                    waits.append(self._last_sync + self.fsync_interval - now)
+                timeout = min((w for w in waits if w is not None), default=None)
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+                now = time.monotonic()
+                if not self._committing and self._due(now):
+                    self._commit()
+            if self.durability == "interval" and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+
+    def flush(self):
+        """Commit whatever is queued now (and fsync under "interval")."""
+        with self._cond:
+            while self._buf or self._committing:
+                if self._committing:
+                    self._cond.wait()
+                else:
+                    self._commit()
+        if self.durability == "interval":
+            self.sync()
+
+    def sync(self):
+        try:
+            if self.log.sync():
+                with self._cond:
+                    self.stats["fsyncs"] += 1
+        except Exception as e:
+            print(f"Error syncing {self.path}:", e)
+        self._last_sync = time.monotonic()
+
+    def snapshot(self):
+        with self._cond:
+            commits = self.stats["commits"]
+            return dict(self.stats, path=self.path, durability=self.durability, flush_ms=self.flush_s * 1000.0,
+                        queued=len(self._buf),
+                        records_per_commit=round(self.stats["records"] / commits, 2) if commits else None)
+
+_appenders = {}
+_appenders_lock = threading.Lock()
+
+def get_appender(path):
+    with _appenders_lock:
+        a = _appenders.get(path)
+        if a is None:
+            a = _appenders[path] = Appender(path)
+    return a
+
+def append(path, data):
+    get_appender(path).append(data)
+
+@atexit.register
+def flush_all():
+    with _appenders_lock:
+        appenders = list(_appenders.values())
+    for a in appenders:
+        try:
+            a.flush()
+        except Exception as e:
+            print(f"Error flushing {a.path}:", e)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Record serialisation shared by every log writer and reader
+
+JSON goes through orjson or msgspec when one is installed, else the stdlib (FYP_CODEC picks
+one explicitly). Output is always plain JSON, so logs stay readable by any tool.
+
+With FYP_LOG_FORMAT=binary, writers append length-prefixed frames instead of JSON lines:
+
+    0x1e | tag | length (4 bytes, big-endian) | payload | length | "\\n"
+
+The tag gives the payload encoding: "m" for msgpack (msgspec or msgpack) and "j" for JSON
+when neither is installed. A raw 0x1e byte cannot appear in a JSON line, so frames and
+lines can share a file. Readers split either kind forward, or backward through the
+trailing length, which lets a log switch format without a conversion step. Frames still
+end in a newline, so line counts and rotation thresholds behave as before.
+"""
+
+import os
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC = os.environ.get("FYP_CODEC", "auto")  # auto | orjson | msgspec | json
+LOG_FORMAT = os.environ.get("FYP_LOG_FORMAT", "jsonl")  # jsonl | binary
+
+FRAME = b"\x1e"
+FRAME_OVERHEAD = 11  # marker, tag, two lengths and the newline
+# the length's top byte is then 0, which a JSON line cannot contain; larger records stay JSON
+MAX_FRAME = (1 << 24) - 1
+_LEN = struct.Struct(">I")
+
+def _backend():
+    if CODEC == "auto":
+        return "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+    if CODEC == "orjson" and orjson is None or CODEC == "msgspec" and msgspec is None:
+        raise RuntimeError(f"FYP_CODEC={CODEC} but the package is not installed")
+    return CODEC
+
+BACKEND = _backend()
+
+if BACKEND == "orjson":
+    _OPTS = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(obj):
+        try:
+            return orjson.dumps(obj, option=_OPTS)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib raises for anything it cannot encode either
+            return json.dumps(obj).encode("utf-8")
+
+    def dumps_pretty(obj):
+        try:
+            return orjson.dumps(obj, option=_OPTS | orjson.OPT_INDENT_2).decode("utf-8")
+        except TypeError:
+            return json.dumps(obj, indent=2)
+
+    _loads = orjson.loads
+elif BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+
+    def dumpb(obj):
+        try:
+            return _encoder.encode(obj)
+        except TypeError:
+            return json.dumps(obj).encode("utf-8")
+
+    def dumps_pretty(obj):
+        return msgspec.json.format(dumpb(obj), indent=2).decode("utf-8")
+
+    def _loads(raw):
+        try:
+            return msgspec.json.decode(raw)
+        except msgspec.DecodeError as e:
+            # callers catch ValueError, as raised by json and orjson
+            raise ValueError(str(e))
+else:
+    def dumpb(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def dumps_pretty(obj):
+        return json.dumps(obj, indent=2)
+
+    _loads = json.loads
+
+def dumps(obj):
+    """Compact JSON text."""
+    return dumpb(obj).decode("utf-8")
+
+if msgspec is not None:
+    PACK_TAG, _pack, _unpack = b"m", msgspec.msgpack.Encoder().encode, msgspec.msgpack.decode
+elif msgpack is not None:
+    PACK_TAG, _pack, _unpack = b"m", msgpack.packb, lambda b: msgpack.unpackb(b, strict_map_key=False)
+else:
+    PACK_TAG, _pack, _unpack = b"j", dumpb, _loads
+
+def frame(obj):
+    payload = _pack(obj)
+    if len(payload) > MAX_FRAME:
+        return dumpb(obj) + b"\n"
+    n = _LEN.pack(len(payload))
+    return FRAME + PACK_TAG + n + payload + n + b"\n"
+
+def encode_record(obj, fmt=None):
+    """One log record (bytes, newline-terminated) in the configured log format."""
+    if (fmt or LOG_FORMAT) == "binary":
+        return frame(obj)
+    return dumpb(obj) + b"\n"
+
+def encode_records(objs, fmt=None):
+    return b"".join(encode_record(o, fmt) for o in objs)
+
+def _frame_length(buf, i):
+    """Total size of a well-formed frame at buf[i] (without the newline), or None."""
+    if len(buf) - i < FRAME_OVERHEAD - 1:
+        return None
+    if buf[i + 2] != 0:
+        return -1
+    n = _LEN.unpack_from(buf, i + 2)[0]
+    end = i + 6 + n
+    if len(buf) < end + 5:
+        return None
+    if buf[end:end + 4] != buf[i + 2:i + 6] or buf[end + 4:end + 5] != b"\n":
+        return -1
+    return end + 4 - i
+
+def split_records(buf):
+    """(records, rest): complete records at the start of `buf` (without their newline) and
+    the incomplete remainder. A record is a JSON line or a whole frame."""
+    out = []
+    i = 0
+    size = len(buf)
+    while i < size:
+        if buf[i:i + 1] == FRAME:
+            n = _frame_length(buf, i)
+            if n is None:
+                break
+            if n > 0:
+                out.append(buf[i:i + n])
+                i += n + 1
+                continue
+            # corrupt frame header; drop up to the next newline
+        j = buf.find(b"\n", i)
+        if j < 0:
+            break
+        out.append(buf[i:j])
+        i = j + 1
+    return out, buf[i:]
+
+def iter_raw(fh, chunk=1 << 20):
+    """(record, size on disk) for every record of a binary file object, the last one possibly unterminated."""
+    rest = b""
+    while True:
+        data = fh.read(chunk)
+        if not data:
+            break
+        records, rest = split_records(rest + data)
+        for r in records:
+            yield r, len(r) + 1
+    if rest:
+        yield rest, len(rest)
+
+def record_start(buf, pos, before=0):
+    """Start of the record that ends just before buf[pos] (at a newline, or at the end of an
+    unterminated record). None when more of the `before` bytes preceding buf are needed."""
+    if pos >= FRAME_OVERHEAD and buf[pos - 1:pos] == b"\n" and buf[pos - 5] == 0:
+        n = _LEN.unpack_from(buf, pos - 5)[0]
+        start = pos - FRAME_OVERHEAD - n
+        if start < 0 and start + before >= 0:
+            return None
+        if start >= 0 and buf[start:start + 1] == FRAME and buf[start + 2:start + 6] == buf[pos - 5:pos - 1]:
+            return start
+    end = pos - 1 if buf[pos - 1:pos] == b"\n" else pos
+    j = buf.rfind(b"\n", 0, end)
+    return j + 1 if j >= 0 else None
+
+def as_text(raw):
+    """Record for the text-based readers: JSON lines decoded to str, frames kept as bytes."""
+    if raw[:1] == FRAME:
+        return raw
+    return raw.decode("utf-8", errors="replace")
+
+def loads(raw):
+    """Decode a record: a JSON line (str or bytes) or a frame."""
+    if isinstance(raw, (bytes, bytearray, memoryview)) and raw[:1] == FRAME:
+        raw = bytes(raw)
+        payload = raw[6:6 + _LEN.unpack_from(raw, 2)[0]]
+        return _unpack(payload) if raw[1:2] == b"m" else _loads(payload)
+    return _loads(raw)
+
+def safe_loads(raw):
+    try:
+        return loads(raw)
+    except Exception:
+        return None
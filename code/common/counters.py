@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Persistent lifetime totals and per-minute / per-hour counters for events, decisions and decoy actions
+
+Backed by SQLite in WAL mode so the webhook, AI module and executor processes can all
+update the same store. Reads touch a handful of primary-key rows regardless of log size.
+
+High-cardinality dimensions (src_ip) get no time buckets, and their totals are a heavy-hitter
+table of at most FYP_COUNTERS_TOP_K keys per stream (Space-Saving: a new key replaces the
+smallest and inherits its count as the error bound). Every table is therefore bounded by the
+retention and K rather than by the number of attackers, and a breakdown reads `limit` rows
+off a count index.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import collections
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+COUNTERS_DB = os.environ.get("FYP_COUNTERS_DB", os.path.join(PROJECT_ROOT, "data", "counters.db"))
+MINUTE_RETENTION_S = int(os.environ.get("FYP_COUNTERS_MINUTE_RETENTION", str(24 * 3600)))
+HOUR_RETENTION_S = int(os.environ.get("FYP_COUNTERS_HOUR_RETENTION", str(30 * 24 * 3600)))
+TOP_K = int(os.environ.get("FYP_COUNTERS_TOP_K", "1000"))
+
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+def _event(r):
+    data = r.get("data", r)
+    return data if isinstance(data, dict) else {}
+
+# stream -> dimension -> field extractor
+DIMENSIONS = {
+    "received": {
+        "eventid": lambda r: _event(r).get("eventid"),
+        "src_ip": lambda r: _event(r).get("src_ip"),
+    },
+    "decisions": {
+        "eventid": lambda r: r.get("eventid"),
+        "src_ip": lambda r: r.get("src_ip"),
+        "selected_action": lambda r: r.get("selected_action"),
+    },
+    "actions": {
+        "src_ip": lambda r: r.get("src_ip"),
+        "selected_action": lambda r: r.get("action") or r.get("selected_action"),
+    },
+}
+
+# dimensions kept only as top-K totals
+HEAVY_DIMS = ("src_ip",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS totals (
+    stream TEXT NOT NULL, dim TEXT NOT NULL, key TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (stream, dim, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS buckets (
+    stream TEXT NOT NULL, res TEXT NOT NULL, start INTEGER NOT NULL,
+    dim TEXT NOT NULL, key TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (stream, res, dim, key, start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS top (
+    stream TEXT NOT NULL, dim TEXT NOT NULL, key TEXT NOT NULL, count INTEGER NOT NULL, error INTEGER NOT NULL,
+    PRIMARY KEY (stream, dim, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS top_size (
+    stream TEXT NOT NULL, dim TEXT NOT NULL, n INTEGER NOT NULL,
+    PRIMARY KEY (stream, dim)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS totals_count ON totals (stream, dim, count);
+CREATE INDEX IF NOT EXISTS top_count ON top (stream, dim, count);
+CREATE INDEX IF NOT EXISTS buckets_res_start ON buckets (res, start);
+"""
+
+class CounterStore:
+    def __init__(self, path=COUNTERS_DB, minute_retention=MINUTE_RETENTION_S, hour_retention=HOUR_RETENTION_S,
+                 top_k=TOP_K):
+        self.path = path
+        self.retention = {"minute": minute_retention, "hour": hour_retention}
+        self.top_k = max(1, top_k)
+        self._local = threading.local()
+        self._last_prune = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+        self._migrate_heavy()
+
+    def _migrate_heavy(self):
+        """Move per-key rows that older versions kept for HEAVY_DIMS into the top-K table (once)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for stream, dims in DIMENSIONS.items():
+                for dim in HEAVY_DIMS:
+                    if dim not in dims:
+                        continue
+                    legacy = conn.execute("SELECT 1 FROM totals WHERE stream = ? AND dim = ? LIMIT 1",
+                                          (stream, dim)).fetchone()
+                    if legacy:
+                        rows = conn.execute(
+                            "SELECT key, count FROM totals WHERE stream = ? AND dim = ? ORDER BY count DESC LIMIT ?",
+                            (stream, dim, self.top_k)).fetchall()
+                        conn.executemany("INSERT OR IGNORE INTO top VALUES (?, ?, ?, ?, 0)",
+                                         [(stream, dim, k, n) for k, n in rows])
+                        conn.execute("INSERT OR REPLACE INTO top_size VALUES (?, ?, "
+                                     "(SELECT COUNT(*) FROM top WHERE stream = ? AND dim = ?))",
+                                     (stream, dim, stream, dim))
+                        conn.execute("DELETE FROM totals WHERE stream = ? AND dim = ?", (stream, dim))
+                    for res in RESOLUTIONS:
+                        conn.execute("DELETE FROM buckets WHERE stream = ? AND res = ? AND dim = ?", (stream, res, dim))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, stream, records, ts=None):
+        dims = DIMENSIONS[stream]
+        if ts is None:
+            ts = time.time()
+        agg = collections.Counter()
+        for r in records:
+            agg[("all", "")] += 1
+            for dim, get in dims.items():
+                key = get(r)
+                if key is not None:
+                    agg[(dim, str(key))] += 1
+        if not agg:
+            return
+        heavy = [(dim, key, n) for (dim, key), n in agg.items() if dim in HEAVY_DIMS]
+        rows = [(stream, dim, key, n) for (dim, key), n in agg.items() if dim not in HEAVY_DIMS]
+        bucket_rows = []
+        for res, width in RESOLUTIONS.items():
+            start = int(ts // width) * width
+            bucket_rows.extend((stream, res, start, dim, key, n) for _, dim, key, n in rows)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO totals VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(stream, dim, key) DO UPDATE SET count = count + excluded.count", rows)
+            conn.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(stream, res, dim, key, start) DO UPDATE SET count = count + excluded.count",
+                bucket_rows)
+            for dim, key, n in heavy:
+                self._count_heavy(conn, stream, dim, key, n)
+            if ts - self._last_prune > 60:
+                for res, keep in self.retention.items():
+                    conn.execute("DELETE FROM buckets WHERE res = ? AND start < ?", (res, ts - keep))
+                self._last_prune = ts
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _count_heavy(self, conn, stream, dim, key, n):
+        """Space-Saving update of the top-K table; called inside record()'s transaction."""
+        if conn.execute("UPDATE top SET count = count + ? WHERE stream = ? AND dim = ? AND key = ?",
+                        (n, stream, dim, key)).rowcount:
+            return
+        size = conn.execute("SELECT n FROM top_size WHERE stream = ? AND dim = ?", (stream, dim)).fetchone()
+        if not size or size[0] < self.top_k:
+            conn.execute("INSERT INTO top VALUES (?, ?, ?, ?, 0)", (stream, dim, key, n))
+            conn.execute("INSERT INTO top_size VALUES (?, ?, 1) "
+                         "ON CONFLICT(stream, dim) DO UPDATE SET n = n + 1", (stream, dim))
+            return
+        old_key, floor = conn.execute(
+            "SELECT key, count FROM top WHERE stream = ? AND dim = ? ORDER BY count LIMIT 1", (stream, dim)).fetchone()
+        conn.execute("DELETE FROM top WHERE stream = ? AND dim = ? AND key = ?", (stream, dim, old_key))
+        conn.execute("INSERT INTO top VALUES (?, ?, ?, ?, ?)", (stream, dim, key, floor + n, floor))
+
+    def total(self, stream, dim="all", key=""):
+        table = "top" if dim in HEAVY_DIMS else "totals"
+        row = self._conn().execute(
+            f"SELECT count FROM {table} WHERE stream = ? AND dim = ? AND key = ?", (stream, dim, key)).fetchone()
+        return row[0] if row else 0
+
+    def totals(self):
+        return {s: self.total(s) for s in DIMENSIONS}
+
+    def breakdown(self, stream, dim, limit=20):
+        """Top `limit` keys by count; for HEAVY_DIMS these are the top-K estimates (upper bounds)."""
+        table = "top" if dim in HEAVY_DIMS else "totals"
+        rows = self._conn().execute(
+            f"SELECT key, count FROM {table} WHERE stream = ? AND dim = ? ORDER BY count DESC LIMIT ?",
+            (stream, dim, limit)).fetchall()
+        return dict(rows)
+
+    def window(self, stream, seconds, dim="all", key="", now=None):
+        """Count over the last `seconds`, at minute resolution when retained, otherwise hourly."""
+        if now is None:
+            now = time.time()
+        res = "minute" if seconds <= self.retention["minute"] else "hour"
+        width = RESOLUTIONS[res]
+        since = int((now - seconds) // width) * width
+        row = self._conn().execute(
+            "SELECT COALESCE(SUM(count), 0) FROM buckets "
+            "WHERE stream = ? AND res = ? AND dim = ? AND key = ? AND start >= ?",
+            (stream, res, dim, key, since)).fetchone()
+        return row[0]
+
+    def series(self, stream, res="minute", since=None, dim="all", key=""):
+        since = since if since is not None else time.time() - self.retention[res]
+        rows = self._conn().execute(
+            "SELECT start, count FROM buckets "
+            "WHERE stream = ? AND res = ? AND dim = ? AND key = ? AND start >= ? ORDER BY start",
+            (stream, res, dim, key, int(since))).fetchall()
+        return [{"start": s, "count": n} for s, n in rows]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CounterStore()
+    return _store
+
+def record(stream, records):
+    """Best-effort update used by the writers; a counter failure never blocks the pipeline."""
+    try:
+        get_store().record(stream, records)
+    except Exception as e:
+        print("Error updating counters:", e)
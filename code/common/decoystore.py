@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for executor decoys
+
+Decoy bodies (the AI response under the per-decision header) are stored once each, at
+objects/<sha[:2]>/<sha[2:4]>/<sha256>. Per-attacker decoy paths are sharded by a hash of the
+source IP, at files/<h[:2]>/<h[2:4]>/<name>. FYP_DECOY_MATERIALIZE picks what is written per
+decision:
+
+  flat  the full file in the top-level directory (the default and the original layout, no
+        deduplication)
+  link  a hardlink to the shared body at the per-attacker path. The file on disk is the body
+        alone; the header is kept only in the action record.
+  lazy  nothing at first; the action record carries the header and body_sha. The file is
+        written at its per-attacker path the first time locate() is asked for it (a preview,
+        or the materialize command).
+
+Every mode records the same file_size (header plus body), and locate() and read() give the
+same content for it.
+
+Move an existing flat directory into the sharded layout with:
+    python3 code/common/decoystore.py migrate
+"""
+
+import os
+import sys
+import hashlib
+import threading
+import collections
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+DECOY_DIR = os.environ.get("FYP_DECOY_DIR", os.path.join(PROJECT_ROOT, "assets", "ai_generated"))
+DECOY_MATERIALIZE = os.environ.get("FYP_DECOY_MATERIALIZE", "flat")  # flat | link | lazy
+KNOWN_BODIES = 65536  # body hashes remembered as present, to skip the stat on repeats
+
+def shard(name):
+    return os.path.join(name[:2], name[2:4])
+
+class DecoyStore:
+    def __init__(self, root=DECOY_DIR, mode=DECOY_MATERIALIZE):
+        if mode not in ("lazy", "link", "flat"):
+            raise ValueError(f"unknown decoy materialisation mode: {mode}")
+        self.root = root
+        self.mode = mode
+        self.objects = os.path.join(root, "objects")
+        self.files = os.path.join(root, "files")
+        self.stats = collections.Counter()
+        self._known = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def object_path(self, sha):
+        return os.path.join(self.objects, shard(sha), sha)
+
+    def sharded_path(self, src_ip, name):
+        h = hashlib.sha1(str(src_ip).encode("utf-8", errors="replace")).hexdigest()
+        return os.path.join(self.files, shard(h), name)
+
+    def decoy_path(self, src_ip, name):
+        """Per-attacker path for `name`; where the file is (or would be) materialised."""
+        if self.mode == "flat":
+            return os.path.join(self.root, name)
+        return self.sharded_path(src_ip, name)
+
+    def put_body(self, body):
+        """Store `body` (bytes) once; returns its sha256."""
+        sha = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            if sha in self._known:
+                self._known.move_to_end(sha)
+                self.stats["dedup_hits"] += 1
+                return sha
+        path = self.object_path(sha)
+        if os.path.exists(path):
+            self._count("dedup_hits")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(body)
+            # concurrent writers of the same body race harmlessly: the content is identical
+            os.replace(tmp, path)
+            self._count("bodies_written")
+        with self._lock:
+            self._known[sha] = True
+            while len(self._known) > KNOWN_BODIES:
+                self._known.popitem(last=False)
+        return sha
+
+    def store(self, rec, src_ip, name, header, body):
+        """Persist a decoy per the mode and fill rec["file"], ["file_size"] and the storage fields."""
+        path = self.decoy_path(src_ip, name)
+        rec["file"] = path
+        rec["storage"] = self.mode
+        if self.mode == "flat":
+            with open(path, "wb") as fh:
+                fh.write(header + body)
+            rec["file_size"] = len(header) + len(body)
+            return rec
+        sha = self.put_body(body)
+        rec["body_sha"] = sha
+        rec["header"] = header.decode("utf-8", errors="replace")
+        rec["file_size"] = len(header) + len(body)
+        if self.mode == "link":
+            self._link(self.object_path(sha), path)
+        return rec
+
+    def _link(self, src, dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(src, dst)
+        except FileExistsError:
+            pass
+        except OSError:
+            # no hardlinks here (other filesystem, or not permitted); fall back to a copy
+            with open(src, "rb") as fh, open(dst, "wb") as out:
+                out.write(fh.read())
+            self._count("link_fallbacks")
+        self._count("linked")
+
+    def locate(self, rec):
+        """(path, header) holding the decoy behind an action record: the file itself with an
+        empty header, or the shared body with the record's header; None when neither exists.
+        A lazy decoy is materialised here on first access."""
+        path = rec.get("file") or ""
+        sha = rec.get("body_sha")
+        if sha and rec.get("storage") == "link" and os.path.isfile(self.object_path(sha)):
+            # the linked file is the body alone
+            return self.object_path(sha), (rec.get("header") or "").encode("utf-8")
+        if sha and path and rec.get("storage") == "lazy" and not os.path.exists(path):
+            try:
+                self.materialize(rec)
+            except OSError as e:
+                print(f"Error materialising {path}:", e)
+        candidates = [path] if path else []
+        if rec.get("src_ip") and path:
+            # flat records from before a migrate
+            candidates.append(self.sharded_path(rec["src_ip"], os.path.basename(path)))
+        for p in candidates:
+            if os.path.isfile(p):
+                return p, b""
+        if sha and os.path.isfile(self.object_path(sha)):
+            return self.object_path(sha), (rec.get("header") or "").encode("utf-8")
+        return None
+
+    def read(self, rec, limit=-1):
+        """Content of the decoy behind an action record (bytes), or None when it cannot be found."""
+        found = self.locate(rec)
+        if found is None:
+            return None
+        path, header = found
+        with open(path, "rb") as fh:
+            if limit < 0:
+                return header + fh.read()
+            return (header + fh.read(max(0, limit - len(header))))[:limit]
+
+    def materialize(self, rec):
+        """Write a lazy decoy to its per-attacker path; returns the path."""
+        path = rec["file"]
+        if not os.path.exists(path):
+            data = self.read(dict(rec, file=""))
+            if data is None:
+                raise FileNotFoundError(f"no stored body for {path}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+            self._count("materialized")
+        return path
+
+    def migrate(self):
+        """Move flat-layout decoys into the sharded per-attacker layout; returns the count moved."""
+        moved = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith(".txt"):
+                    continue
+                # <action>_<src_ip>_<timestamp>_<gen_id>.txt
+                parts = entry.name[:-4].rsplit("_", 3)
+                if len(parts) != 4:
+                    continue
+                dst = self.sharded_path(parts[1], entry.name)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.replace(entry.path, dst)
+                moved += 1
+        return moved
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, mode=self.mode, root=self.root)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DecoyStore()
+    return _store
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "materialize"):
+        print("usage: decoystore.py migrate | materialize <file|gen_id>...")
+        sys.exit(1)
+    store = DecoyStore(mode="lazy")
+    if sys.argv[1] == "migrate":
+        print(f"moved {store.migrate()} decoys into {store.files}")
+        sys.exit(0)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from common import history
+    for key in sys.argv[2:]:
+        col = "file" if os.sep in key else "gen_id"
+        recs, _ = history.get_index().query("actions", filters={col: key}, limit=1)
+        if not recs:
+            print(f"{key}: no action record")
+            continue
+        print(store.materialize(recs[0]))
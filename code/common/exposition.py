@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Prometheus text exposition format (0.0.4) for the webhook's /metrics, without a client library
+"""
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(int(v))
+
+def family(name, kind, help_text, samples):
+    """Lines for one metric; `samples` is a list of (labels dict, value)."""
+    lines = [f"# HELP {name} {_escape(help_text)}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {_value(v)}" for labels, v in samples)
+    return lines
+
+def histogram(name, help_text, series):
+    """Lines for a histogram in seconds. `series` is a list of (labels, snapshot) where the
+    snapshot is tracing.snapshot()'s {"count", "sum_ms", "buckets": {le_ms: count}}."""
+    lines = [f"# HELP {name} {_escape(help_text)}", f"# TYPE {name} histogram"]
+    for labels, snap in series:
+        buckets = sorted(((float(le), c) for le, c in snap.get("buckets", {}).items()), key=lambda b: b[0])
+        cumulative = 0
+        for le_ms, c in buckets:
+            cumulative += c
+            le = "+Inf" if le_ms == float("inf") else repr(le_ms / 1000.0)
+            lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {repr(round(snap.get('sum_ms', 0) / 1000.0, 9))}")
+        lines.append(f"{name}_count{_labels(labels)} {int(snap.get('count', 0))}")
+    return lines
+
+def render(lines):
+    return "\n".join(lines) + "\n"
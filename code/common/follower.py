@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Event-driven JSONL follower: inotify with a polling fallback, rotation/truncation aware,
+with an on-disk byte-offset checkpoint so a restart resumes exactly where it stopped.
+Binary frames (codec.py) are followed like lines and handed out as bytes.
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import select
+import ctypes
+import ctypes.util
+import collections
+
+from common import codec, rotation
+
+FOLLOW_MODE = os.environ.get("FYP_FOLLOW_MODE", "auto")  # auto | inotify | poll
+POLL_INTERVAL = float(os.environ.get("FYP_FOLLOW_POLL_INTERVAL", "0.5"))
+READ_CHUNK = 1 << 20
+# leading bytes stored with the checkpoint to tell a file apart from another with a reused inode
+HEAD_BYTES = 64
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+class Inotify:
+    """Minimal ctypes wrapper; watches the file's directory (or `path` itself when
+    `directory` is set) so rotations (create/move) are seen too."""
+
+    def __init__(self, path, directory=False):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        target = os.path.abspath(path) if directory else os.path.dirname(os.path.abspath(path))
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(target), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    break
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+class FileFollower:
+    def __init__(self, path, checkpoint=None, mode=FOLLOW_MODE, poll_interval=POLL_INTERVAL, start_at_end=True):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.poll_interval = poll_interval
+        self.start_at_end = start_at_end
+        self.fh = None
+        self.inode = None
+        self.head = b""  # first HEAD_BYTES of the current file
+        self.read_offset = 0  # byte offset of the start of the unread buffer in the current file
+        self.committed = (None, 0)  # (inode, offset) just past the last processed line
+        self._buf = b""
+        self._backlog = None  # lines from closed rotation segments still to replay
+        self._notifier = None
+        if mode in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self._notifier = Inotify(path)
+            except OSError as e:
+                if mode == "inotify":
+                    raise
+                print(f"[Follower] inotify unavailable ({e}); polling every {poll_interval}s")
+        self._open_initial()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint:
+            return None
+        try:
+            with open(self.checkpoint, "r") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _open_initial(self):
+        cp = self._load_checkpoint()
+        try:
+            self.fh = open(self.path, "rb")
+        except FileNotFoundError:
+            self.fh = None
+            return
+        st = os.fstat(self.fh.fileno())
+        self.inode = st.st_ino
+        self._refresh_head()
+        cp_head = bytes.fromhex(cp.get("head", "")) if cp else b""
+        if (cp and cp.get("inode") == st.st_ino and cp.get("offset", 0) <= st.st_size
+                and self.head.startswith(cp_head)):
+            self.read_offset = cp["offset"]
+        elif cp:
+            # rotated while we were down: finish the checkpointed segment (and any later
+            # closed segments) from the manifest, then read the current file from the start
+            self.read_offset = 0
+            self._backlog = rotation.lines_after(self.path, cp.get("inode"), cp.get("offset", 0), cp_head, HEAD_BYTES)
+        else:
+            self.read_offset = st.st_size if self.start_at_end else 0
+        self.fh.seek(self.read_offset)
+        self.committed = (self.inode, self.read_offset)
+
+    def _reopen(self):
+        if self.fh:
+            self.fh.close()
+        self.fh = None
+        self._buf = b""
+        self.read_offset = 0
+        try:
+            self.fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self.inode = os.fstat(self.fh.fileno()).st_ino
+        self.head = b""
+        return True
+
+    def _refresh_head(self):
+        if len(self.head) < HEAD_BYTES:
+            self.head = os.pread(self.fh.fileno(), HEAD_BYTES, 0)
+
+    def read_entries(self, max_lines=None):
+        """Complete records available now, as (text, inode, end_offset, head) tuples."""
+        out = []
+        while self._backlog is not None and (max_lines is None or len(out) < max_lines):
+            entry = next(self._backlog, None)
+            if entry is None:
+                self._backlog = None
+            else:
+                out.append(entry)
+        if self.fh is None and not self._reopen():
+            return out
+        pending = collections.deque()
+        while max_lines is None or len(out) < max_lines:
+            if not pending:
+                records, self._buf = codec.split_records(self._buf)
+                if not records:
+                    data = self.fh.read(READ_CHUNK)
+                    if data:
+                        self._buf += data
+                        continue
+                    if not self._check_rotation(out):
+                        break
+                    continue
+                pending.extend(records)
+            raw = pending.popleft()
+            self.read_offset += len(raw) + 1
+            self._refresh_head()
+            out.append((codec.as_text(raw), self.inode, self.read_offset, self.head))
+        if pending:
+            # over max_lines; keep the rest for the next call
+            self._buf = b"".join(r + b"\n" for r in pending) + self._buf
+        return out
+
+    def _check_rotation(self, out):
+        """Switch to the new file after rotation, or rewind after truncation; False when nothing changed."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if st.st_ino != self.inode:
+            # drain what was appended to the old file before it was rotated away
+            data = self.fh.read(READ_CHUNK)
+            if data:
+                self._buf += data
+                return True
+            if self._buf.strip():
+                out.append((codec.as_text(self._buf), self.inode,
+                            self.read_offset + len(self._buf), self.head))
+            return self._reopen()
+        if st.st_size < self.read_offset + len(self._buf):
+            self.fh.seek(0)
+            self.read_offset = 0
+            self._buf = b""
+            return True
+        return False
+
+    def commit(self, entry):
+        """Persist the position just past `entry` so a restart resumes after it."""
+        self.committed = (entry[1], entry[2])
+        if not self.checkpoint:
+            return
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"path": self.path, "inode": entry[1], "offset": entry[2], "head": entry[3].hex(),
+                       "updated": time.time()}, fh)
+        os.replace(tmp, self.checkpoint)
+
+    def wait(self, timeout=None):
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._notifier:
+            # bounded wait as a safety net for filesystems that do not deliver events (NFS)
+            return self._notifier.wait(max(timeout, 1.0))
+        time.sleep(timeout)
+        return True
+
+    def lines(self):
+        """Yield lines forever, checkpointing each one after the consumer has processed it."""
+        while True:
+            entries = self.read_entries(max_lines=1000)
+            if not entries:
+                self.wait()
+                continue
+            for entry in entries:
+                yield entry[0]
+                self.commit(entry)
+
+    def close(self):
+        if self.fh:
+            self.fh.close()
+        if self._notifier:
+            self._notifier.close()
+
+def checkpoint_lag(path, checkpoint):
+    """Bytes of the active `path` past the position saved in `checkpoint` (all of it when the
+    checkpoint is still in a rotated segment); None without a checkpoint."""
+    try:
+        with open(checkpoint, "r") as fh:
+            cp = json.load(fh)
+        st = os.stat(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    if cp.get("inode") == st.st_ino:
+        return max(0, st.st_size - cp.get("offset", 0))
+    return st.st_size
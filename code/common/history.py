@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Searchable history of every decision and decoy action, behind /api/decisions and /api/actions
+
+SQLite in WAL mode, written by the AI module and the executor as they append to their logs.
+Each filterable column has an index ending in (ts, id), so a filtered page is one index range
+scan whatever the table size. Pages are newest first; the cursor is the (ts, id) of the last row.
+
+Rebuild from the logs (closed rotation segments included) with:
+    python3 code/common/history.py rebuild [decisions|actions]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import datetime
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import codec
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+HISTORY_DB = os.environ.get("FYP_HISTORY_DB", os.path.join(PROJECT_ROOT, "data", "history.db"))
+
+LOGS = {
+    "decisions": os.path.join(PROJECT_ROOT, "code/ai_module/logs/ai_decisions.jsonl"),
+    "actions": os.path.join(PROJECT_ROOT, "code/executor/decoy_actions.jsonl"),
+}
+
+MAX_PAGE = 500
+
+def parse_ts(value):
+    """Epoch seconds from an ISO timestamp, the "%d/%m/%Y - %H:%M:%S" UTC format or a number."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            dt = datetime.datetime.strptime(value, "%d/%m/%Y - %H:%M:%S")
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+# table -> indexed column -> field extractor
+COLUMNS = {
+    "decisions": {
+        "src_ip": lambda r: r.get("src_ip"),
+        "eventid": lambda r: r.get("eventid"),
+        "selected_action": lambda r: r.get("selected_action"),
+        "gen_id": lambda r: (r.get("meta") or {}).get("gen_id"),
+        "decision_id": lambda r: r.get("decision_id"),
+    },
+    "actions": {
+        "src_ip": lambda r: r.get("src_ip"),
+        "selected_action": lambda r: r.get("action") or r.get("selected_action"),
+        "gen_id": lambda r: r.get("gen_id"),
+        "file": lambda r: r.get("file"),
+    },
+}
+
+TIMESTAMP = {
+    "decisions": lambda r: parse_ts(r.get("timestamp_iso")) or parse_ts(r.get("timestamp")),
+    "actions": lambda r: parse_ts(r.get("timestamp")),
+}
+
+# the column that names a record (the before= parameter of /api/decisions and /api/actions)
+UNIQUE = {"decisions": "decision_id", "actions": "file"}
+
+# unique key per table, so a rebuild over a live index does not duplicate rows. Decision ids
+# used to be 32 bits, so older ones repeat across a large log; ts tells those apart.
+DEDUP = {"decisions": ("decision_id", "ts"), "actions": ("file",)}
+
+# replaced by the DEDUP indexes
+LEGACY_INDEXES = ("decisions_decision_id",)
+
+def _schema():
+    out = [f"DROP INDEX IF EXISTS {name};" for name in LEGACY_INDEXES]
+    for table, cols in COLUMNS.items():
+        col_defs = ", ".join(f"{c} TEXT" for c in cols)
+        out.append(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, ts REAL NOT NULL, "
+                   f"{col_defs}, record TEXT NOT NULL);")
+        out.append(f"CREATE INDEX IF NOT EXISTS {table}_ts ON {table} (ts, id);")
+        key = DEDUP[table]
+        out.append(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{'_'.join(key)} ON {table} ({', '.join(key)});")
+        for c in cols:
+            if c != key[0]:
+                out.append(f"CREATE INDEX IF NOT EXISTS {table}_{c} ON {table} ({c}, ts, id);")
+    return "\n".join(out)
+
+SCHEMA = _schema()
+
+class QueryError(ValueError):
+    pass
+
+def encode_cursor(ts, rowid):
+    return f"{ts!r}_{rowid}"
+
+def decode_cursor(cursor):
+    try:
+        ts, rowid = cursor.rsplit("_", 1)
+        return float(ts), int(rowid)
+    except (AttributeError, ValueError):
+        raise QueryError(f"invalid cursor: {cursor!r}")
+
+class HistoryIndex:
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, table, records, now):
+        cols = COLUMNS[table]
+        for r in records:
+            if not isinstance(r, dict):
+                continue
+            ts = TIMESTAMP[table](r) or now
+            vals = [get(r) for get in cols.values()]
+            yield [ts] + [None if v is None else str(v) for v in vals] + [codec.dumps(r)]
+
+    def record(self, table, records):
+        cols = COLUMNS[table]
+        sql = (f"INSERT OR IGNORE INTO {table} (ts, {', '.join(cols)}, record) "
+               f"VALUES ({', '.join('?' * (len(cols) + 2))})")
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(sql, self._rows(table, records, time.time()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query(self, table, filters=None, q=None, since=None, until=None, cursor=None, limit=50):
+        """One page, newest first: (records, next_cursor); next_cursor is None on the last page.
+
+        `q` matches any indexed column. Each column is its own LIMIT-bounded range scan on
+        (col, ts, id) and the pages are merged, so a common value never sorts every match.
+        """
+        cols = COLUMNS[table]
+        where, args = [], []
+        for col, value in (filters or {}).items():
+            if col not in cols:
+                raise QueryError(f"unknown filter: {col}")
+            where.append(f"{col} = ?")
+            args.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            args.append(until)
+        if cursor:
+            where.append("(ts, id) < (?, ?)")
+            args.extend(decode_cursor(cursor))
+        limit = max(1, min(int(limit), MAX_PAGE))
+        if q:
+            rows = {}
+            for c in cols:
+                for row in self._page(table, where + [f"{c} = ?"], args + [q], limit + 1):
+                    rows[row[0]] = row
+            rows = sorted(rows.values(), key=lambda r: (r[1], r[0]), reverse=True)[:limit + 1]
+        else:
+            rows = self._page(table, where, args, limit + 1)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if more else None
+        return [codec.loads(r[2]) for r in rows], next_cursor
+
+    def _page(self, table, where, args, limit):
+        sql = f"SELECT id, ts, record FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        return self._conn().execute(sql, args + [limit]).fetchall()
+
+    def cursor_for(self, table, col, value):
+        """Cursor positioned just after the record whose `col` equals `value`, or None."""
+        if col not in COLUMNS[table]:
+            raise QueryError(f"unknown column: {col}")
+        row = self._conn().execute(
+            f"SELECT id, ts FROM {table} WHERE {col} = ? ORDER BY ts DESC, id DESC LIMIT 1", (value,)).fetchone()
+        return encode_cursor(row[1], row[0]) if row else None
+
+    def actions_for(self, gen_ids):
+        """Latest action record per gen_id."""
+        gen_ids = [g for g in set(gen_ids) if g]
+        if not gen_ids:
+            return {}
+        rows = self._conn().execute(
+            f"SELECT gen_id, record FROM actions WHERE gen_id IN ({', '.join('?' * len(gen_ids))}) "
+            "ORDER BY ts, id", gen_ids).fetchall()
+        return {g: codec.loads(rec) for g, rec in rows}
+
+    def count(self, table):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def rebuild(self, table, path=None, batch=5000):
+        """Re-index a log from its closed segments and active file; returns the number of lines read."""
+        from common import rotation
+        n = 0
+        pending = []
+        for line in rotation.iter_lines(path or LOGS[table]):
+            try:
+                pending.append(codec.loads(line))
+            except ValueError:
+                continue
+            n += 1
+            if len(pending) >= batch:
+                self.record(table, pending)
+                pending = []
+        if pending:
+            self.record(table, pending)
+        return n
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HistoryIndex()
+    return _index
+
+def record(table, records):
+    """Best-effort update used by the writers; an index failure never blocks the pipeline."""
+    try:
+        get_index().record(table, records)
+    except Exception as e:
+        print("Error updating history index:", e)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("usage: history.py rebuild [decisions|actions]")
+        sys.exit(1)
+    for table in sys.argv[2:] or list(LOGS):
+        started = time.time()
+        lines = get_index().rebuild(table)
+        print(f"{table}: {lines} records indexed in {time.time() - started:.1f}s ({get_index().count(table)} total)")
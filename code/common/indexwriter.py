@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Background writer for the counters and history stores
+
+The decision and action writers hand their records over instead of writing SQLite inline.
+One thread per process takes everything queued since its last pass and writes it with one
+counters and one history transaction per stream, so under load many records share a
+commit. Up to FYP_INDEX_QUEUE records may wait; past that, submit() blocks until the
+thread catches up. Whatever is still queued at exit is written by an atexit flush.
+"""
+
+import os
+import atexit
+import threading
+import collections
+
+from common import counters, history
+
+INDEX_QUEUE = int(os.environ.get("FYP_INDEX_QUEUE", "10000"))
+
+class IndexWriter:
+    def __init__(self, maxsize=INDEX_QUEUE):
+        self.maxsize = max(1, maxsize)
+        self.stats = collections.Counter()
+        self._queue = []  # (stream, record)
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, stream, records):
+        """Queue records of `stream` ("decisions" or "actions") for the counters and history."""
+        with self._cond:
+            while len(self._queue) >= self.maxsize:
+                self.stats["full_waits"] += 1
+                self._cond.wait()
+            self._queue.extend((stream, r) for r in records)
+            if self._thread is None or self._thread.pid != os.getpid():
+                # a forked child does not inherit the parent's thread
+                self._thread = threading.Thread(target=self._run, name="index-writer", daemon=True)
+                self._thread.pid = os.getpid()
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _take(self):
+        """Everything queued, marked as being written; called with _cond held."""
+        batch, self._queue = self._queue, []
+        self._writing = True
+        self._cond.notify_all()
+        return batch
+
+    def _write(self, batch):
+        streams = {}
+        for stream, rec in batch:
+            streams.setdefault(stream, []).append(rec)
+        for stream, recs in streams.items():
+            # both are best-effort and print their own errors
+            counters.record(stream, recs)
+            history.record(stream, recs)
+        with self._cond:
+            self._writing = False
+            self.stats["batches"] += 1
+            self.stats["records"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue or self._writing:
+                    self._cond.wait()
+                batch = self._take()
+            self._write(batch)
+
+    def flush(self):
+        """Write whatever is queued now, in this thread if the writer thread is not at it."""
+        while True:
+            with self._cond:
+                while self._writing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = self._take()
+            self._write(batch)
+
+    def snapshot(self):
+        with self._cond:
+            batches = self.stats["batches"]
+            return dict(self.stats, queued=len(self._queue),
+                        records_per_batch=round(self.stats["records"] / batches, 2) if batches else None)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = IndexWriter()
+    return _writer
+
+def submit(stream, records):
+    get_writer().submit(stream, records)
+
+@atexit.register
+def flush_all():
+    if _writer is not None:
+        _writer.flush()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Per-process stats snapshots shared through a directory, for multi-process serving
+
+Each process registers snapshot callables, and one background thread writes their output
+every FYP_STATS_INTERVAL seconds to <FYP_STATS_DIR>/<name>.<host>.<pid>.json (atomic
+replace). A reader in any process collects the live snapshots of a name and merges them.
+Snapshots not refreshed within STALE_INTERVALS intervals belong to a process that has
+exited; collect() skips them and removes them. Hostname and pid keep containers that share
+the directory apart.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+
+PROJECT_ROOT = os.environ.get("FYP_PROJECT_ROOT", os.path.expanduser("~/FYP-Project"))
+STATS_DIR = os.environ.get("FYP_STATS_DIR", os.path.join(PROJECT_ROOT, "data", "procstats"))
+STATS_INTERVAL = float(os.environ.get("FYP_STATS_INTERVAL", "1.0"))
+STALE_INTERVALS = 5
+
+_sources = {}
+_lock = threading.Lock()
+_thread = None
+
+def _path(name):
+    return os.path.join(STATS_DIR, f"{name}.{socket.gethostname()}.{os.getpid()}.json")
+
+def publish(name, snapshot):
+    os.makedirs(STATS_DIR, exist_ok=True)
+    path = _path(name)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump({"pid": os.getpid(), "host": socket.gethostname(), "updated": time.time(),
+                   "stats": snapshot}, fh)
+    os.replace(tmp, path)
+
+def publish_all():
+    with _lock:
+        sources = list(_sources.items())
+    for name, snapshot in sources:
+        try:
+            publish(name, snapshot())
+        except Exception as e:
+            print(f"Error publishing {name} stats:", e)
+
+def _publish_loop():
+    while True:
+        publish_all()
+        time.sleep(STATS_INTERVAL)
+
+def register(name, snapshot):
+    """Publish `snapshot()` under `name` from now on, for as long as this process runs."""
+    global _thread
+    with _lock:
+        _sources[name] = snapshot
+        if _thread is None or _thread.pid != os.getpid():
+            # a forked child does not inherit the parent's thread
+            _thread = threading.Thread(target=_publish_loop, name="procstats", daemon=True)
+            _thread.pid = os.getpid()
+            _thread.start()
+
+def collect(name, now=None):
+    """Live snapshots published under `name`, one per process."""
+    if now is None:
+        now = time.time()
+    stale = max(STALE_INTERVALS * STATS_INTERVAL, 5.0)
+    out = []
+    try:
+        entries = os.listdir(STATS_DIR)
+    except FileNotFoundError:
+        return out
+    for fn in entries:
+        if not fn.startswith(name + ".") or not fn.endswith(".json"):
+            continue
+        path = os.path.join(STATS_DIR, fn)
+        try:
+            with open(path, "r") as fh:
+                doc = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        if now - doc.get("updated", 0) > stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        out.append(doc)
+    return sorted(out, key=lambda d: (d.get("host", ""), d.get("pid", 0)))
+
+def merge(snapshots, maxima=(), settings=()):
+    """Sum numeric fields across snapshots (recursing into dicts). Fields named in `maxima`
+    take the largest value. Fields named in `settings` (configuration every process shares)
+    and non-numeric fields keep the first snapshot's value."""
+    out = {}
+    for snap in snapshots:
+        for k, v in snap.items():
+            if k not in out:
+                out[k] = dict(v) if isinstance(v, dict) else v
+            elif isinstance(v, dict) and isinstance(out[k], dict):
+                out[k] = merge([out[k], v], maxima, settings)
+            elif k in settings:
+                continue
+            elif isinstance(v, (int, float)) and not isinstance(v, bool) and isinstance(out[k], (int, float)):
+                out[k] = max(out[k], v) if k in maxima else out[k] + v
+    return out
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Optional per-stage profiling of the decision path (FYP_PROFILE=1)
+
+A StageTimer is created for each decision and `lap(stage)` charges the time since the
+previous lap to that stage. When profiling is on, the stages that run before the decision
+is serialised are stored in meta["timings_ms"]. Every stage, including the log writes that
+follow serialisation, also goes into process-wide fixed-bucket histograms, which the
+webhook serves at /api/profile. With profiling off, lap() returns immediately.
+"""
+
+import os
+import time
+import bisect
+import threading
+
+PROFILE = os.environ.get("FYP_PROFILE", "0").lower() not in ("", "0", "false", "no", "off")
+
+# histogram upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class StageTimer:
+    def __init__(self, enabled=None):
+        self.enabled = PROFILE if enabled is None else enabled
+        self.timings = {}
+        self._start = self._last = time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last) * 1000.0
+        self._last = now
+
+    def as_meta(self):
+        out = {k: round(v, 3) for k, v in self.timings.items()}
+        out["total"] = round((time.perf_counter() - self._start) * 1000.0, 3)
+        return out
+
+class Histogram:
+    __slots__ = ("counts", "total", "n", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.n += 1
+        self.max = max(self.max, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the maximum for the open bucket)."""
+        if not self.n:
+            return None
+        rank = q * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else round(self.max, 3)
+        return round(self.max, 3)
+
+    def snapshot(self):
+        return {
+            "count": self.n,
+            "mean_ms": round(self.total / self.n, 4) if self.n else None,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets": [{"le": le, "count": c} for le, c in zip(list(BUCKETS_MS) + ["+Inf"], self.counts)],
+        }
+
+class StageHistograms:
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            for stage, ms in timings.items():
+                h = self._hists.get(stage)
+                if h is None:
+                    h = self._hists[stage] = Histogram()
+                h.add(ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: h.snapshot() for stage, h in sorted(self._hists.items())}
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+
+histograms = StageHistograms()
+
+def finish(timer):
+    """Fold a finished decision's stages (and its total) into the process histograms."""
+    if timer.enabled:
+        timings = dict(timer.timings)
+        timings["total"] = (time.perf_counter() - timer._start) * 1000.0
+        histograms.record(timings)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Typed schemas for the three record kinds the pipeline logs
+
+Events (the "data" of received_logs.json records) come from Cowrie and may carry any extra field; decisions
+(ai_decisions.jsonl) and actions (decoy_actions.jsonl) are written by this code. The
+TypedDicts document the fields the components rely on. decode() decodes a record and checks
+the declared fields' types. Unknown fields are kept rather than rejected, because Cowrie
+events vary by event type.
+"""
+
+from typing import Any, Dict, Optional, TypedDict
+
+from common import codec
+
+class Event(TypedDict, total=False):
+    eventid: str
+    src_ip: str
+    session: str
+    timestamp: str
+    event: str
+    type: str
+    coalesced: Dict[str, Any]
+
+class DecisionMeta(TypedDict, total=False):
+    gen_id: str
+    file_path: str
+    file_name: str
+    template_file: str
+    engage_duration_min: float
+
+class Decision(TypedDict, total=False):
+    timestamp: str
+    timestamp_iso: str
+    eventid: str
+    decision_id: str
+    src_ip: Optional[str]
+    response_mode: Optional[str]
+    response: str
+    prompt: Optional[str]
+    selected_action: str
+    confidence: float
+    meta: DecisionMeta
+    coalesced: Dict[str, Any]
+    trace: Dict[str, Any]
+
+class Action(TypedDict, total=False):
+    timestamp: str
+    timestamp_iso: str
+    src_ip: str
+    action: str
+    file: str
+    file_size: Optional[int]
+    gen_id: str
+    template: str
+    engage_duration_min: float
+    storage: str
+    body_sha: str
+    header: str
+    trace: Dict[str, Any]
+
+SCHEMAS = {"event": Event, "decision": Decision, "action": Action}
+# fields a record must carry to be usable at all
+REQUIRED = {"event": (), "decision": ("selected_action",), "action": ("file",)}
+
+_PY_TYPES = {str: str, float: (int, float), int: int, Dict[str, Any]: dict, Optional[str]: (str, type(None)),
+             Optional[int]: (int, type(None)), DecisionMeta: dict}
+
+class SchemaError(ValueError):
+    pass
+
+def check(kind, rec):
+    """Raise SchemaError unless `rec` is a dict whose declared fields have the declared types."""
+    if not isinstance(rec, dict):
+        raise SchemaError(f"{kind} is not an object")
+    for name in REQUIRED[kind]:
+        if not rec.get(name):
+            raise SchemaError(f"{kind} without {name}")
+    for name, tp in SCHEMAS[kind].__annotations__.items():
+        value = rec.get(name)
+        if value is not None and not isinstance(value, _PY_TYPES[tp]):
+            raise SchemaError(f"{kind}.{name} has type {type(value).__name__}")
+    return rec
+
+def decode(kind, raw):
+    """Typed decode of one record; raises SchemaError (or the codec's error) when it does not fit."""
+    return check(kind, codec.loads(raw))
+
+def safe_decode(kind, raw):
+    try:
+        return decode(kind, raw)
+    except Exception:
+        return None
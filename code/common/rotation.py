@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Size- and time-based rotation for the JSONL logs, with compressed closed segments
+
+The active file keeps its path. When it exceeds FYP_ROTATE_MAX_BYTES or is older than
+FYP_ROTATE_MAX_AGE seconds it is renamed to "<path>.<UTC time>.<sequence>" and compressed
+(zstd when the zstandard package is installed, else gzip) in a background thread.
+"<path>.manifest.json" lists the closed segments in order with their time range, record
+count and original inode, so readers can continue across segment boundaries.
+
+Appends and rotations from several processes are serialised with flock on "<path>.lock".
+The readers below work in records (JSON lines or codec frames, see codec.py), returned as
+str lines or bytes frames.
+"""
+
+import os
+import io
+import json
+import gzip
+import time
+import fcntl
+import datetime
+import threading
+import collections
+
+from common import codec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROTATE_MAX_BYTES = int(os.environ.get("FYP_ROTATE_MAX_BYTES", str(64 * 1024 * 1024)))
+ROTATE_MAX_AGE_S = float(os.environ.get("FYP_ROTATE_MAX_AGE", str(24 * 3600)))
+ROTATE_COMPRESSION = os.environ.get("FYP_ROTATE_COMPRESSION", "auto")  # auto | zstd | gzip | none
+ROTATE_KEEP = int(os.environ.get("FYP_ROTATE_KEEP", "0"))  # closed segments to keep, 0 = all
+
+def manifest_path(path):
+    return path + ".manifest.json"
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path), "r") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {"segments": [], "active": None}
+
+def write_manifest(path, manifest):
+    tmp = manifest_path(path) + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp, manifest_path(path))
+
+def open_segment(seg_path):
+    """Binary reader for a closed segment, whatever its compression."""
+    if seg_path.endswith(".gz"):
+        return gzip.open(seg_path, "rb")
+    if seg_path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {seg_path}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(seg_path, "rb"), closefd=True))
+    return open(seg_path, "rb")
+
+def _compression():
+    if ROTATE_COMPRESSION == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    return ROTATE_COMPRESSION
+
+class RotatingLog:
+    def __init__(self, path, max_bytes=ROTATE_MAX_BYTES, max_age=ROTATE_MAX_AGE_S,
+                 compression=None, keep=ROTATE_KEEP):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression or _compression()
+        self.keep = keep
+        self._tlock = threading.Lock()
+        self._lock_fh = None
+        self._active = (None, None)  # (inode, since)
+        # append-only descriptor kept open between writes, reopened when the path changes inode
+        self._fd = None
+        self._fd_inode = None
+        self._unsynced = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _flock(self):
+        if self._lock_fh is None:
+            self._lock_fh = open(self.path + ".lock", "a")
+        fcntl.flock(self._lock_fh, fcntl.LOCK_EX)
+
+    def _funlock(self):
+        fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+
+    def append(self, data, fsync=False):
+        """Append one or more complete records, rotating first if the active segment is due.
+
+        The whole buffer goes out in one O_APPEND write (looping only on a short write) under
+        the flock, so records from concurrent writers never interleave. With fsync=True the
+        data is flushed to disk before the lock is released.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self._tlock:
+            self._flock()
+            try:
+                st = self._maybe_rotate(len(data))
+                fd = self._open_fd(st)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                if fsync:
+                    os.fdatasync(fd)
+                else:
+                    self._unsynced = True
+            finally:
+                self._funlock()
+
+    def _open_fd(self, st):
+        """Descriptor for the current active file; `st` is its stat, or None after a rotation."""
+        if self._fd is not None and st is not None and st.st_ino == self._fd_inode:
+            return self._fd
+        self._close_fd()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        self._fd_inode = os.fstat(self._fd).st_ino
+        return self._fd
+
+    def _close_fd(self):
+        if self._fd is not None:
+            if self._unsynced:
+                # a rotated segment keeps what was written to it
+                os.fdatasync(self._fd)
+                self._unsynced = False
+            os.close(self._fd)
+            self._fd = None
+
+    def sync(self):
+        """fdatasync whatever was appended without fsync since the last sync; False when there was nothing."""
+        with self._tlock:
+            if self._fd is None or not self._unsynced:
+                return False
+            os.fdatasync(self._fd)
+            self._unsynced = False
+            return True
+
+    def _active_since(self, st):
+        inode, since = self._active
+        if inode == st.st_ino:
+            return since
+        manifest = read_manifest(self.path)
+        active = manifest.get("active") or {}
+        if active.get("inode") == st.st_ino:
+            since = active["since"]
+        else:
+            since = time.time()
+            manifest["active"] = {"inode": st.st_ino, "since": since}
+            write_manifest(self.path, manifest)
+        self._active = (st.st_ino, since)
+        return since
+
+    def _maybe_rotate(self, incoming):
+        """Rotate if due; returns the stat of the active file, or None when there is none now."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if st.st_size == 0:
+            return st
+        too_big = self.max_bytes > 0 and st.st_size + incoming > self.max_bytes
+        too_old = self.max_age > 0 and time.time() - self._active_since(st) > self.max_age
+        if too_big or too_old:
+            self.rotate(st)
+            return None
+        return st
+
+    def rotate(self, st=None):
+        """Close the active segment; caller holds the lock."""
+        st = st or os.stat(self.path)
+        since = self._active_since(st)
+        closed = time.time()
+        stamp = datetime.datetime.fromtimestamp(closed, datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        manifest = read_manifest(self.path)
+        seq = manifest.get("next_seq", len(manifest["segments"]))
+        seg_path = f"{self.path}.{stamp}.{seq:06d}"
+        os.rename(self.path, seg_path)
+        manifest["next_seq"] = seq + 1
+        manifest["segments"].append({
+            "file": os.path.basename(seg_path),
+            "inode": st.st_ino,
+            "start": since,
+            "end": closed,
+            "bytes": st.st_size,
+            "compression": "none",
+        })
+        manifest["active"] = None
+        write_manifest(self.path, manifest)
+        self._active = (None, None)
+        if self.compression != "none":
+            # non-daemon so a short-lived writer process finishes compressing before it exits
+            threading.Thread(target=self._compress, args=(seg_path,), name="log-compress").start()
+
+    def _compress(self, seg_path):
+        ext = ".zst" if self.compression == "zstd" else ".gz"
+        out_path = seg_path + ext
+        records = 0  # None once the segment turns out not to hold one record per line
+        try:
+            with open(seg_path, "rb") as src, open(out_path + ".tmp", "wb") as raw:
+                if ext == ".zst":
+                    dst = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+                else:
+                    dst = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+                rest = b""
+                for chunk in iter(lambda: src.read(1 << 20), b""):
+                    if records is not None:
+                        complete, rest = codec.split_records(rest + chunk)
+                        if not records and complete and not isinstance(codec.safe_loads(complete[0]), dict):
+                            # multi-line JSON (the pretty output log): its lines are not records
+                            records = None
+                        else:
+                            records += len(complete)
+                    dst.write(chunk)
+                dst.close()
+            os.replace(out_path + ".tmp", out_path)
+        except Exception as e:
+            print(f"Error compressing {seg_path}:", e)
+            return
+        with self._tlock:
+            self._flock()
+            try:
+                manifest = read_manifest(self.path)
+                for seg in manifest["segments"]:
+                    if seg["file"] == os.path.basename(seg_path):
+                        seg.update(file=os.path.basename(out_path), compression=self.compression,
+                                   compressed_bytes=os.path.getsize(out_path))
+                        if records is not None:
+                            seg["records"] = records
+                expired = manifest["segments"][:-self.keep] if self.keep > 0 else []
+                manifest["segments"] = manifest["segments"][len(expired):]
+                write_manifest(self.path, manifest)
+            finally:
+                self._funlock()
+        os.remove(seg_path)
+        for seg in expired:
+            try:
+                os.remove(os.path.join(os.path.dirname(self.path), seg["file"]))
+            except FileNotFoundError:
+                pass
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def get_log(path):
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = RotatingLog(path)
+    return log
+
+def append(path, data):
+    get_log(path).append(data)
+
+def segment_paths(path):
+    """Closed segments, oldest first, that still exist on disk."""
+    base = os.path.dirname(path)
+    out = []
+    for seg in read_manifest(path)["segments"]:
+        p = os.path.join(base, seg["file"])
+        if not os.path.exists(p):
+            # compressed after the manifest was read
+            p = next((p + ext for ext in (".zst", ".gz") if os.path.exists(p + ext)), None)
+        if p:
+            out.append((seg, p))
+    return out
+
+def tail_offset(fh, n, block=65536):
+    """Byte offset where the last n records of an open binary file start."""
+    end = fh.seek(0, os.SEEK_END)
+    base, buf = end, b""  # buf holds the file from `base` to the end
+    pos = end
+    found = 0
+    while pos > 0 and found < n:
+        start = codec.record_start(buf, pos - base, base)
+        if start is None:
+            if base == 0:
+                return 0
+            # not enough read to find this record's start; read another block backwards
+            step = max(block, end - base)
+            new_base = max(0, base - step)
+            fh.seek(new_base)
+            buf = fh.read(base - new_base) + buf
+            base = new_base
+            continue
+        pos = base + start
+        found += 1
+    return pos
+
+def iter_lines(path, include_active=True):
+    """All lines of a log across closed segments (oldest first) and the active file."""
+    for _, p in segment_paths(path):
+        try:
+            with open_segment(p) as fh:
+                for raw, _ in codec.iter_raw(fh):
+                    yield codec.as_text(raw)
+        except FileNotFoundError:
+            continue
+    if include_active:
+        try:
+            with open(path, "rb") as fh:
+                for raw, _ in codec.iter_raw(fh):
+                    yield codec.as_text(raw)
+        except FileNotFoundError:
+            pass
+
+def tail_segment_lines(path, n):
+    """Last n lines of the closed segments (newest segments are read first)."""
+    out = collections.deque()
+    for _, p in reversed(segment_paths(path)):
+        if len(out) >= n:
+            break
+        try:
+            with open_segment(p) as fh:
+                older = collections.deque((codec.as_text(r) for r, _ in codec.iter_raw(fh)), maxlen=n - len(out))
+        except FileNotFoundError:
+            continue
+        out.extendleft(reversed(older))
+    return list(out)
+
+def tail_lines(path, n=200):
+    """Last n lines, reaching back into closed segments when the active file is short."""
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(tail_offset(fh, n))
+            lines = [codec.as_text(r) for r, _ in codec.iter_raw(fh)]
+    except FileNotFoundError:
+        lines = []
+    if len(lines) < n:
+        lines = tail_segment_lines(path, n - len(lines)) + lines
+    return lines
+
+def lines_after(path, inode, offset, head=b"", head_len=64):
+    """(text, inode, end_offset, head) for lines past `offset` in the closed segment that had
+    `inode` and starts with `head`, followed by every later closed segment; empty if unknown."""
+    segs = segment_paths(path)
+    start = None
+    for i, (seg, p) in enumerate(segs):
+        if seg.get("inode") != inode:
+            continue
+        try:
+            with open_segment(p) as fh:
+                if fh.read(len(head)) == head:
+                    start = i
+        except FileNotFoundError:
+            continue
+    if start is None:
+        return
+    for i, (seg, p) in enumerate(segs[start:]):
+        pos = 0
+        skip = offset if i == 0 else 0
+        with open_segment(p) as fh:
+            seg_head = fh.read(head_len)
+        with open_segment(p) as fh:
+            for raw, size in codec.iter_raw(fh):
+                pos += size
+                if pos <= skip:
+                    continue
+                yield codec.as_text(raw), seg["inode"], pos, seg_head
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Trace IDs and per-stage latency across webhook -> AI module -> executor
+
+/cowrie-log gives every event a trace, stored as "trace" in its received_logs.json record.
+The decision and the decoy action records copy it. A trace holds an id, "t0" (the ISO UTC
+time it was assigned) and "stages": CLOCK_MONOTONIC seconds at each stage the record has
+passed:
+
+  received  /cowrie-log accepted the event
+  logged    the append to received_logs.json returned (not in the logged record itself)
+  decide    the decision engine started on it (after any coalescing hold or pipeline lag)
+  decided   the decision record was built, just before it was appended
+  acted     the executor stored the decoy
+
+The monotonic clock is shared by all processes on a host, so two stages stamped by
+different components can be compared directly. Add a stage's offset from "received" to t0
+to get its wall-clock time. A coalesced decision carries the trace of the latest event in
+its window. The pipeline process (serve.py) reads events back from the log without a logged
+stamp, so there the first interval is received_to_decide. With FYP_ENGINE_MODE=subprocess
+the webhook stamps decide and decided around each generator run, because the one-shot
+generator's own histograms end with it.
+
+Each process folds the time between consecutive stages (and received -> acted end to end)
+into fixed-bucket histograms, and counts errors by name. The webhook's /metrics merges
+them from every process through procstats.
+"""
+
+import time
+import secrets
+import datetime
+import threading
+import collections
+
+from common import profiling
+
+STAGES = ("received", "logged", "decide", "decided", "acted")
+
+_hists = {}
+_errors = collections.Counter()
+_lock = threading.Lock()
+
+def now():
+    return round(time.monotonic(), 6)
+
+def new_trace():
+    return {"id": secrets.token_hex(8), "t0": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "stages": {"received": now()}}
+
+def _observe(name, ms):
+    with _lock:
+        h = _hists.get(name)
+        if h is None:
+            h = _hists[name] = profiling.Histogram()
+        h.add(ms)
+
+def mark(trace, stage):
+    """Stamp `stage` on a trace (ignored when there is none) and record the time since the stage before it."""
+    if not isinstance(trace, dict):
+        return trace
+    stages = trace.setdefault("stages", {})
+    t = now()
+    stages[stage] = t
+    prev = next((s for s in reversed(STAGES[:STAGES.index(stage)]) if s in stages), None)
+    if prev is not None:
+        ms = (t - stages[prev]) * 1000.0
+        if ms < 0:
+            # stamped on another host (or another clock)
+            error("trace_clock_skew")
+        else:
+            _observe(f"{prev}_to_{stage}", ms)
+            if stage == "acted" and "received" in stages:
+                _observe("end_to_end", (t - stages["received"]) * 1000.0)
+    return trace
+
+def copy(trace):
+    """Copy of a trace for a new record, so stamping it leaves the source record untouched."""
+    if not isinstance(trace, dict):
+        return None
+    return dict(trace, stages=dict(trace.get("stages") or {}))
+
+def error(name, n=1):
+    with _lock:
+        _errors[name] += n
+
+def snapshot():
+    """Histograms and error counts in a form procstats.merge() can add up across processes."""
+    with _lock:
+        latency = {}
+        for name, h in _hists.items():
+            buckets = {str(le): c for le, c in zip(list(profiling.BUCKETS_MS) + ["+Inf"], h.counts)}
+            latency[name] = {"count": h.n, "sum_ms": round(h.total, 3), "buckets": buckets}
+        return {"latency": latency, "errors": dict(_errors)}
@@ -1,44 +1,50 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import time
 import datetime
 import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import appender, codec, decoystore, indexwriter, procstats, records, tracing
+from common.follower import FileFollower
 
 BASE = os.path.expanduser("~/FYP-Project")
 DECISIONS_LOG = os.path.join(BASE, "code/ai_module/logs/ai_decisions.jsonl")
-DECOY_DIR = os.path.join(BASE, "assets/ai_generated")
+DECOY_DIR = decoystore.DECOY_DIR
 DECOY_ACTIONS = os.path.join(BASE, "code/executor/decoy_actions.jsonl")
+# decisions that could not be acted on, with the error; the checkpoint moves past them
+FAILED_DECISIONS = os.path.join(BASE, "code/executor/failed_decisions.jsonl")
+# byte offset into DECISIONS_LOG of the last decision acted on
+EXECUTOR_CHECKPOINT = os.path.join(BASE, "code/executor/executor.offset.json")
+# batch size 1 keeps the one-decision-at-a-time loop
+EXECUTOR_BATCH = int(os.environ.get("FYP_EXECUTOR_BATCH", "64"))
+EXECUTOR_WORKERS = int(os.environ.get("FYP_EXECUTOR_WORKERS", "4"))
 
 os.makedirs(DECOY_DIR, exist_ok=True)
 os.makedirs(os.path.dirname(DECOY_ACTIONS), exist_ok=True)
 open(DECISIONS_LOG, "a").close()
 open(DECOY_ACTIONS, "a").close()
 
-def follow(path):
-    with open(path, "r") as fh:
-        fh.seek(0, os.SEEK_END)
-        while True:
-            line = fh.readline()
-            if not line:
-                time.sleep(0.5)
-                continue
-            yield line
+def follow(path, checkpoint=EXECUTOR_CHECKPOINT):
+    return FileFollower(path, checkpoint=checkpoint).lines()
 
 def write_jsonl(path, record):
-    with open(path, "a") as fh:
-        fh.write(json.dumps(record) + "\n")
+    appender.append(path, codec.encode_record(record))
 
-def perform_action(decision):
+def write_jsonl_many(path, recs):
+    appender.append(path, codec.encode_records(recs))
+
+def prepare_action(decision):
+    """Build the decoy name, header, body and action record for a decision without touching disk."""
     formatted_ts = datetime.datetime.utcnow().strftime("%d/%m/%Y - %H:%M:%S")
     ts_compact = datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    src_ip = decision.get("src_ip", "unknown").replace(":", "-").replace("/", "-")
+    src_ip = (decision.get("src_ip") or "unknown").replace(":", "-").replace("/", "-")
     action = decision.get("selected_action", "create_decoy_file")
 
     gen_id = decision.get("meta", {}).get("gen_id", "")
     base_name = f"{action}_{src_ip}_{ts_compact}_{gen_id}.txt"
-    fpath = os.path.join(DECOY_DIR, base_name)
 
     ai_text = decision.get("response") or decision.get("description", "")
     meta = decision.get("meta", {})
@@ -53,38 +59,100 @@ def perform_action(decision):
         "",
     ]
 
-    content = "\n".join(header) + "\n" + ai_text + "\n"
-
-    with open(fpath, "w") as fh:
-        fh.write(content)
-
-    engage_duration = round(random.uniform(0.5, 5.0), 2)
-    size = os.path.getsize(fpath)
-
     rec = {
         "timestamp": formatted_ts,
+        "timestamp_iso": datetime.datetime.now(datetime.timezone.utc).isoformat(),
         "src_ip": src_ip,
         "action": action,
-        "file": fpath,
-        "file_size": size,
+        "file": None,
+        "file_size": None,
         "gen_id": gen_id,
         "template": meta.get("template_file", "builtin"),
-        "engage_duration_min": engage_duration
+        "engage_duration_min": round(random.uniform(0.5, 5.0), 2)
     }
+    trace = tracing.copy(decision.get("trace"))
+    if trace:
+        rec["trace"] = trace
+    # only the header differs between decisions with the same response, so the body is shared
+    return base_name, ("\n".join(header) + "\n").encode("utf-8"), (ai_text + "\n").encode("utf-8"), rec
+
+def write_decoy(name, header, body, rec):
+    decoystore.get_store().store(rec, rec["src_ip"], name, header, body)
+    return rec["file_size"]
+
+def perform_action(decision):
+    name, header, body, rec = prepare_action(decision)
+    size = write_decoy(name, header, body, rec)
+    tracing.mark(rec.get("trace"), "acted")
+    fpath = rec["file"]
 
     write_jsonl(DECOY_ACTIONS, rec)
-    print(f"[Executor] Created decoy: {fpath} ({size} bytes, Engage: {engage_duration} min)")
+    indexwriter.submit("actions", [rec])
+    print(f"[Executor] Created decoy: {fpath} ({size} bytes, Engage: {rec['engage_duration_min']} min)")
     return rec
 
-if __name__ == "__main__":
-    print("[Executor] Watching for AI decisions...")
-    for raw in follow(DECISIONS_LOG):
+def record_failure(decision, error, stage):
+    """Keep a decision that could not be acted on, with its error, in FAILED_DECISIONS."""
+    tracing.error(stage)
+    print(f"[Executor] Failed to act on decision {decision.get('decision_id')}: {error!r}")
+    write_jsonl(FAILED_DECISIONS, {
+        "timestamp_iso": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "stage": stage,
+        "error": f"{type(error).__name__}: {error}",
+        "decision": decision,
+    })
+
+def perform_actions(decisions, pool):
+    """Write a batch of decoys through the pool and append all action records in one write."""
+    jobs = []
+    for d in decisions:
         try:
-            dec = json.loads(raw)
-        except Exception:
-            continue
-
-        if not dec.get("selected_action"):
+            jobs.append((d, prepare_action(d)))
+        except Exception as e:
+            record_failure(d, e, "decision_prepare")
+    futures = [pool.submit(write_decoy, *job) for _, job in jobs]
+    recs = []
+    for (d, (_, _, _, rec)), fut in zip(jobs, futures):
+        try:
+            fut.result()
+        except Exception as e:
+            record_failure(d, e, "decoy_write")
             continue
+        tracing.mark(rec.get("trace"), "acted")
+        recs.append(rec)
+    if recs:
+        write_jsonl_many(DECOY_ACTIONS, recs)
+        indexwriter.submit("actions", recs)
+    print(f"[Executor] Created {len(recs)}/{len(decisions)} decoys ({sum(r['file_size'] for r in recs)} bytes)")
+    return recs
+
+def parse_decision(raw):
+    dec = records.safe_decode("decision", raw)
+    if dec is None and raw.strip():
+        tracing.error("decision_parse")
+    return dec
+
+def run_batched(follower, batch_size=EXECUTOR_BATCH, workers=EXECUTOR_WORKERS):
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decoy") as pool:
+        while True:
+            entries = follower.read_entries(max_lines=batch_size)
+            if not entries:
+                follower.wait()
+                continue
+            decisions = [d for d in (parse_decision(e[0]) for e in entries) if d]
+            if decisions:
+                perform_actions(decisions, pool)
+            follower.commit(entries[-1])
 
-        perform_action(dec)
+if __name__ == "__main__":
+    print("[Executor] Watching for AI decisions...")
+    procstats.register("trace", tracing.snapshot)
+    if EXECUTOR_BATCH > 1:
+        run_batched(FileFollower(DECISIONS_LOG, checkpoint=EXECUTOR_CHECKPOINT))
+    for raw in follow(DECISIONS_LOG):
+        dec = parse_decision(raw)
+        if dec:
+            try:
+                perform_action(dec)
+            except Exception as e:
+                record_failure(dec, e, "decoy_write")
@@ -1,33 +1,67 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify, render_template_string
-import json, datetime, os, subprocess, collections, html, time
+from flask import Flask, request, jsonify, render_template_string, Response
+import datetime, os, sys, time
+from engine import DecisionEngine, CODE_DIR
+from ingest import IngestQueue, QUEUED, REJECTED
+from coalesce import Coalescer
+from tailcache import MetricsCache
+from preview import PreviewCache, PreviewError, PAGE_SIZE, MAX_PAGE
+from pipeline import engine_snapshot, llm_snapshot, profile_snapshot, PIPELINE_CHECKPOINT
+from werkzeug.http import http_date
+
+sys.path.insert(0, CODE_DIR)
+from common import appender, codec, counters, decoystore, exposition, history, procstats, profiling, tracing
+from common.follower import checkpoint_lag
 
 app = Flask(__name__)
 
+# all: every route and the decision pipeline in one process (the development server)
+# ingest: /cowrie-log only; accepted events are appended for the pipeline process (pipeline.py)
+# dashboard: the dashboard and read-only APIs
+# serve.py runs ingest and dashboard under gunicorn, next to one pipeline process
+WEB_ROLE = os.environ.get("FYP_WEB_ROLE", "all")
+INGEST_ENDPOINTS = {"receive_log", "receive_log_batch", "ingest_stats"}
+
 BASE = os.path.expanduser("~/FYP-Project")
 AI_DECISIONS = os.path.join(BASE, "code/ai_module/logs/ai_decisions.jsonl")
 RECEIVED_LOGS = os.path.join(BASE, "code/webhook/received_logs.json")
 DECOY_ACTIONS = os.path.join(BASE, "code/executor/decoy_actions.jsonl")
-AI_GEN_DIR = os.path.join(BASE, "assets/ai_generated")
+EXECUTOR_CHECKPOINT = os.path.join(BASE, "code/executor/executor.offset.json")
+AI_GEN_DIR = decoystore.DECOY_DIR
 
 os.makedirs(os.path.dirname(AI_DECISIONS), exist_ok=True)
 os.makedirs(os.path.dirname(RECEIVED_LOGS), exist_ok=True)
 os.makedirs(os.path.dirname(DECOY_ACTIONS), exist_ok=True)
 os.makedirs(AI_GEN_DIR, exist_ok=True)
 
-def tail_lines(path, n=200):
-    try:
-        with open(path) as fh:
-            lines = list(collections.deque(fh, n))
-            return [l.rstrip("\n") for l in lines]
-    except FileNotFoundError:
-        return []
-
-def safe_json(line):
-    try:
-        return json.loads(line)
-    except Exception:
-        return None
+if WEB_ROLE not in ("all", "ingest", "dashboard"):
+    raise ValueError(f"unknown web role: {WEB_ROLE}")
+if WEB_ROLE == "all":
+    engine = DecisionEngine(script=os.path.join(BASE, "code/ai_module/generate_deception_action.py"))
+    coalescer = Coalescer(engine.decide)
+else:
+    engine = coalescer = None
+
+def process_ingest_batch(records):
+    appender.append(RECEIVED_LOGS, codec.encode_records(records))
+    # stamped once the write has returned, so only the events offered below carry it
+    for r in records:
+        tracing.mark(r["trace"], "logged")
+    counters.record("received", records)
+    if coalescer is None:
+        return
+    for r in records:
+        try:
+            coalescer.offer(dict(r["data"], trace=r["trace"]))
+        except Exception as e:
+            tracing.error("decision")
+            print("Decision error:", e)
+
+ingest_queue = IngestQueue(process_ingest_batch) if WEB_ROLE != "dashboard" else None
+if WEB_ROLE == "ingest":
+    procstats.register("ingest", ingest_queue.stats)
+if WEB_ROLE != "dashboard":
+    procstats.register("trace", tracing.snapshot)
 
 def now_iso():
     return datetime.datetime.now(datetime.timezone.utc).isoformat()
@@ -42,42 +76,211 @@ def normalize_path_for_host(path):
         return path.replace("/home/kali/FYP-Project", BASE)
     return path
 
-def load_decoy_actions_index():
-    out = {}
-    lines = tail_lines(DECOY_ACTIONS, 1000)
-    for ln in lines:
-        obj = safe_json(ln)
-        if not obj:
-            continue
-        f = obj.get("file")
-        if f:
-            out[f] = obj
-        gen = obj.get("gen_id")
-        if gen:
-            out[gen] = obj
-    return out
+def dashboard_counts():
+    totals = counters.get_store().totals()
+    return {"received": totals["received"], "ai": totals["decisions"], "actions": totals["actions"]}
+
+metrics_cache = MetricsCache(RECEIVED_LOGS, AI_DECISIONS, DECOY_ACTIONS, normalize_path_for_host,
+                             counts=dashboard_counts)
+
+@app.before_request
+def route_for_role():
+    if WEB_ROLE == "ingest" and request.endpoint not in INGEST_ENDPOINTS or \
+            WEB_ROLE == "dashboard" and request.endpoint in ("receive_log", "receive_log_batch"):
+        return jsonify({"error": f"not served by the {WEB_ROLE} role"}), 404
+
+def pipeline_stats():
+    """Stats published by the pipeline process, or {} when it is not running."""
+    docs = procstats.collect("pipeline")
+    return max(docs, key=lambda d: d["updated"])["stats"] if docs else {}
 
 @app.route("/cowrie-log", methods=["POST"])
 def receive_log():
     try:
         data = request.get_json(force=True)
+        status = ingest_queue.offer({"timestamp": now_iso(), "trace": tracing.new_trace(), "data": data})
+        if status == REJECTED:
+            resp = jsonify({"status": "error", "message": "ingest queue full"})
+            resp.headers["Retry-After"] = str(ingest_queue.retry_after)
+            return resp, 429
+        return jsonify({"status": status, "message": "AI action queued" if status == QUEUED else "event discarded by overflow policy"}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+def parse_event_batch(body):
+    """Parse a JSON array (or single object) or NDJSON body into [(event, error)]."""
+    text = body.decode("utf-8", errors="replace").strip()
+    if not text:
+        return []
+    try:
+        doc = codec.loads(text)
+        items = doc if isinstance(doc, list) else [doc]
+        parsed = [(x, None) for x in items]
+    except ValueError:
+        parsed = []
+        for ln in text.splitlines():
+            if not ln.strip():
+                continue
+            try:
+                parsed.append((codec.loads(ln), None))
+            except ValueError as e:
+                parsed.append((None, f"invalid JSON: {e}"))
+    return [(x, err or (None if isinstance(x, dict) else "event is not a JSON object")) for x, err in parsed]
+
+@app.route("/cowrie-log/batch", methods=["POST"])
+def receive_log_batch():
+    try:
+        items = parse_event_batch(request.get_data())
         ts = now_iso()
-        with open(RECEIVED_LOGS, "a") as f:
-            f.write(json.dumps({"timestamp": ts, "data": data}) + "\n")
-
-        ai_input = os.path.join(BASE, "code/ai_module/inputs/incoming_event.json")
-        os.makedirs(os.path.dirname(ai_input), exist_ok=True)
-        with open(ai_input, "w") as f:
-            json.dump(data, f)
-
-        subprocess.run(
-            ["python3", os.path.join(BASE, "code/ai_module/generate_deception_action.py")],
-            check=False,
-        )
-        return jsonify({"status": "success", "message": "AI action triggered"})
+        results = [None] * len(items)
+        valid = []
+        for i, (data, err) in enumerate(items):
+            if err:
+                results[i] = {"index": i, "status": "rejected", "error": err}
+            else:
+                valid.append(i)
+        statuses = ingest_queue.offer_batch([{"timestamp": ts, "trace": tracing.new_trace(), "data": items[i][0]}
+                                             for i in valid])
+        for i, status in zip(valid, statuses):
+            results[i] = {"index": i, "status": "accepted" if status == QUEUED else "rejected", "reason": status}
+        accepted = sum(1 for r in results if r["status"] == "accepted")
+        out = {"status": "success", "accepted": accepted, "rejected": len(results) - accepted, "results": results}
+        if valid and all(s == REJECTED for s in statuses):
+            out["status"] = "error"
+            out["message"] = "ingest queue full"
+            resp = jsonify(out)
+            resp.headers["Retry-After"] = str(ingest_queue.retry_after)
+            return resp, 429
+        return jsonify(out), 202
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/api/counters")
+def counter_stats():
+    store = counters.get_store()
+    stream = request.args.get("stream", "decisions")
+    if stream not in counters.DIMENSIONS:
+        return jsonify({"error": f"unknown stream: {stream}"}), 400
+    dims = counters.DIMENSIONS[stream]
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify({
+        "stream": stream,
+        "total": store.total(stream),
+        "last_minute": store.window(stream, 60),
+        "last_hour": store.window(stream, 3600),
+        "last_day": store.window(stream, 86400),
+        "by": {dim: store.breakdown(stream, dim, limit) for dim in dims},
+        "per_minute": store.series(stream, "minute", time.time() - 3600),
+        "per_hour": store.series(stream, "hour", time.time() - 86400),
+    })
+
+def history_page(table):
+    """Shared handler for /api/decisions and /api/actions."""
+    index = history.get_index()
+    args = request.args
+    filters = {c: args[c] for c in history.COLUMNS[table] if args.get(c)}
+    try:
+        cursor = args.get("cursor")
+        if not cursor and args.get("before"):
+            # resume after a record the client already shows (decision_id / decoy file)
+            cursor = index.cursor_for(table, history.UNIQUE[table], args["before"])
+            if cursor is None:
+                return jsonify({"error": f"unknown record: {args['before']}"}), 404
+        bounds = {}
+        for name in ("since", "until"):
+            if args.get(name):
+                bounds[name] = history.parse_ts(args[name])
+                if bounds[name] is None:
+                    raise history.QueryError(f"invalid {name}: {args[name]!r}")
+        records, next_cursor = index.query(table, filters, q=args.get("q", "").strip() or None,
+                                           cursor=cursor, limit=args.get("limit", 50, type=int), **bounds)
+    except history.QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    if table == "decisions":
+        linked = index.actions_for((d.get("meta") or {}).get("gen_id") for d in records)
+        records = [metrics_cache.public(metrics_cache.enrich(d, linked.get((d.get("meta") or {}).get("gen_id"))))
+                   for d in records]
+    return jsonify({"items": records, "next_cursor": next_cursor})
+
+@app.route("/api/decisions")
+def query_decisions():
+    return history_page("decisions")
+
+@app.route("/api/actions")
+def query_actions():
+    return history_page("actions")
+
+@app.route("/api/llm/stats")
+def llm_stats():
+    if engine is None:
+        return jsonify(pipeline_stats().get("llm", {"enabled": False}))
+    return jsonify(llm_snapshot())
+
+@app.route("/api/engine/stats")
+def engine_stats():
+    if engine is None:
+        return jsonify(pipeline_stats().get("engine", {"mode": None}))
+    return jsonify(engine_snapshot(engine))
+
+@app.route("/api/profile")
+def profile_stats():
+    """Per-stage decision timing histograms (FYP_PROFILE=1, in-process engine only)."""
+    if engine is None:
+        # reset only applies to the histograms of this process
+        return jsonify(pipeline_stats().get("profile", {"enabled": False, "stages": {}}))
+    if request.args.get("reset"):
+        profiling.histograms.reset()
+    return jsonify(profile_snapshot(engine))
+
+# per-process configuration in the ingest and coalescer snapshots, not summed across processes
+INGEST_SETTINGS = ("maxsize", "batch_size", "workers", "overflow", "window_s", "decoy_rate_per_min", "decoy_burst")
+
+def ingest_snapshot():
+    if engine is not None:
+        return dict(ingest_queue.stats(), coalesce=coalescer.stats())
+    docs = procstats.collect("ingest")
+    out = procstats.merge([d["stats"] for d in docs], maxima=("max_depth_seen",), settings=INGEST_SETTINGS)
+    pipeline = pipeline_stats()
+    out.update(processes=len(docs), coalesce=pipeline.get("coalesce"),
+               pipeline={k: pipeline.get(k) for k in ("processed", "skipped", "errors", "lag_bytes")})
+    return out
+
+@app.route("/api/ingest/stats")
+def ingest_stats():
+    return jsonify(ingest_snapshot())
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition: stage latencies, queue/lag gauges, record totals and error counters."""
+    trace = procstats.merge([d["stats"] for d in procstats.collect("trace")])
+    ingest = ingest_snapshot()
+    coalesce = ingest.get("coalesce") or {}
+    totals = counters.get_store().totals()
+    lines = exposition.histogram(
+        "fyp_stage_latency_seconds", "Time between consecutive trace stages, and received to acted (end_to_end)",
+        [({"stage": name}, snap) for name, snap in sorted(trace.get("latency", {}).items())])
+    lines += exposition.family("fyp_records_total", "counter", "Records written per log",
+                               [({"stream": k}, v) for k, v in sorted(totals.items())])
+    lines += exposition.family("fyp_ingest_events_total", "counter", "Events offered to the ingest queue by outcome",
+                               [({"status": k}, ingest.get(k, 0)) for k in ("queued", "rejected", "dropped", "sampled_out")])
+    lines += exposition.family("fyp_ingest_queue_depth", "gauge", "Events waiting in the ingest queues",
+                               [({}, ingest.get("depth", 0))])
+    lines += exposition.family("fyp_coalesce_held_events", "gauge", "Events held in coalescing windows",
+                               [({}, coalesce.get("held", 0))])
+    lags = [({"follower": "executor", "log": "ai_decisions.jsonl"}, checkpoint_lag(AI_DECISIONS, EXECUTOR_CHECKPOINT)),
+            ({"follower": "pipeline", "log": "received_logs.json"}, checkpoint_lag(RECEIVED_LOGS, PIPELINE_CHECKPOINT))]
+    lines += exposition.family("fyp_follower_lag_bytes", "gauge", "Bytes of a log not yet processed by its follower",
+                               [(labels, v) for labels, v in lags if v is not None])
+    pool = (engine_snapshot(engine) if engine is not None else pipeline_stats().get("engine") or {}).get("decoy_pool")
+    if pool:
+        lines += exposition.family("fyp_decoy_pool_depth", "gauge", "Pre-generated decoys ready per prompt set",
+                                   [({"key": k}, v) for k, v in sorted(pool["depth"].items())])
+    errors = dict(trace.get("errors", {}))
+    errors["ingest"] = ingest.get("errors", 0)
+    lines += exposition.family("fyp_errors_total", "counter", "Errors by pipeline stage",
+                               [({"stage": k}, v) for k, v in sorted(errors.items())])
+    return Response(exposition.render(lines), mimetype=None, content_type=exposition.CONTENT_TYPE)
+
 DASHBOARD_HTML = """<!doctype html>
 <html lang="en">
 <head>
@@ -105,6 +308,8 @@ tr:hover { background:rgba(43,155,215,0.035); cursor:pointer; }
 pre { background:#f3f7fa; padding:14px; border-radius:8px; color:#072029; white-space:pre-wrap; word-break:break-word; border:1px solid rgba(43,155,215,0.08); font-size:0.98rem; }
 .close { float:right; color:var(--accent); cursor:pointer; font-size:1.6rem; }
 .note { color:var(--muted); font-size:0.98rem; margin-top:8px; }
+.search { display:flex; gap:12px; align-items:center; margin-bottom:10px; }
+.search input { flex:1; max-width:480px; padding:8px 10px; font-size:1rem; border:1px solid rgba(43,155,215,0.3); border-radius:6px; }
 </style>
 </head>
 <body>
@@ -117,7 +322,11 @@ pre { background:#f3f7fa; padding:14px; border-radius:8px; color:#072029; white-
   </div>
   <div class="panel">
     <h3>Recent AI Decisions</h3>
-    <div style="overflow:auto; max-height:420px;">
+    <div class="search">
+      <input id="search" type="search" placeholder="Search by source IP, event ID, action, gen ID or decision ID" aria-label="Search decisions">
+      <span id="search-status" class="muted"></span>
+    </div>
+    <div id="decision-scroll" style="overflow:auto; max-height:420px;">
       <table id="decision-table" aria-live="polite">
         <thead>
           <tr>
@@ -147,33 +356,163 @@ pre { background:#f3f7fa; padding:14px; border-radius:8px; color:#072029; white-
 <footer>© 2025 — Use arrow keys to navigate the table rows. Click a row to inspect details.</footer>
 
 <script>
+const MAX_ROWS = 200;
+const PAGE_SIZE = 100;
+let streamCursor = null;
+let stream = null;
+const rowsByGen = {};
+// older rows come from /api/decisions as the table is scrolled; a search query switches
+// the table from the live feed to history results
+let maxRows = MAX_ROWS;
+let searchQuery = '';
+let olderCursor = null;
+let historyDone = false;
+let loadingOlder = false;
+
+function setCounts(counts){
+  if(!counts) return;
+  document.getElementById('rec-count').textContent = counts.received;
+  document.getElementById('ai-count').textContent = counts.ai;
+  document.getElementById('decoy-count').textContent = counts.actions;
+}
+
+function rowCells(dec){
+  return `<td>${dec.timestamp||''}</td><td>${dec.src_ip||''}</td><td>${dec.eventid||''}</td><td>${dec.selected_action||''}</td><td>${(dec.engage_duration_min||'-')}</td><td>${(dec.confidence||0).toFixed(2)}</td>`;
+}
+
+function renderRow(dec){
+  const tr = document.createElement('tr');
+  tr.tabIndex = 0;
+  tr.innerHTML = rowCells(dec);
+  if(dec.decision_id) tr.dataset.id = dec.decision_id;
+  tr.onclick = () => showDetails(dec);
+  tr.onkeydown = (e) => { if(e.key === 'Enter') showDetails(dec); };
+  const gen = (dec.meta||{}).gen_id;
+  if(gen) rowsByGen[gen] = {tr: tr, dec: dec};
+  return tr;
+}
+
+function trimRows(tbody){
+  while(tbody.rows.length > maxRows){
+    const last = tbody.rows[tbody.rows.length - 1];
+    for(const g in rowsByGen){ if(rowsByGen[g].tr === last) delete rowsByGen[g]; }
+    tbody.removeChild(last);
+  }
+}
+
 async function loadData(){
   try {
     const res = await fetch('/api/metrics');
     const data = await res.json();
-    document.getElementById('rec-count').textContent = data.counts.received;
-    document.getElementById('ai-count').textContent = data.counts.ai;
-    document.getElementById('decoy-count').textContent = data.counts.actions;
+    setCounts(data.counts);
+    streamCursor = data.cursor;
+    if(searchQuery) return;
 
     const tbody = document.querySelector('#decision-table tbody');
+    resetHistory();
     tbody.innerHTML = '';
+    for(const g in rowsByGen) delete rowsByGen[g];
     const decisions = data.decisions;
     if(!decisions || decisions.length===0){
-      tbody.innerHTML = '<tr><td colspan="6" class="muted">No AI decisions yet</td></tr>';
+      tbody.innerHTML = '<tr class="empty"><td colspan="6" class="muted">No AI decisions yet</td></tr>';
       return;
     }
 
     for(const dec of decisions){
-      const tr = document.createElement('tr');
-      tr.tabIndex = 0;
-      tr.innerHTML = `<td>${dec.timestamp||''}</td><td>${dec.src_ip||''}</td><td>${dec.eventid||''}</td><td>${dec.selected_action||''}</td><td>${(dec.engage_duration_min||'-')}</td><td>${(dec.confidence||0).toFixed(2)}</td>`;
-      tr.onclick = () => showDetails(dec);
-      tr.onkeydown = (e) => { if(e.key === 'Enter') showDetails(dec); };
-      tbody.appendChild(tr);
+      tbody.appendChild(renderRow(dec));
     }
   } catch (e) { console.error("loadData error", e); }
 }
 
+function resetHistory(){
+  olderCursor = null;
+  historyDone = false;
+  maxRows = MAX_ROWS;
+}
+
+async function loadOlder(){
+  if(loadingOlder || historyDone) return;
+  const tbody = document.querySelector('#decision-table tbody');
+  let url = '/api/decisions?limit=' + PAGE_SIZE;
+  if(searchQuery) url += '&q=' + encodeURIComponent(searchQuery);
+  if(olderCursor){
+    url += '&cursor=' + encodeURIComponent(olderCursor);
+  } else if(!searchQuery){
+    const rows = tbody.querySelectorAll('tr[data-id]');
+    if(!rows.length) return;
+    url += '&before=' + encodeURIComponent(rows[rows.length - 1].dataset.id);
+  }
+  const query = searchQuery;
+  loadingOlder = true;
+  try {
+    const res = await fetch(url);
+    const page = await res.json();
+    if(query !== searchQuery) return;
+    if(page.error){ historyDone = true; return; }
+    const empty = tbody.querySelector('tr.empty');
+    if(empty) tbody.removeChild(empty);
+    for(const dec of page.items) tbody.appendChild(renderRow(dec));
+    if(!tbody.rows.length){
+      tbody.innerHTML = '<tr class="empty"><td colspan="6" class="muted">No matching decisions</td></tr>';
+    }
+    maxRows = Math.max(maxRows, tbody.rows.length);
+    olderCursor = page.next_cursor;
+    historyDone = !page.next_cursor;
+    document.getElementById('search-status').textContent = searchQuery
+      ? `${tbody.querySelectorAll('tr[data-id]').length}${historyDone ? '' : '+'} matches` : '';
+  } catch (e) { console.error("loadOlder error", e); }
+  finally { loadingOlder = false; }
+}
+
+let searchTimer = null;
+function onSearch(){
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(async () => {
+    const q = document.getElementById('search').value.trim();
+    if(q === searchQuery) return;
+    searchQuery = q;
+    document.getElementById('search-status').textContent = '';
+    if(!q){ await loadData(); return; }
+    const tbody = document.querySelector('#decision-table tbody');
+    for(const g in rowsByGen) delete rowsByGen[g];
+    tbody.innerHTML = '';
+    resetHistory();
+    loadingOlder = false;
+    await loadOlder();
+  }, 300);
+}
+
+function applyUpdate(u){
+  setCounts(u.counts);
+  const tbody = document.querySelector('#decision-table tbody');
+  const empty = tbody.querySelector('tr.empty');
+  if(!searchQuery){
+    if(empty && (u.decisions||[]).length) tbody.removeChild(empty);
+    for(const dec of (u.decisions||[])){
+      tbody.insertBefore(renderRow(dec), tbody.firstChild);
+    }
+    trimRows(tbody);
+  }
+  for(const act of (u.actions||[])){
+    if(act.file) lastActionsIndex[act.file] = act;
+    if(act.gen_id) lastActionsIndex[act.gen_id] = act;
+    const row = act.gen_id && rowsByGen[act.gen_id];
+    if(row){
+      const m = row.dec.meta || (row.dec.meta = {});
+      if(!m.file_size_bytes) m.file_size_bytes = act.file_size_bytes || act.file_size;
+      if(!row.dec.engage_duration_min) row.dec.engage_duration_min = act.engage_duration_min;
+      row.tr.innerHTML = rowCells(row.dec);
+    }
+  }
+}
+
+function openStream(){
+  if(stream) stream.close();
+  stream = new EventSource('/api/stream?cursor=' + encodeURIComponent(streamCursor || ''));
+  stream.addEventListener('update', (e) => applyUpdate(JSON.parse(e.data)));
+  stream.addEventListener('reset', async () => { await loadData(); await refreshActionsIndex(); openStream(); });
+}
+
 function showDetails(dec){
   const body = document.getElementById('modal-body');
   const m = dec.meta || {};
@@ -193,21 +532,36 @@ function showDetails(dec){
   <hr/><div><b>Decoy file preview:</b></div><div id="preview">Loading preview...</div>`;
 
   if(file_path && file_path !== '-' ){
-    fetch('/api/preview?path=' + encodeURIComponent(file_path))
-      .then(r => r.json())
-      .then(obj => {
-        if(obj.content) document.getElementById('preview').innerHTML = '<pre>' + obj.content + '</pre>';
-        else if(obj.error) document.getElementById('preview').innerHTML = '<div class="muted">' + obj.error + '</div>';
-        else document.getElementById('preview').innerHTML = '<div class="muted">(empty)</div>';
-      }).catch(e=>{
-        document.getElementById('preview').innerHTML = '<div class="muted">Preview fetch error</div>';
-      });
+    loadPreview(file_path, 0);
   } else {
     document.getElementById('preview').innerHTML = '<div class="muted">No file path available for preview</div>';
   }
   document.getElementById('modal').style.display = 'block';
 }
 
+function loadPreview(file_path, offset){
+  const box = document.getElementById('preview');
+  fetch('/api/preview?path=' + encodeURIComponent(file_path) + '&offset=' + offset)
+    .then(r => r.json())
+    .then(obj => {
+      if(obj.error){ box.innerHTML = '<div class="muted">' + obj.error + '</div>'; return; }
+      if(!obj.content && offset === 0){ box.innerHTML = '<div class="muted">(empty)</div>'; return; }
+      if(offset === 0) box.innerHTML = '<pre id="preview-text"></pre>';
+      document.getElementById('preview-text').textContent += obj.content;
+      const more = document.getElementById('preview-more');
+      if(more) more.remove();
+      if(obj.next_offset != null){
+        const btn = document.createElement('button');
+        btn.id = 'preview-more';
+        btn.textContent = 'Load more (' + obj.next_offset + ' of ' + obj.size + ' bytes)';
+        btn.onclick = () => loadPreview(file_path, obj.next_offset);
+        box.appendChild(btn);
+      }
+    }).catch(e=>{
+      box.innerHTML = '<div class="muted">Preview fetch error</div>';
+    });
+}
+
 function hideModal(){ document.getElementById('modal').style.display = 'none'; }
 
 let lastActionsIndex = {};
@@ -227,95 +581,149 @@ function dataFromActions(dec){
   return null;
 }
 
-setInterval(()=>{ loadData(); refreshActionsIndex(); }, 10000);
-loadData();
-refreshActionsIndex();
+document.getElementById('search').addEventListener('input', onSearch);
+document.getElementById('decision-scroll').addEventListener('scroll', (e) => {
+  const el = e.target;
+  if(el.scrollTop + el.clientHeight >= el.scrollHeight - 60) loadOlder();
+});
+
+(async () => {
+  await Promise.all([loadData(), refreshActionsIndex()]);
+  if(window.EventSource) openStream();
+  else setInterval(()=>{ loadData(); refreshActionsIndex(); }, 10000);
+})();
 </script>
 </body>
 </html>"""
 
+def cached_json_response(body, etag):
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
 @app.route("/api/metrics")
 def metrics():
-    rec_lines = tail_lines(RECEIVED_LOGS, 200)
-    dec_lines = tail_lines(AI_DECISIONS, 200)
-    act_lines = tail_lines(DECOY_ACTIONS, 200)
-
-    rec = [safe_json(x) for x in rec_lines if x]
-    dec = [safe_json(x) for x in dec_lines if x]
-    acts = [safe_json(x) for x in act_lines if x]
-
-    actions_index = {}
-    for a in acts:
-        if not a:
-            continue
-        fp = a.get("file")
-        if fp: actions_index[fp] = a
-        gen = a.get("gen_id")
-        if gen: actions_index[gen] = a
-
-    enriched_decisions = []
-    for d in dec:
-        if not d: continue
-        meta = d.get("meta", {}) or {}
-        file_path = normalize_path_for_host(meta.get("file_path") or "")
-        linked = None
-        if file_path and file_path in actions_index:
-            linked = actions_index[file_path]
-        elif meta.get("gen_id") and meta.get("gen_id") in actions_index:
-            linked = actions_index[meta.get("gen_id")]
-
-        if linked:
-            if not meta.get("file_size_bytes"):
-                meta["file_size_bytes"] = linked.get("file_size_bytes")
-            if not meta.get("engage_duration_min"):
-                meta["engage_duration_min"] = linked.get("engage_duration_min")
-
-        if meta.get("file_path"):
-            meta["file_path"] = normalize_path_for_host(meta["file_path"])
-
-        d["meta"] = meta
-        d["timestamp"] = d.get("timestamp") or meta.get("timestamp")
-        d["engage_duration_min"] = meta.get("engage_duration_min")
-        enriched_decisions.append(d)
-
-    out = {
-        "counts": {
-            "received": len(rec),
-            "ai": len(enriched_decisions),
-            "actions": len(acts),
-        },
-        "decisions": enriched_decisions[::-1][:200],
-        "received": rec[::-1][:200],
-    }
-    return jsonify(out)
+    return cached_json_response(*metrics_cache.metrics())
 
 @app.route("/api/decoy_index")
 def decoy_index():
-    acts = tail_lines(DECOY_ACTIONS, 1000)
-    idx = {}
-    for ln in acts:
-        obj = safe_json(ln)
-        if not obj: continue
-        fp = obj.get("file")
-        if fp: idx[fp] = obj
-        gen = obj.get("gen_id")
-        if gen: idx[gen] = obj
-    return jsonify(idx)
+    return cached_json_response(*metrics_cache.decoy_index())
+
+def sse_message(event, payload, event_id):
+    return f"event: {event}\nid: {event_id}\ndata: {codec.dumps(payload)}\n\n"
+
+@app.route("/api/stream")
+def stream():
+    """Server-Sent Events feed of new decisions and decoy actions, resumable via Last-Event-ID."""
+    metrics_cache.start_watcher()
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("cursor") or metrics_cache.cursor()
+
+    def generate(cursor):
+        seen = metrics_cache.change_seq
+        yield "retry: 3000\n\n"
+        while True:
+            updates, cursor_now = metrics_cache.updates_since(cursor)
+            if updates is None:
+                yield sse_message("reset", {"cursor": cursor_now}, cursor_now)
+            elif updates["decisions"] or updates["actions"]:
+                try:
+                    updates["counts"] = dashboard_counts()
+                except Exception as e:
+                    print("Error reading counters:", e)
+                yield sse_message("update", updates, cursor_now)
+            cursor = cursor_now
+            seen_now = metrics_cache.wait_for_change(seen, 15)
+            if seen_now == seen:
+                yield ": keepalive\n\n"
+            seen = seen_now
+
+    resp = Response(generate(cursor), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 @app.route("/api/preview")
 def preview():
+    """A page of a decoy: JSON by default (offset/length query), raw bytes for a Range request."""
     path = request.args.get("path", "")
     if not path:
         return jsonify({"error": "no path provided"})
     host_path = normalize_path_for_host(path)
-    if not host_path.startswith(AI_GEN_DIR):
-        return jsonify({"error": "file not allowed for preview or not found (path outside allowed dir)"})
+    rng = request.range
     try:
-        with open(host_path, "r", encoding="utf-8", errors="ignore") as fh:
-            content = fh.read(2000)
-            return jsonify({"content": content})
+        if rng is not None and rng.units == "bytes" and len(rng.ranges) == 1:
+            start, stop = rng.ranges[0]
+            if start < 0:
+                # suffix range; needs the size first
+                size = preview_cache.page(host_path, 0, 1).size
+                start, stop = max(0, size + start), size
+            page = preview_cache.page(host_path, start, (stop or start + MAX_PAGE) - start)
+        else:
+            page = preview_cache.page(host_path, request.args.get("offset", 0, type=int),
+                                      request.args.get("length", PAGE_SIZE, type=int))
+    except PreviewError as e:
+        return jsonify({"error": str(e)})
     except Exception as e:
         return jsonify({"error": f"could not open file: {str(e)}"})
+    raw = rng is not None
+    if raw and page.offset >= page.size:
+        # unsatisfiable whatever the validators say
+        resp = Response(status=416)
+        resp.headers["Content-Range"] = f"bytes */{page.size}"
+        return resp
+    etag = page.etag[:-1] + ("-r" if raw else "-j") + '"'
+    since = request.if_modified_since
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")] or (
+            "If-None-Match" not in request.headers and since is not None
+            and int(page.mtime) <= since.timestamp()):
+        resp = Response(status=304)
+    elif raw:
+        resp = Response(page.data, status=206, mimetype="text/plain")
+        resp.headers["Content-Range"] = f"bytes {page.offset}-{page.offset + len(page.data) - 1}/{page.size}"
+    else:
+        end = page.offset + len(page.data)
+        resp = jsonify({"content": page.data.decode("utf-8", errors="ignore"), "offset": page.offset,
+                        "length": len(page.data), "size": page.size,
+                        "next_offset": end if end < page.size else None})
+    resp.headers["ETag"] = etag
+    resp.headers["Last-Modified"] = http_date(page.mtime)
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.route("/api/preview/stats")
+def preview_stats():
+    if WEB_ROLE == "dashboard":
+        docs = procstats.collect("preview")
+        return jsonify(dict(procstats.merge([d["stats"] for d in docs], settings=("max_bytes",)), processes=len(docs)))
+    return jsonify(preview_cache.snapshot())
+
+def find_action(host_path):
+    """Action record for a decoy path (a lazy decoy has no file until first read), or a bare record for it."""
+    with metrics_cache.lock:
+        rec = metrics_cache.actions_index.get(host_path)
+    if rec is None:
+        try:
+            recs, _ = history.get_index().query("actions", filters={"file": host_path}, limit=1)
+            if not recs:
+                # a decision's meta.file_path names the decoy before the executor timestamps it
+                gen_id = os.path.basename(host_path)[:-4].rsplit("_", 1)[-1]
+                recs = list(history.get_index().actions_for([gen_id]).values())
+            rec = recs[0] if recs else None
+        except Exception as e:
+            print("History lookup failed:", e)
+    return rec or {"file": host_path}
+
+def locate_decoy(host_path):
+    return decoystore.get_store().locate(find_action(host_path))
+
+preview_cache = PreviewCache(AI_GEN_DIR, locate_decoy)
+if WEB_ROLE == "dashboard":
+    procstats.register("preview", preview_cache.snapshot)
 
 @app.route("/")
 def root():
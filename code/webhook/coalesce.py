@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Coalescing stage between the ingest queue and the decision engine
+
+Events are grouped by (src_ip, eventid); other fields such as "attempts" or "message" are
+ignored, so a brute-force run is one key. The first event for a key is decided at once.
+Later events within FYP_COALESCE_WINDOW seconds are held and counted. When the window has
+passed, a background flusher emits one decision for them, built from the latest event and
+carrying the count under "coalesced". Decisions are also rate-limited per src_ip by a token
+bucket: a limited key keeps accumulating until a token is free. Decoy output therefore
+follows distinct attacker behaviour rather than raw event volume.
+
+Each window has one deadline in a heap: when its window passes, or when a rate-limited
+attacker's next token is due. flush() pops only the deadlines that have passed, so the lock
+is held for the due keys rather than for every key.
+
+offer() can tag an event with a mark, an increasing number such as its position in a log.
+oldest_mark() then returns the oldest mark whose decision has not finished, held in a window
+or still in the sink, so a log follower knows how far it may checkpoint.
+"""
+
+import os
+import time
+import heapq
+import datetime
+import itertools
+import threading
+import collections
+
+COALESCE_WINDOW_S = float(os.environ.get("FYP_COALESCE_WINDOW", "30"))  # 0 disables coalescing
+COALESCE_DECOY_RATE = float(os.environ.get("FYP_COALESCE_DECOY_RATE", "6"))  # decisions per attacker per minute
+COALESCE_DECOY_BURST = float(os.environ.get("FYP_COALESCE_DECOY_BURST", "3"))
+COALESCE_MAX_KEYS = int(os.environ.get("FYP_COALESCE_MAX_KEYS", "100000"))
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+class _Window:
+    __slots__ = ("event", "pending", "first", "last", "emitted_at", "mark", "due", "limited")
+
+    def __init__(self):
+        self.event = None
+        self.pending = 0
+        self.first = None
+        self.last = None
+        self.emitted_at = None
+        self.mark = None  # mark of the oldest held event
+        self.due = None  # sequence number of the window's live entry in the deadline heap
+        self.limited = None  # when due but out of tokens: the time the next token is due
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst, now):
+        self.tokens = burst
+        self.updated = now
+
+class Coalescer:
+    def __init__(self, sink, window=COALESCE_WINDOW_S, rate_per_min=COALESCE_DECOY_RATE,
+                 burst=COALESCE_DECOY_BURST, max_keys=COALESCE_MAX_KEYS, background=True):
+        """With background=False no flusher thread runs; the caller calls flush(now) (replay)."""
+        self.sink = sink
+        self.window = window
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1.0, burst)
+        self.max_keys = max(1, max_keys)
+        self.counters = collections.Counter()
+        # (src_ip, eventid) -> _Window, least recently active first
+        self._windows = collections.OrderedDict()
+        self._buckets = collections.OrderedDict()
+        # (deadline, seq, key); entries whose seq is no longer the window's are stale
+        self._deadlines = []
+        self._seq = itertools.count()
+        self._held = 0
+        # (mark, key) of windows holding marked events, stale entries dropped lazily
+        self._marks = []
+        # marks of emitted decisions whose sink call is running
+        self._inflight = collections.Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+        if window > 0 and background:
+            self._flusher = threading.Thread(target=self._flush_loop, name="coalesce-flush", daemon=True)
+            self._flusher.start()
+
+    def _take_token(self, src_ip, now):
+        if self.rate <= 0:
+            return True
+        b = self._buckets.get(src_ip)
+        if b is None:
+            b = self._buckets[src_ip] = _Bucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(src_ip)
+            b.tokens = min(self.burst, b.tokens + (now - b.updated) * self.rate)
+            b.updated = now
+        if b.tokens < 1.0:
+            return False
+        b.tokens -= 1.0
+        return True
+
+    def _token_wait(self, src_ip):
+        """Seconds until src_ip's bucket holds a whole token again (right after _take_token failed)."""
+        b = self._buckets.get(src_ip)
+        if self.rate <= 0 or b is None:
+            return 0.0
+        return (1.0 - b.tokens) / self.rate
+
+    def _schedule(self, key, w, at):
+        w.due = next(self._seq)
+        heapq.heappush(self._deadlines, (at, w.due, key))
+
+    def _try_emit(self, key, w, now, ready):
+        """Emit a due window if its attacker has a token, otherwise wait for one; holds _lock."""
+        if self._take_token(key[0], now):
+            ready.append(self._emit(key, w, now))
+            # next look: emit what arrives meanwhile, or drop the window if nothing does
+            self._schedule(key, w, now + self.window)
+        else:
+            if w.limited is None:
+                self.counters["rate_limited"] += 1
+            w.limited = now + max(self._token_wait(key[0]), 0.001)
+            self._schedule(key, w, w.limited)
+
+    def _due(self, w, now):
+        return w.pending and (w.emitted_at is None or now - w.emitted_at >= self.window)
+
+    def _emit(self, key, w, now):
+        out = dict(w.event)
+        out["coalesced"] = {"count": w.pending, "first_seen": _iso(w.first), "last_seen": _iso(w.last),
+                            "window_s": self.window}
+        self.counters["emitted"] += 1
+        self.counters["coalesced_events"] += w.pending - 1
+        self._held -= w.pending
+        mark, w.mark = w.mark, None
+        if mark is not None:
+            self._inflight[mark] += 1
+        w.event = None
+        w.pending = 0
+        w.first = w.last = None
+        w.emitted_at = now
+        w.limited = None
+        return out, mark
+
+    def _sink_done(self, mark):
+        if mark is None:
+            return
+        with self._lock:
+            self._inflight[mark] -= 1
+            if self._inflight[mark] <= 0:
+                del self._inflight[mark]
+
+    def oldest_mark(self):
+        """Oldest mark whose event is held or being decided, or None when all have finished."""
+        with self._lock:
+            while self._marks:
+                mark, key = self._marks[0]
+                w = self._windows.get(key)
+                if w is not None and w.mark == mark:
+                    break
+                heapq.heappop(self._marks)
+            held = self._marks[0][0] if self._marks else None
+            running = min(self._inflight, default=None)
+            if held is None or running is not None and running < held:
+                return running
+            return held
+
+    def offer(self, event, now=None, mark=None):
+        """Count one event; decides it now unless its key is inside a window or rate-limited."""
+        if self.window <= 0:
+            with self._lock:
+                self.counters["received"] += 1
+                self.counters["emitted"] += 1
+            self.sink(event)
+            return True
+        if now is None:
+            now = time.time()
+        src_ip = event.get("src_ip")
+        key = (src_ip, event.get("eventid") or event.get("event_id"))
+        ready = []
+        with self._lock:
+            self.counters["received"] += 1
+            w = self._windows.get(key)
+            if w is None:
+                w = self._windows[key] = _Window()
+                if len(self._windows) > self.max_keys:
+                    old_key, old = self._windows.popitem(last=False)
+                    if old.pending:
+                        # evicted with held events: emit rather than lose them
+                        self.counters["evicted_emitted"] += 1
+                        ready.append(self._emit(old_key, old, now))
+            else:
+                self._windows.move_to_end(key)
+            w.event = event
+            if mark is not None and w.mark is None:
+                w.mark = mark
+                heapq.heappush(self._marks, (mark, key))
+            w.pending += 1
+            self._held += 1
+            w.first = w.first or now
+            w.last = now
+            # a rate-limited window waits for its next token rather than retrying on every event
+            if self._due(w, now) and (w.limited is None or now >= w.limited):
+                self._try_emit(key, w, now, ready)
+        for i, (ev, m) in enumerate(ready):
+            try:
+                self.sink(ev)
+            except Exception:
+                for _, rest in ready[i:]:
+                    self._sink_done(rest)
+                raise
+            self._sink_done(m)
+        return bool(ready)
+
+    def flush(self, now=None):
+        """Emit every key whose window has passed and whose attacker has a token; returns how many."""
+        if now is None:
+            now = time.time()
+        ready = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, seq, key = heapq.heappop(self._deadlines)
+                w = self._windows.get(key)
+                if w is None or w.due != seq:
+                    continue
+                if w.pending:
+                    self._try_emit(key, w, now, ready)
+                else:
+                    # a window with nothing new since its last decision
+                    del self._windows[key]
+        for ev, m in ready:
+            try:
+                self.sink(ev)
+            except Exception as e:
+                print("Coalesced decision error:", e)
+            finally:
+                self._sink_done(m)
+        return len(ready)
+
+    def _flush_loop(self):
+        interval = min(1.0, self.window / 4)
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_s": self.window,
+                "decoy_rate_per_min": self.rate * 60,
+                "decoy_burst": self.burst,
+                "keys": len(self._windows),
+                "held": self._held,
+                "received": self.counters["received"],
+                "emitted": self.counters["emitted"],
+                "coalesced_events": self.counters["coalesced_events"],
+                "rate_limited": self.counters["rate_limited"],
+                "evicted_emitted": self.counters["evicted_emitted"],
+            }
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Decision engine runner for the webhook (in-process worker pool or legacy subprocess)
+"""
+
+import os
+import sys
+import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_MODULE_DIR = os.path.join(CODE_DIR, "ai_module")
+
+sys.path.insert(0, CODE_DIR)
+from common import tracing
+
+# "inprocess": import generate_deception_action once and call it from a thread pool
+# "subprocess": legacy behaviour, one python3 per event (event passed over stdin)
+ENGINE_MODE = os.environ.get("FYP_ENGINE_MODE", "inprocess")
+ENGINE_WORKERS = int(os.environ.get("FYP_ENGINE_WORKERS", "4"))
+
+_gen_module = None
+_gen_lock = threading.Lock()
+
+def load_generator():
+    global _gen_module
+    with _gen_lock:
+        if _gen_module is None:
+            if AI_MODULE_DIR not in sys.path:
+                sys.path.insert(0, AI_MODULE_DIR)
+            import generate_deception_action
+            _gen_module = generate_deception_action
+    return _gen_module
+
+class DecisionEngine:
+    def __init__(self, mode=ENGINE_MODE, workers=ENGINE_WORKERS, script=None):
+        if mode not in ("inprocess", "subprocess"):
+            raise ValueError(f"unknown engine mode: {mode}")
+        self.mode = mode
+        self.script = script or os.path.join(AI_MODULE_DIR, "generate_deception_action.py")
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="decision")
+        self.gen = load_generator() if mode == "inprocess" else None
+
+    def decide(self, event):
+        if self.mode == "inprocess":
+            return self.gen.decide(event)
+        # the generator's stage histograms exit with it; record the run's stages here instead
+        trace = tracing.mark(tracing.copy(event.get("trace")), "decide")
+        subprocess.run(
+            ["python3", self.script, "-"],
+            input=json.dumps(event),
+            text=True,
+            check=False,
+        )
+        tracing.mark(trace, "decided")
+        return None
+
+    def submit(self, event):
+        return self.pool.submit(self.decide, event)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
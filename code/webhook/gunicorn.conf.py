@@ -0,0 +1,22 @@
+"""
+gunicorn settings for one web role (serve.py sets FYP_WEB_ROLE and the FYP_SERVE_* variables)
+
+    FYP_WEB_ROLE=dashboard gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.environ.get("FYP_SERVE_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("FYP_SERVE_WORKERS", "2"))
+if os.environ.get("FYP_WEB_ROLE", "all") == "all":
+    # the in-process decision pipeline must not run once per worker
+    workers = 1
+# threaded workers, so long-lived /api/stream connections only hold a thread each
+worker_class = "gthread"
+threads = int(os.environ.get("FYP_SERVE_THREADS", "8"))
+# every worker imports the app itself; its queue and stats threads would not survive a fork
+preload_app = False
+timeout = int(os.environ.get("FYP_SERVE_TIMEOUT", "60"))
+graceful_timeout = 10
+keepalive = 5
+proc_name = "fyp-" + os.environ.get("FYP_WEB_ROLE", "all")
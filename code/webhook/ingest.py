@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Bounded in-memory ingest queue for /cowrie-log with batching workers and backpressure
+"""
+
+import os
+import time
+import random
+import threading
+import collections
+
+INGEST_MAXSIZE = int(os.environ.get("FYP_INGEST_MAXSIZE", "10000"))
+INGEST_BATCH = int(os.environ.get("FYP_INGEST_BATCH", "100"))
+INGEST_WORKERS = int(os.environ.get("FYP_INGEST_WORKERS", "2"))
+# "reject": answer 429 + Retry-After when full
+# "drop": accept and discard when full
+# "sample": above the high watermark admit a fraction of events, discard when full
+INGEST_OVERFLOW = os.environ.get("FYP_INGEST_OVERFLOW", "reject")
+INGEST_SAMPLE_RATE = float(os.environ.get("FYP_INGEST_SAMPLE_RATE", "0.1"))
+INGEST_HIGH_WATERMARK = float(os.environ.get("FYP_INGEST_HIGH_WATERMARK", "0.8"))
+INGEST_RETRY_AFTER = int(os.environ.get("FYP_INGEST_RETRY_AFTER", "1"))
+
+QUEUED = "queued"
+REJECTED = "rejected"
+DROPPED = "dropped"
+SAMPLED_OUT = "sampled_out"
+
+class IngestQueue:
+    def __init__(self, sink, maxsize=INGEST_MAXSIZE, batch_size=INGEST_BATCH, workers=INGEST_WORKERS,
+                 overflow=INGEST_OVERFLOW, sample_rate=INGEST_SAMPLE_RATE,
+                 high_watermark=INGEST_HIGH_WATERMARK, retry_after=INGEST_RETRY_AFTER):
+        if overflow not in ("reject", "drop", "sample"):
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self.sink = sink
+        self.maxsize = max(1, maxsize)
+        self.batch_size = max(1, batch_size)
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.high_watermark = int(self.maxsize * high_watermark)
+        self.retry_after = retry_after
+        # each entry is a list of records that must be handed to the sink together
+        self._chunks = collections.deque()
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.counters = collections.Counter()
+        self.max_depth_seen = 0
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _admit(self, n, pending=0):
+        depth = self._depth + pending
+        free = self.maxsize - depth
+        if n <= free and (self.overflow != "sample" or depth < self.high_watermark):
+            return QUEUED
+        if self.overflow == "reject":
+            return REJECTED
+        if n <= free and random.random() < self.sample_rate:
+            return QUEUED
+        return DROPPED if n > free else SAMPLED_OUT
+
+    def offer(self, record):
+        with self._cond:
+            status = self._admit(1)
+            if status == QUEUED:
+                self._chunks.append([record])
+                self._depth += 1
+                self.max_depth_seen = max(self.max_depth_seen, self._depth)
+                self._cond.notify()
+            self.counters[status] += 1
+            return status
+
+    def offer_batch(self, records):
+        """Admit records as one chunk so a worker hands them to the sink together."""
+        with self._cond:
+            if self.overflow == "reject" and self._admit(len(records)) == REJECTED:
+                statuses = [REJECTED] * len(records)
+            else:
+                statuses = []
+                chunk = []
+                for r in records:
+                    status = self._admit(1, len(chunk))
+                    if status == QUEUED:
+                        chunk.append(r)
+                    statuses.append(status)
+                if chunk:
+                    self._chunks.append(chunk)
+                    self._depth += len(chunk)
+                    self.max_depth_seen = max(self.max_depth_seen, self._depth)
+                    self._cond.notify()
+            self.counters.update(statuses)
+            return statuses
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._chunks and not self._closed:
+                    self._cond.wait()
+                if not self._chunks:
+                    return
+                batch = []
+                while self._chunks and (not batch or len(batch) + len(self._chunks[0]) <= self.batch_size):
+                    batch.extend(self._chunks.popleft())
+                self._depth -= len(batch)
+            try:
+                self.sink(batch)
+                outcome = "processed"
+            except Exception as e:
+                outcome = "errors"
+                print("Ingest worker error:", e)
+            with self._cond:
+                self.counters[outcome] += len(batch)
+                self.counters["batches"] += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": self._depth,
+                "max_depth_seen": self.max_depth_seen,
+                "maxsize": self.maxsize,
+                "batch_size": self.batch_size,
+                "workers": len(self._threads),
+                "overflow": self.overflow,
+                "queued": self.counters[QUEUED],
+                "rejected": self.counters[REJECTED],
+                "dropped": self.counters[DROPPED],
+                "sampled_out": self.counters[SAMPLED_OUT],
+                "processed": self.counters["processed"],
+                "batches": self.counters["batches"],
+                "errors": self.counters["errors"],
+            }
+
+    def close(self, timeout=5.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = time.time() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
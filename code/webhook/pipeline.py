@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Decision pipeline process for production serving (serve.py)
+
+Web workers in the ingest role only append accepted events to received_logs.json. This
+process follows that log from a checkpoint and feeds the coalescer and decision engine. Their
+per-attacker windows, rate limits, attacker state and decoy pool therefore live in exactly one
+process, however many web workers there are. Its stats reach the dashboard workers through
+procstats.
+
+Events are split into FYP_ENGINE_WORKERS lanes by src_ip, so one attacker's events reach the
+coalescer and attacker state in log order while different attackers are decided
+concurrently. The checkpoint only moves past an event once its decision has finished, or
+it was folded into one that has. Events still held in a coalescing window keep it back, so
+a restart decides them again rather than losing them.
+"""
+
+import os
+import sys
+import zlib
+import collections
+from engine import DecisionEngine, CODE_DIR, ENGINE_WORKERS
+from coalesce import Coalescer
+
+sys.path.insert(0, CODE_DIR)
+from common import codec, procstats, profiling, tracing
+from common.follower import FileFollower
+
+BASE = os.path.expanduser("~/FYP-Project")
+RECEIVED_LOGS = os.path.join(BASE, "code/webhook/received_logs.json")
+PIPELINE_CHECKPOINT = os.path.join(BASE, "code/webhook/pipeline.offset.json")
+PIPELINE_BATCH = int(os.environ.get("FYP_PIPELINE_BATCH", "100"))
+
+def engine_snapshot(engine):
+    out = {"mode": engine.mode}
+    registry = sys.modules.get("template_registry")
+    if registry is not None and registry._registry is not None:
+        out["templates"] = registry._registry.snapshot()
+    attackers = sys.modules.get("attacker_state")
+    if attackers is not None and attackers._store is not None:
+        out["attackers"] = attackers._store.snapshot()
+    pool = sys.modules.get("decoy_pool")
+    if pool is not None and pool._pool is not None:
+        out["decoy_pool"] = pool._pool.snapshot()
+    writer = sys.modules.get("common.indexwriter")
+    if writer is not None and writer._writer is not None:
+        out["index_writer"] = writer._writer.snapshot()
+    return out
+
+def llm_snapshot():
+    backend = sys.modules.get("llm_backend")
+    if backend is None or backend._backend is None:
+        return {"enabled": False}
+    return dict(backend.get_backend().snapshot(), enabled=True)
+
+def profile_snapshot(engine):
+    return {"enabled": profiling.PROFILE, "engine_mode": engine.mode,
+            "buckets_ms": list(profiling.BUCKETS_MS), "stages": profiling.histograms.snapshot()}
+
+def lag_bytes(follower):
+    """Bytes of the active received log not yet decided (all of it until the follower reaches that file)."""
+    inode, offset = follower.committed
+    try:
+        st = os.stat(follower.path)
+    except FileNotFoundError:
+        return 0
+    return max(0, st.st_size - offset) if st.st_ino == inode else st.st_size
+
+def snapshot(engine, coalescer, follower, counts):
+    return {"engine": engine_snapshot(engine), "llm": llm_snapshot(), "profile": profile_snapshot(engine),
+            "coalesce": coalescer.stats(), "lag_bytes": lag_bytes(follower), **counts}
+
+def run(follower, engine, coalescer, counts, batch=PIPELINE_BATCH):
+    lanes = max(1, ENGINE_WORKERS)
+    seq = 0
+    # entries read but not yet checkpointed, as (seq, entry); seq is the event's coalescer mark
+    uncommitted = collections.deque()
+
+    def offer_lane(items):
+        """Offer one lane's events in log order; each lane is a set of src_ips, decided by one thread."""
+        out = collections.Counter()
+        for mark, data in items:
+            try:
+                coalescer.offer(data, mark=mark)
+                out["processed"] += 1
+            except Exception as e:
+                tracing.error("decision")
+                print("Decision error:", e)
+                out["errors"] += 1
+        return out
+
+    def checkpoint():
+        """Commit up to the entry before the oldest event that is still held or being decided."""
+        oldest = coalescer.oldest_mark()
+        done = None
+        while uncommitted and (oldest is None or uncommitted[0][0] < oldest):
+            done = uncommitted.popleft()[1]
+        if done is not None:
+            follower.commit(done)
+
+    while True:
+        entries = follower.read_entries(max_lines=batch)
+        if not entries:
+            follower.wait()
+            # the coalescer's flusher may have decided held events meanwhile
+            checkpoint()
+            continue
+        shards = [[] for _ in range(lanes)]
+        for e in entries:
+            seq += 1
+            uncommitted.append((seq, e))
+            rec = codec.safe_loads(e[0])
+            data = rec.get("data") if isinstance(rec, dict) else None
+            if not isinstance(data, dict):
+                counts["skipped"] += 1
+                continue
+            if isinstance(rec.get("trace"), dict):
+                data = dict(data, trace=rec["trace"])
+            shards[zlib.crc32(str(data.get("src_ip", "")).encode("utf-8", errors="replace")) % lanes].append((seq, data))
+        # one attacker's events stay in log order; different attackers are decided concurrently
+        for out in engine.pool.map(offer_lane, [s for s in shards if s]):
+            for outcome, n in out.items():
+                counts[outcome] += n
+        checkpoint()
+
+def main():
+    engine = DecisionEngine(script=os.path.join(BASE, "code/ai_module/generate_deception_action.py"))
+    coalescer = Coalescer(engine.decide)
+    os.makedirs(os.path.dirname(RECEIVED_LOGS), exist_ok=True)
+    open(RECEIVED_LOGS, "a").close()
+    # without a checkpoint, decide what ingest logged before the pipeline came up
+    follower = FileFollower(RECEIVED_LOGS, checkpoint=PIPELINE_CHECKPOINT, start_at_end=False)
+    counts = {"processed": 0, "skipped": 0, "errors": 0}
+    procstats.register("pipeline", lambda: snapshot(engine, coalescer, follower, counts))
+    procstats.register("trace", tracing.snapshot)
+    print(f"[Pipeline] following {RECEIVED_LOGS} (engine {engine.mode}, checkpoint {PIPELINE_CHECKPOINT})")
+    try:
+        run(follower, engine, coalescer, counts)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+        engine.shutdown(wait=False)
+
+if __name__ == "__main__":
+    main()
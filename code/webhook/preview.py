@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cached, paged reads behind /api/preview
+
+Resolving a path is done once and kept in an LRU. That covers validating it against the
+decoy root, following symlinks, and finding the action record behind a stored decoy.
+Pages are cached by (file, header, inode, mtime, size, offset, length) in a second LRU bounded by
+FYP_PREVIEW_CACHE_BYTES, so a decoy that changes on disk is simply a new key. Files of
+MMAP_MIN bytes and more are read through mmap, so paging a large decoy never loads it whole.
+"""
+
+import os
+import mmap
+import zlib
+import threading
+import collections
+
+PREVIEW_CACHE_BYTES = int(os.environ.get("FYP_PREVIEW_CACHE_BYTES", str(8 * 1024 * 1024)))
+PREVIEW_CACHE_PATHS = int(os.environ.get("FYP_PREVIEW_CACHE_PATHS", "4096"))
+PAGE_SIZE = 2000
+MAX_PAGE = 64 * 1024
+MMAP_MIN = 64 * 1024
+
+# what backs a preview: a file, and the header bytes in front of it (a shared decoy body)
+Source = collections.namedtuple("Source", "path header")
+Page = collections.namedtuple("Page", "data offset size mtime etag")
+
+class PreviewError(Exception):
+    pass
+
+class PreviewCache:
+    def __init__(self, root, locate, max_bytes=PREVIEW_CACHE_BYTES, max_paths=PREVIEW_CACHE_PATHS):
+        """`locate(host_path)` returns the (path, header) holding a decoy, or None."""
+        self.root = os.path.realpath(root)
+        self.locate = locate
+        self.max_bytes = max_bytes
+        self.max_paths = max_paths
+        self.stats = collections.Counter()
+        self._sources = collections.OrderedDict()
+        self._pages = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _allowed(self, path):
+        real = os.path.realpath(path)
+        if os.path.commonpath([real, self.root]) != self.root:
+            raise PreviewError("file not allowed for preview or not found (path outside allowed dir)")
+        return real
+
+    def source(self, host_path):
+        with self._lock:
+            src = self._sources.get(host_path)
+            if src is not None:
+                self._sources.move_to_end(host_path)
+                self.stats["source_hits"] += 1
+                return src
+            self.stats["source_misses"] += 1
+        self._allowed(host_path)
+        # through the action record even when the file exists: a linked decoy is the body alone
+        found = self.locate(host_path)
+        if found is None:
+            raise PreviewError(f"could not open file: {host_path} not found")
+        src = Source(self._allowed(found[0]), found[1])
+        with self._lock:
+            self._sources[host_path] = src
+            while len(self._sources) > self.max_paths:
+                self._sources.popitem(last=False)
+        return src
+
+    def page(self, host_path, offset=0, length=PAGE_SIZE):
+        offset = max(0, int(offset))
+        length = max(1, min(int(length), MAX_PAGE))
+        src = self.source(host_path)
+        try:
+            st = os.stat(src.path)
+        except FileNotFoundError:
+            # moved (migrate) or removed since it was resolved; resolve again once
+            with self._lock:
+                self._sources.pop(host_path, None)
+            src = self.source(host_path)
+            st = os.stat(src.path)
+        size = len(src.header) + st.st_size
+        # decoys sharing one stored body differ only in the header in front of it
+        head = zlib.crc32(src.header)
+        key = (src.path, src.header, st.st_ino, st.st_mtime_ns, st.st_size, offset, length)
+        etag = f'"{st.st_ino:x}-{head:x}-{st.st_mtime_ns:x}-{size:x}-{offset:x}-{length:x}"'
+        with self._lock:
+            data = self._pages.get(key)
+            if data is not None:
+                self._pages.move_to_end(key)
+                self.stats["page_hits"] += 1
+                return Page(data, offset, size, st.st_mtime, etag)
+            self.stats["page_misses"] += 1
+        data = self._read(src, st.st_size, offset, length)
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._pages:
+                self._bytes -= len(self._pages.popitem(last=False)[1])
+        return Page(data, offset, size, st.st_mtime, etag)
+
+    def _read(self, src, file_size, offset, length):
+        head = src.header[offset:offset + length]
+        start = max(0, offset - len(src.header))
+        want = min(length - len(head), file_size - start)
+        if want <= 0:
+            return head
+        with open(src.path, "rb") as fh:
+            if file_size < MMAP_MIN:
+                return head + os.pread(fh.fileno(), want, start)
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return head + mm[start:start + want]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, sources=len(self._sources), pages=len(self._pages),
+                        bytes=self._bytes, max_bytes=self.max_bytes)
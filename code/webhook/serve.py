@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Production entry point: ingest and dashboard under gunicorn, plus one decision pipeline process
+
+    python3 serve.py                  # all three
+    python3 serve.py ingest pipeline  # only some (e.g. one role per container)
+
+The ingest server (FYP_SERVE_INGEST_BIND, default :5000) answers /cowrie-log only, and the
+dashboard server (FYP_SERVE_DASHBOARD_BIND, default :5001) everything else. They are separate
+processes with their own worker pools, so dashboard load cannot starve ingest. When one
+child exits, the others are stopped and serve.py exits with its status.
+"""
+
+import os
+import sys
+import time
+import signal
+import subprocess
+import importlib.util
+
+WEBHOOK_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG = os.path.join(WEBHOOK_DIR, "gunicorn.conf.py")
+ROLES = ("pipeline", "ingest", "dashboard")
+
+# role -> (bind, workers, threads) defaults
+WEB_DEFAULTS = {
+    "ingest": ("0.0.0.0:5000", 2, 4),
+    "dashboard": ("0.0.0.0:5001", 4, 8),
+}
+
+def web_settings(role):
+    bind, workers, threads = WEB_DEFAULTS[role]
+    prefix = f"FYP_SERVE_{role.upper()}_"
+    return {
+        "FYP_SERVE_BIND": os.environ.get(prefix + "BIND", bind),
+        "FYP_SERVE_WORKERS": os.environ.get(prefix + "WORKERS", str(workers)),
+        "FYP_SERVE_THREADS": os.environ.get(prefix + "THREADS", str(threads)),
+    }
+
+def command(role):
+    if role == "pipeline":
+        return [sys.executable, os.path.join(WEBHOOK_DIR, "pipeline.py")], dict(os.environ)
+    env = dict(os.environ, FYP_WEB_ROLE=role, **web_settings(role))
+    return [sys.executable, "-m", "gunicorn", "-c", CONFIG, "app:app"], env
+
+def main(argv):
+    roles = argv or list(ROLES)
+    unknown = [r for r in roles if r not in ROLES]
+    if unknown:
+        print(f"unknown role(s): {', '.join(unknown)} (expected {', '.join(ROLES)})")
+        return 2
+    if any(r != "pipeline" for r in roles) and importlib.util.find_spec("gunicorn") is None:
+        print("gunicorn is not installed (pip install gunicorn); use app.py for the development server")
+        return 1
+    procs = {}
+    for role in roles:
+        cmd, env = command(role)
+        procs[role] = subprocess.Popen(cmd, cwd=WEBHOOK_DIR, env=env)
+        where = ""
+        if role != "pipeline":
+            where = f" on {env['FYP_SERVE_BIND']} ({env['FYP_SERVE_WORKERS']}x{env['FYP_SERVE_THREADS']} threads)"
+        print(f"[serve] {role} pid {procs[role].pid}{where}")
+
+    def stop(signum=None, frame=None):
+        for p in procs.values():
+            if p.poll() is None:
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    status = 0
+    try:
+        while True:
+            done = [(role, p.returncode) for role, p in procs.items() if p.poll() is not None]
+            if done:
+                role, status = done[0]
+                print(f"[serve] {role} exited with status {status}; stopping the rest")
+                break
+            time.sleep(0.5)
+    finally:
+        stop()
+        for p in procs.values():
+            try:
+                p.wait(15)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Incremental, offset-tracking JSONL readers backing /api/metrics and /api/decoy_index
+(binary frames from codec.py are read the same way)
+"""
+
+import os
+import time
+import sys
+import threading
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import codec, rotation
+from common.rotation import tail_offset
+
+safe_json = codec.safe_loads
+
+class JsonlTail:
+    """Keeps the last `maxlen` parsed records of a JSONL file and reads only appended bytes.
+
+    The open handle is drained before following a rotated path (new inode), and a file
+    that shrinks below the read offset is treated as truncated and re-read from 0. On the
+    first read the buffer is topped up from closed rotation segments if the active file is short.
+
+    Each record keeps its (inode, start offset) in the log. Positions are the same in every
+    process that reads the file, so cursors and ETags built from them hold across workers.
+    """
+
+    def __init__(self, path, maxlen=200):
+        self.path = path
+        self.records = collections.deque(maxlen=maxlen)
+        self.starts = collections.deque(maxlen=maxlen)  # (inode, offset) per record; None if unknown
+        self._fh = None
+        self._inode = None
+        self._offset = 0  # file offset of the start of self._partial
+        self._previous = None  # position at the end of the file before the last rotation
+        self._partial = b""
+
+    def _open(self, initial):
+        try:
+            fh = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._fh = fh
+        self._inode = os.fstat(fh.fileno()).st_ino
+        self._partial = b""
+        self._offset = tail_offset(fh, self.records.maxlen) if initial else 0
+        fh.seek(self._offset)
+        return True
+
+    def _read_available(self):
+        """(record, start position) for each complete record appended since the last read."""
+        data = self._fh.read()
+        if not data:
+            return []
+        lines, self._partial = codec.split_records(self._partial + data)
+        out = []
+        for ln in lines:
+            out.append((ln, (self._inode, self._offset)))
+            self._offset += len(ln) + 1
+        return out
+
+    def position(self):
+        """(inode, offset) just past the last complete record read."""
+        return (self._inode or 0, self._offset)
+
+    def poll(self):
+        """Parse newly appended lines; returns the new records."""
+        lines = []
+        if self._fh is None:
+            initial = self._inode is None
+            if not self._open(initial=initial):
+                return []
+            if initial:
+                lines.extend((l if isinstance(l, bytes) else l.encode("utf-8"), None) for l in
+                             rotation.tail_segment_lines(self.path, self.records.maxlen))
+        lines.extend(self._read_available())
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_ino != self._inode:
+            self._fh.close()
+            self._fh = None
+            self._previous = self.position()
+            if self._open(initial=False):
+                lines.extend(self._read_available())
+        elif st is not None and st.st_size < self._fh.tell():
+            self._fh.seek(0)
+            self._offset = 0
+            self._partial = b""
+            lines.extend(self._read_available())
+        new = []
+        for ln, start in lines:
+            obj = safe_json(ln) if ln.strip() else None
+            if isinstance(obj, dict):
+                self.records.append(obj)
+                self.starts.append(start)
+                new.append(obj)
+        return new
+
+    def since(self, position):
+        """Records after `position` (from position()), or None if they fell out of the buffer."""
+        if position == self.position():
+            return []
+        if position == self._previous:
+            # the cursor was taken at the end of the file that has since been rotated away
+            position = (self._inode, 0)
+        for i, start in enumerate(self.starts):
+            if start == position:
+                return list(self.records)[i:]
+        return None
+
+class MetricsCache:
+    def __init__(self, received_path, decisions_path, actions_path, normalize_path=None,
+                 maxlen=200, index_size=1000, counts=None):
+        self.received = JsonlTail(received_path, maxlen)
+        self.decisions = JsonlTail(decisions_path, maxlen)
+        self.actions = JsonlTail(actions_path, index_size)
+        self.normalize_path = normalize_path or (lambda p: p)
+        self.maxlen = maxlen
+        self.index_size = index_size
+        # optional callable returning lifetime totals keyed like the "counts" payload
+        self.counts = counts
+        # gen_id / file path -> action record, oldest first
+        self.actions_index = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition()
+        self._watcher = None
+        self.change_seq = 0
+        self._payloads = {}
+
+    def _index_action(self, a):
+        for key in (a.get("file"), a.get("gen_id")):
+            if key:
+                self.actions_index.pop(key, None)
+                self.actions_index[key] = a
+        while len(self.actions_index) > 2 * self.index_size:
+            self.actions_index.popitem(last=False)
+
+    def _linked(self, meta):
+        file_path = self.normalize_path(meta.get("file_path") or "")
+        if file_path and file_path in self.actions_index:
+            return self.actions_index[file_path]
+        gen = meta.get("gen_id")
+        if gen and gen in self.actions_index:
+            return self.actions_index[gen]
+        return None
+
+    def enrich(self, d, linked=None):
+        """Decision with file size and engage duration filled from its action (`linked`, or the index)."""
+        meta = dict(d.get("meta") or {})
+        linked = linked or self._linked(meta)
+        if linked:
+            if not meta.get("file_size_bytes"):
+                meta["file_size_bytes"] = linked.get("file_size_bytes") or linked.get("file_size")
+            if not meta.get("engage_duration_min"):
+                meta["engage_duration_min"] = linked.get("engage_duration_min")
+        if meta.get("file_path"):
+            meta["file_path"] = self.normalize_path(meta["file_path"])
+        out = dict(d)
+        out["meta"] = meta
+        out["timestamp"] = d.get("timestamp") or meta.get("timestamp")
+        out["engage_duration_min"] = meta.get("engage_duration_min")
+        out["_linked"] = linked is not None
+        return out
+
+    def refresh(self):
+        """Poll all three files; must be called with the lock held."""
+        self.received.poll()
+        new_actions = self.actions.poll()
+        for a in new_actions:
+            self._index_action(a)
+        recs = self.decisions.records
+        new_decisions = min(len(self.decisions.poll()), len(recs))
+        start = 0 if new_actions else len(recs) - new_decisions
+        for i in range(start, len(recs)):
+            if i >= len(recs) - new_decisions or not recs[i].get("_linked"):
+                recs[i] = self.enrich(recs[i])
+
+    def cursor(self):
+        """Log positions of the decisions and actions read so far; valid in any worker process."""
+        return ":".join("%d.%d" % tail.position() for tail in (self.decisions, self.actions))
+
+    def updates_since(self, cursor):
+        """New decisions and actions after `cursor`; None when the client must resync from /api/metrics."""
+        with self.lock:
+            self.refresh()
+            try:
+                dpos, apos = (tuple(int(x) for x in part.split(".")) for part in cursor.split(":"))
+            except (AttributeError, ValueError):
+                return None, self.cursor()
+            decisions = self.decisions.since(dpos)
+            actions = self.actions.since(apos)
+            if decisions is None or actions is None:
+                return None, self.cursor()
+            return {"decisions": [self.public(d) for d in decisions], "actions": actions}, self.cursor()
+
+    def _watch(self, interval):
+        last = None
+        while True:
+            with self.lock:
+                self.refresh()
+                tag = self.etag()
+            if tag != last:
+                last = tag
+                with self.changed:
+                    self.change_seq += 1
+                    self.changed.notify_all()
+            time.sleep(interval)
+
+    def start_watcher(self, interval=0.25):
+        """Poll the files in one background thread and wake stream subscribers on change."""
+        with self.lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, args=(interval,), name="metrics-watch", daemon=True)
+                self._watcher.start()
+
+    def wait_for_change(self, seen, timeout):
+        """Block until the watcher has seen a change after `seen`; returns the new change_seq."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.change_seq != seen, timeout)
+            return self.change_seq
+
+    def etag(self):
+        return 'W/"%s"' % "-".join("%x.%d" % t.position() for t in (self.received, self.decisions, self.actions))
+
+    def _cached(self, name, build):
+        with self.lock:
+            self.refresh()
+            tag = self.etag()
+            hit = self._payloads.get(name)
+            if hit and hit[0] == tag:
+                return hit[1], tag
+            body = codec.dumps(build())
+            self._payloads[name] = (tag, body)
+            return body, tag
+
+    def public(self, d):
+        """Decision as served to clients, without the cache's bookkeeping fields."""
+        return {k: v for k, v in d.items() if k != "_linked"}
+
+    def metrics(self):
+        def build():
+            decisions = [self.public(d) for d in self.decisions.records]
+            received = list(self.received.records)
+            counts = {
+                "received": len(received),
+                "ai": len(decisions),
+                "actions": min(len(self.actions.records), self.maxlen),
+            }
+            if self.counts:
+                try:
+                    counts = self.counts()
+                except Exception as e:
+                    print("Error reading counters:", e)
+            return {
+                "cursor": self.cursor(),
+                "counts": counts,
+                "decisions": decisions[::-1][:self.maxlen],
+                "received": received[::-1][:self.maxlen],
+            }
+        return self._cached("metrics", build)
+
+    def decoy_index(self):
+        return self._cached("decoy_index", lambda: dict(self.actions_index))
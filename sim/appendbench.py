@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Append throughput under each durability policy of common/appender.py, against the legacy
+open-append-close write per record. Every case writes decision-sized records to a throwaway
+log from several threads or processes, then re-reads the file and checks that each record
+is intact and none is missing or interleaved.
+
+    python3 sim/appendbench.py
+    python3 sim/appendbench.py -n 20000 --flush-ms 0,2 --writers t1,t8,p4
+"""
+
+import os
+import sys
+import time
+import fcntl
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import multiprocessing
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, "code"))
+from common import appender, codec, rotation
+
+def record(writer, i):
+    return codec.encode_record({
+        "timestamp_iso": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "eventid": "cowrie.login.failed", "decision_id": f"dec-{writer:04d}{i:08d}", "src_ip": "203.0.113.7",
+        "response_mode": "local", "selected_action": "create_decoy_file", "confidence": 0.87,
+        "response": "Temporary access token: TOK-1a2b3c4d\nNote: Rotate after use.\n" * 3,
+        "meta": {"gen_id": f"{writer:04x}{i:04x}", "writer": writer, "seq": i, "engage_duration_min": 7.5},
+    })
+
+def legacy_write(path, data):
+    """The write path before the appender: flock, open, append, close per record."""
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        with open(path, "ab") as fh:
+            fh.write(data)
+
+def make_writer(path, policy, flush_ms):
+    if policy == "legacy":
+        return lambda data: legacy_write(path, data)
+    return appender.Appender(path, durability=policy, flush_ms=flush_ms,
+                             log=rotation.RotatingLog(path, max_bytes=0, max_age=0)).append
+
+def run_writer(path, policy, flush_ms, writer, n):
+    write = make_writer(path, policy, flush_ms)
+    for i in range(n):
+        write(record(writer, i))
+    if policy != "legacy":
+        write.__self__.flush()
+
+def run_case(workdir, policy, flush_ms, kind, count, n):
+    path = os.path.join(workdir, f"bench-{policy}-{flush_ms}-{kind}{count}.jsonl")
+    per = n // count
+    t0 = time.perf_counter()
+    if kind == "p":
+        procs = [multiprocessing.Process(target=run_writer, args=(path, policy, flush_ms, w, per))
+                 for w in range(count)]
+    else:
+        procs = [threading.Thread(target=run_writer, args=(path, policy, flush_ms, w, per)) for w in range(count)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t0
+    return elapsed, verify(path, per * count, count, per)
+
+def verify(path, expected, writers, per):
+    """(intact records, problems): every record decodes, and each writer's sequence is complete and in order."""
+    with open(path, "rb") as fh:
+        records, rest = codec.split_records(fh.read())
+    problems = 1 if rest else 0
+    last = [-1] * writers
+    for raw in records:
+        rec = codec.safe_loads(raw)
+        if not isinstance(rec, dict):
+            problems += 1
+            continue
+        w, seq = rec["meta"]["writer"], rec["meta"]["seq"]
+        if seq != last[w] + 1:
+            problems += 1
+        last[w] = seq
+    if len(records) != expected or any(s != per - 1 for s in last):
+        problems += 1
+    return len(records), problems
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("-n", type=int, default=20000, help="records per case")
+    ap.add_argument("--policies", default="legacy,none,interval,always")
+    ap.add_argument("--flush-ms", default="0,2", help="comma-separated FYP_APPEND_FLUSH_MS values")
+    ap.add_argument("--writers", default="t1,t8,p4", help="t<N> threads or p<N> processes, comma-separated")
+    ap.add_argument("--dir", help="where the logs go (default a temporary directory; fsync cost depends on it)")
+    ap.add_argument("--out", help="report path (default sim/reports/appendbench-<time>.json)")
+    args = ap.parse_args()
+    workdir = args.dir or tempfile.mkdtemp(prefix="fyp-appendbench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    print(f"{'policy':10} {'flush_ms':>8} {'writers':>8} {'records/s':>11} {'us/record':>10} {'intact':>8}")
+    for policy in args.policies.split(","):
+        for flush_ms in [float(x) for x in args.flush_ms.split(",")]:
+            if policy == "legacy" and flush_ms:
+                continue
+            for spec in args.writers.split(","):
+                kind, count = spec[0], int(spec[1:])
+                elapsed, (records, problems) = run_case(workdir, policy, flush_ms, kind, count, args.n)
+                row = {"policy": policy, "flush_ms": flush_ms, "writers": spec, "records": records,
+                       "elapsed_s": round(elapsed, 4), "records_per_s": round(records / elapsed, 1),
+                       "us_per_record": round(elapsed / records * 1e6, 2), "problems": problems}
+                results.append(row)
+                print(f"{policy:10} {flush_ms:8g} {spec:>8} {row['records_per_s']:11.1f} {row['us_per_record']:10.2f} "
+                      f"{'ok' if not problems else str(problems) + ' bad':>8}")
+
+    report = {
+        "tool": "sim/appendbench.py",
+        "version": 1,
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"n": args.n, "dir": workdir, "codec": codec.BACKEND},
+        "results": results,
+    }
+    out = args.out or os.path.join(REPO, "sim", "reports",
+                                   f"appendbench-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as fh:
+        fh.write(codec.dumps_pretty(report) + "\n")
+    print(f"[appendbench] report written to {out}")
+    if any(r["problems"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenAI-compatible /chat/completions API for exercising the LLM backend
+(code/ai_module/llm_backend.py) without network access or an API key.
+
+Completions are canned. The stub can delay each response, fail a share of requests with
+an HTTP status, and be switched at runtime with POST /control {"delay": s, "fail": 0..1,
+"status": code}. GET /stats returns the request and connection counts, which show whether
+keep-alive connections are reused.
+
+    python3 sim/llmstub.py --port 8089 --delay 0.2 --fail 0.1
+    FYP_AI_MODE=api FYP_LLM_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub python3 code/webhook/app.py
+
+--check starts the stub on a free port and drives the backend through it: connection reuse,
+cache hits, shared in-flight requests, the per-request timeout, and the circuit breaker
+opening, short-circuiting, probing half-open and closing again. It exits non-zero on any
+failed check.
+
+    python3 sim/llmstub.py --check
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CANNED = [
+    "Temporary access token: TOK-{n:08x}\nNote: Rotate after use.",
+    "db_backup_user / Backup#{n:04d}\nHost: db-internal-02",
+    "VPN profile for contractors (expires end of quarter)\nGroup key: vpn-{n:06x}",
+]
+
+class StubState:
+    def __init__(self, delay=0.0, fail=0.0, status=500):
+        self.delay = delay
+        self.fail = fail
+        self.status = status
+        self.stats = collections.Counter()
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+            return self.stats[name]
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the backend's pool expects
+
+    def setup(self):
+        super().setup()
+        self.server.state.count("connections")
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client timed out and hung up
+            self.server.state.count("client_gone")
+            self.close_connection = True
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.state.lock:
+                self._send(200, dict(self.server.state.stats))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        state = self.server.state
+        payload = self._body()
+        if self.path.rstrip("/").endswith("/control"):
+            for name in ("delay", "fail", "status"):
+                if isinstance(payload, dict) and name in payload:
+                    setattr(state, name, type(getattr(state, name))(payload[name]))
+            self._send(200, {"delay": state.delay, "fail": state.fail, "status": state.status})
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": "not found"})
+            return
+        n = state.count("requests")
+        if state.delay > 0:
+            time.sleep(state.delay)
+        if payload is None:
+            state.count("bad_requests")
+            self._send(400, {"error": {"message": "invalid JSON"}})
+            return
+        if state.fail > 0 and random.random() < state.fail:
+            state.count("failed")
+            self._send(state.status, {"error": {"message": "stub failure"}})
+            return
+        state.count("completed")
+        text = random.choice(CANNED).format(n=n)
+        self._send(200, {
+            "id": f"chatcmpl-stub-{n}",
+            "object": "chat.completion",
+            "model": (payload or {}).get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        })
+
+def serve(host="127.0.0.1", port=0, **state):
+    """Start the stub in a background thread; returns the server (server.server_port is the port)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**state)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+def check():
+    sys.path.insert(0, os.path.join(REPO, "code", "ai_module"))
+    import llm_backend
+
+    server = serve()
+    state = server.state
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    failed = []
+
+    def expect(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+        if not ok:
+            failed.append(name)
+
+    def backend(**kw):
+        kw.setdefault("breaker", llm_backend.CircuitBreaker(failures=3, reset_timeout=0.5))
+        return llm_backend.LLMBackend(base_url=base_url, api_key="stub", timeout=kw.pop("timeout", 2.0),
+                                      concurrency=4, pool_size=4, **kw)
+
+    # pool: sequential requests share one keep-alive connection
+    b = backend()
+    before = dict(state.stats)
+    for i in range(20):
+        b.generate({"eventid": f"cowrie.pool.{i}"}, "token")
+    requests = state.stats["requests"] - before.get("requests", 0)
+    connections = state.stats["connections"] - before.get("connections", 0)
+    expect("connection reuse", requests == 20 and connections == 1, f"{requests} requests over {connections} connection(s)")
+
+    # cache: a repeated key is served without a request
+    before = state.stats["requests"]
+    text, hit = b.generate({"eventid": "cowrie.pool.3"}, "token")
+    expect("cache hit", hit and state.stats["requests"] == before and b.snapshot()["cache_hits"] >= 1,
+           f"hit={hit}, upstream requests +{state.stats['requests'] - before}")
+
+    # identical keys in flight together share one upstream request
+    state.delay = 0.2
+    before = state.stats["requests"]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: b.generate({"eventid": "cowrie.shared"}, "token"), range(8)))
+    state.delay = 0.0
+    expect("in-flight sharing", state.stats["requests"] - before == 1,
+           f"8 callers, {state.stats['requests'] - before} upstream request(s), coalesced={b.snapshot()['coalesced']}")
+
+    # timeout: a slow upstream fails the call within the timeout
+    b = backend(timeout=0.3, breaker=llm_backend.CircuitBreaker(failures=100))
+    state.delay = 1.0
+    started = time.monotonic()
+    try:
+        b.generate({"eventid": "cowrie.slow"}, "token")
+        expect("timeout", False, "slow request succeeded")
+    except llm_backend.LLMError as e:
+        elapsed = time.monotonic() - started
+        expect("timeout", elapsed < 1.0, f"failed after {elapsed:.2f}s ({e})")
+    state.delay = 0.0
+
+    # breaker: opens after 3 failures, short-circuits, probes half-open, closes on success
+    b = backend()
+    state.fail = 1.0
+    for i in range(3):
+        try:
+            b.generate({"eventid": f"cowrie.fail.{i}"}, "token")
+        except llm_backend.LLMError:
+            pass
+    expect("breaker opens", b.breaker.state == "open", f"state={b.breaker.state} after 3 failures")
+    before = state.stats["requests"]
+    try:
+        b.generate({"eventid": "cowrie.fail.open"}, "token")
+        expect("short circuit", False, "call went through an open breaker")
+    except llm_backend.CircuitOpenError:
+        expect("short circuit", state.stats["requests"] == before, "rejected without a request")
+    time.sleep(0.6)
+    try:
+        b.generate({"eventid": "cowrie.fail.probe"}, "token")
+    except llm_backend.LLMError:
+        pass
+    expect("half-open probe fails -> open", b.breaker.state == "open" and state.stats["requests"] == before + 1,
+           f"state={b.breaker.state}")
+    state.fail = 0.0
+    time.sleep(0.6)
+    b.generate({"eventid": "cowrie.recovered"}, "token")
+    expect("half-open probe succeeds -> closed", b.breaker.state == "closed", f"state={b.breaker.state}")
+
+    server.shutdown()
+    print(f"[llmstub] {'all checks passed' if not failed else str(len(failed)) + ' check(s) failed'}")
+    return 1 if failed else 0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds before each response")
+    ap.add_argument("--fail", type=float, default=0.0, help="share of requests answered with --status")
+    ap.add_argument("--status", type=int, default=500)
+    ap.add_argument("--check", action="store_true", help="run the backend checks against an in-process stub")
+    args = ap.parse_args()
+    if args.check:
+        sys.exit(check())
+    server = serve(args.host, args.port, delay=args.delay, fail=args.fail, status=args.status)
+    print(f"[llmstub] serving http://{args.host}:{server.server_port}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: replays synthetic or recorded Cowrie events against the webhook and
+measures latency from the POST to /cowrie-log until the decision line appears in
+ai_decisions.jsonl and until the executor logs the decoy in decoy_actions.jsonl.
+
+Latency is tracked through probe events. Each probe gets a unique src_ip from 198.18.0.0/15
+(the benchmarking range), so coalescing never holds it back and it can be matched to its
+decision and decoy. The other events share a small pool of attacker IPs, like a real
+brute-force run. Resource usage (CPU, RSS) of the webhook and executor is sampled from
+/proc. A JSON report is written for diffing between releases (--baseline prints the deltas).
+
+    python3 sim/loadtest.py --rate 200 --duration 30 --concurrency 16
+    python3 sim/loadtest.py --events received_logs.json --count 5000 --probe-ratio 0.05
+    python3 sim/loadtest.py --spawn --rate 100 --duration 20 --baseline sim/reports/prev.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import queue
+import random
+import socket
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+import collections
+import urllib.parse
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, "code"))
+from common import codec
+from common.follower import FileFollower
+
+EVENT_MIX = [
+    ("auth.failed", 0.6, {"message": "authentication failed"}),
+    ("session.connect", 0.25, {"username": "root", "message": "login success"}),
+    ("port.scan", 0.15, {"message": "port scan detected"}),
+]
+
+# metrics compared by --baseline: (path in report, higher is better)
+KEY_METRICS = [
+    ("throughput.sent_per_s", True),
+    ("throughput.decisions_per_s", True),
+    ("latency_ms.http.p50", False),
+    ("latency_ms.http.p99", False),
+    ("latency_ms.decision.p50", False),
+    ("latency_ms.decision.p95", False),
+    ("latency_ms.decision.p99", False),
+    ("latency_ms.decoy.p50", False),
+    ("latency_ms.decoy.p95", False),
+    ("latency_ms.decoy.p99", False),
+    ("resources.webhook.cpu_pct_avg", False),
+    ("resources.webhook.rss_mb_max", False),
+    ("resources.executor.cpu_pct_avg", False),
+    ("resources.executor.rss_mb_max", False),
+]
+
+def percentile(sorted_vals, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def summarise(samples_s):
+    vals = sorted(v * 1000.0 for v in samples_s)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "min": round(vals[0], 2),
+        "mean": round(sum(vals) / len(vals), 2),
+        "p50": round(percentile(vals, 50), 2),
+        "p90": round(percentile(vals, 90), 2),
+        "p95": round(percentile(vals, 95), 2),
+        "p99": round(percentile(vals, 99), 2),
+        "max": round(vals[-1], 2),
+    }
+
+def synthetic_events(n_ips, seed):
+    rng = random.Random(seed)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(max(1, n_ips))]
+    names = [m[0] for m in EVENT_MIX]
+    weights = [m[1] for m in EVENT_MIX]
+    extra = {m[0]: m[2] for m in EVENT_MIX}
+    attempts = collections.Counter()
+    while True:
+        eventid = rng.choices(names, weights)[0]
+        ip = rng.choice(ips)
+        ev = {"eventid": eventid, "src_ip": ip}
+        ev.update(extra[eventid])
+        if eventid == "auth.failed":
+            attempts[ip] += 1
+            ev["attempts"] = attempts[ip]
+        yield ev
+
+def recorded_events(path, loop):
+    """Events from a JSONL file of raw Cowrie events or webhook records ({"timestamp", "data"})."""
+    while True:
+        n = 0
+        with open(path, "rb") as fh:
+            for raw, _ in codec.iter_raw(fh):
+                try:
+                    obj = codec.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(obj, dict) and isinstance(obj.get("data"), dict):
+                    obj = obj["data"]
+                if isinstance(obj, dict):
+                    n += 1
+                    yield dict(obj)
+        if not loop or n == 0:
+            return
+
+def probe_ips():
+    # 198.18.0.0/15: 131072 addresses reserved for benchmarking (RFC 2544)
+    for i in range(1, 1 << 17):
+        yield f"198.{18 + (i >> 16)}.{(i >> 8) & 255}.{i & 255}"
+
+class Watcher:
+    """Follows a JSONL log and records when each src_ip first appears in it."""
+
+    def __init__(self, path, field="src_ip"):
+        self.follower = FileFollower(path, start_at_end=True, poll_interval=0.005)
+        self.field = field
+        self.seen = {}
+        self.lines = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            entries = self.follower.read_entries(max_lines=5000)
+            now = time.monotonic()
+            for text, *_ in entries:
+                self.lines += 1
+                try:
+                    key = codec.loads(text).get(self.field)
+                except (ValueError, AttributeError):
+                    continue
+                if key is not None:
+                    self.seen.setdefault(key, now)
+            if not entries:
+                self.follower.wait(0.005)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2)
+        self.follower.close()
+
+class ProcSampler:
+    """CPU% and RSS of named processes, sampled from /proc."""
+
+    def __init__(self, pids, interval=0.5):
+        self.pids = {name: pid for name, pid in pids.items() if pid}
+        self.interval = interval
+        self.samples = collections.defaultdict(list)
+        self._stop = threading.Event()
+        self._tick = os.sysconf("SC_CLK_TCK")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _read(self, pid):
+        with open(f"/proc/{pid}/stat") as fh:
+            fields = fh.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / self._tick
+        rss_kb = 0
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+        return cpu, rss_kb
+
+    def _run(self):
+        last = {}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for name, pid in self.pids.items():
+                try:
+                    cpu, rss = self._read(pid)
+                except (OSError, ValueError, IndexError):
+                    continue
+                if name in last:
+                    t0, c0 = last[name]
+                    self.samples[name].append((100.0 * (cpu - c0) / max(1e-6, now - t0), rss / 1024.0))
+                last[name] = (now, cpu)
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2)
+        out = {}
+        for name, pid in self.pids.items():
+            s = self.samples.get(name) or []
+            out[name] = {
+                "pid": pid,
+                "samples": len(s),
+                "cpu_pct_avg": round(sum(c for c, _ in s) / len(s), 1) if s else None,
+                "cpu_pct_max": round(max(c for c, _ in s), 1) if s else None,
+                "rss_mb_max": round(max(r for _, r in s), 1) if s else None,
+            }
+        return out
+
+def find_pid(script):
+    """PID of a running `python3 .../<script>`, or None."""
+    for d in os.listdir("/proc"):
+        if not d.isdigit() or int(d) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{d}/cmdline", "rb") as fh:
+                argv = os.fsdecode(fh.read()).split("\0")
+            cwd = os.readlink(f"/proc/{d}/cwd")
+        except OSError:
+            continue
+        if any(os.path.normpath(os.path.join(cwd, a)).endswith(script) for a in argv[1:3] if a):
+            return int(d)
+    return None
+
+class Client:
+    """One keep-alive connection per sender thread, reconnecting when the server closes it."""
+
+    def __init__(self, url, timeout):
+        u = urllib.parse.urlsplit(url)
+        self.host, self.port, self.path = u.hostname, u.port or 80, u.path or "/"
+        self.timeout = timeout
+        self.conn = None
+
+    def post(self, path, body):
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                r = self.conn.getresponse()
+                r.read()
+                if r.will_close:
+                    self.conn.close()
+                    self.conn = None
+                return r.status
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+def run_senders(args, events, probes):
+    """Open-loop sender: events are scheduled at --rate and sent by --concurrency threads."""
+    work = queue.Queue(maxsize=args.concurrency * 4)
+    sent = {}  # probe ip -> send time
+    results = collections.Counter()
+    http_lat = []
+    lock = threading.Lock()
+    path = urllib.parse.urlsplit(args.url).path or "/cowrie-log"
+
+    def sender():
+        client = Client(args.url, args.timeout)
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            due, batch = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if args.batch > 1:
+                body, target = "\n".join(json.dumps(e) for e, _ in batch), path.rstrip("/") + "/batch"
+            else:
+                body, target = json.dumps(batch[0][0]), path
+            t0 = time.monotonic()
+            try:
+                status = client.post(target, body)
+            except Exception:
+                status = "error"
+            t1 = time.monotonic()
+            with lock:
+                results[status] += len(batch)
+                http_lat.append(t1 - t0)
+                if status in (200, 202):
+                    for e, probe in batch:
+                        if probe:
+                            sent[e["src_ip"]] = t0
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(max(1, args.concurrency))]
+    for t in threads:
+        t.start()
+
+    start = time.monotonic()
+    interval = args.batch / args.rate if args.rate > 0 else 0.0
+    n = 0
+    rng = random.Random(args.seed + 1)
+    while True:
+        due = start + (n // args.batch) * interval
+        if args.count and n >= args.count:
+            break
+        if args.duration and due - start >= args.duration:
+            break
+        batch = []
+        for _ in range(args.batch):
+            ev = next(events, None)
+            if ev is None:
+                break
+            probe = rng.random() < args.probe_ratio
+            if probe:
+                ev["src_ip"] = next(probes)
+            batch.append((ev, probe))
+        if not batch:
+            break
+        n += len(batch)
+        work.put((due, batch))
+    for _ in threads:
+        work.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    return sent, results, http_lat, n, elapsed
+
+def spawn_pipeline(workdir, port):
+    """Start the webhook and executor against a throwaway HOME; returns {name: Popen}."""
+    env = dict(os.environ, HOME=workdir, FYP_PROJECT_ROOT=os.path.join(workdir, "FYP-Project"),
+               PYTHONUNBUFFERED="1")
+    out = open(os.path.join(workdir, "pipeline.out"), "ab")
+    procs = {"webhook": subprocess.Popen([sys.executable, os.path.join(REPO, "code/webhook/app.py")],
+                                         env=env, stdout=out, stderr=subprocess.STDOUT)}
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    else:
+        for p in procs.values():
+            p.kill()
+        raise SystemExit(f"webhook did not start; see {out.name}")
+    # the executor expects the log directories the webhook creates on startup
+    procs["executor"] = subprocess.Popen([sys.executable, os.path.join(REPO, "code/executor/executor.py")],
+                                         env=env, stdout=out, stderr=subprocess.STDOUT)
+    time.sleep(1.0)
+    return procs
+
+def lookup(report, dotted):
+    cur = report
+    for part in dotted.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur
+
+def compare(report, baseline):
+    lines = [f"{'metric':40} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for key, higher_better in KEY_METRICS:
+        old, new = lookup(baseline, key), lookup(report, key)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            continue
+        change = (new - old) / old * 100.0 if old else 0.0
+        worse = change < 0 if higher_better else change > 0
+        flag = "  !" if worse and abs(change) >= 10 else ""
+        lines.append(f"{key:40} {old:12.2f} {new:12.2f} {change:+8.1f}%{flag}")
+    return "\n".join(lines)
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "-C", REPO, "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", default="http://127.0.0.1:5000/cowrie-log")
+    ap.add_argument("--events", help="JSONL of recorded events (raw Cowrie or received_logs.json); synthetic if omitted")
+    ap.add_argument("--loop", action="store_true", help="replay the recorded file until --count/--duration")
+    ap.add_argument("--rate", type=float, default=50.0, help="events per second (0 = as fast as possible)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds to send for (0 = until --count)")
+    ap.add_argument("--count", type=int, default=0, help="stop after this many events")
+    ap.add_argument("--concurrency", type=int, default=8, help="sender threads")
+    ap.add_argument("--batch", type=int, default=1, help="events per request (>1 uses /cowrie-log/batch)")
+    ap.add_argument("--ips", type=int, default=20, help="attacker IPs in the synthetic stream")
+    ap.add_argument("--probe-ratio", type=float, default=0.1, help="fraction of events used as latency probes")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--timeout", type=float, default=10.0, help="HTTP timeout")
+    ap.add_argument("--drain", type=float, default=30.0, help="seconds to wait for probe decisions/decoys")
+    ap.add_argument("--decisions", help="ai_decisions.jsonl to watch (default under --home)")
+    ap.add_argument("--actions", help="decoy_actions.jsonl to watch (default under --home)")
+    ap.add_argument("--home", default=os.path.expanduser("~"), help="HOME the pipeline runs under")
+    ap.add_argument("--spawn", action="store_true", help="start webhook + executor under a temporary HOME")
+    ap.add_argument("--out", help="report path (default sim/reports/loadtest-<time>.json)")
+    ap.add_argument("--baseline", help="earlier report to compare against")
+    args = ap.parse_args()
+    if not args.duration and not args.count:
+        ap.error("one of --duration or --count is required")
+    args.batch = max(1, args.batch)
+
+    procs = {}
+    if args.spawn:
+        args.home = tempfile.mkdtemp(prefix="fyp-loadtest-")
+        procs = spawn_pipeline(args.home, urllib.parse.urlsplit(args.url).port or 80)
+        print(f"[loadtest] pipeline started under {args.home}")
+    base = os.path.join(args.home, "FYP-Project")
+    decisions = args.decisions or os.path.join(base, "code/ai_module/logs/ai_decisions.jsonl")
+    actions = args.actions or os.path.join(base, "code/executor/decoy_actions.jsonl")
+
+    pids = {name: p.pid for name, p in procs.items()} or {
+        "webhook": find_pid("webhook/app.py"), "executor": find_pid("executor/executor.py")}
+    sampler = ProcSampler(pids)
+    dec_watch = Watcher(decisions)
+    act_watch = Watcher(actions)
+
+    events = recorded_events(args.events, args.loop) if args.events else synthetic_events(args.ips, args.seed)
+    try:
+        sent, results, http_lat, n, elapsed = run_senders(args, events, probe_ips())
+        print(f"[loadtest] sent {n} events in {elapsed:.1f}s; waiting for {len(sent)} probes")
+        deadline = time.monotonic() + args.drain
+        while time.monotonic() < deadline:
+            if all(ip in dec_watch.seen for ip in sent) and (not pids.get("executor") or all(ip in act_watch.seen for ip in sent)):
+                break
+            time.sleep(0.05)
+        drained = time.monotonic() - (deadline - args.drain)
+    finally:
+        dec_watch.stop()
+        act_watch.stop()
+        resources = sampler.stop()
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    dec_lat = [dec_watch.seen[ip] - t for ip, t in sent.items() if ip in dec_watch.seen]
+    act_lat = [act_watch.seen[ip] - t for ip, t in sent.items() if ip in act_watch.seen]
+    accepted = results[200] + results[202]
+    report = {
+        "tool": "sim/loadtest.py",
+        "version": 1,
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_rev": git_rev(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "requests": {
+            "events": n,
+            "accepted": accepted,
+            "rejected_429": results[429],
+            "errors": sum(v for k, v in results.items() if k not in (200, 202, 429)),
+            "status": {str(k): v for k, v in results.items()},
+        },
+        "throughput": {
+            "send_s": round(elapsed, 3),
+            "sent_per_s": round(n / elapsed, 1) if elapsed else None,
+            "accepted_per_s": round(accepted / elapsed, 1) if elapsed else None,
+            "decisions_per_s": round(dec_watch.lines / (elapsed + drained), 1),
+            "decision_lines": dec_watch.lines,
+            "action_lines": act_watch.lines,
+        },
+        "latency_ms": {
+            "http": summarise(http_lat),
+            "decision": summarise(dec_lat),
+            "decoy": summarise(act_lat),
+        },
+        "probes": {
+            "sent": len(sent),
+            "decided": len(dec_lat),
+            "decoyed": len(act_lat),
+            "missing_decision": len(sent) - len(dec_lat),
+            "missing_decoy": len(sent) - len(act_lat),
+        },
+        "resources": resources,
+    }
+
+    out = args.out or os.path.join(REPO, "sim", "reports",
+                                   "loadtest-" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+
+    lat = report["latency_ms"]
+    print(f"[loadtest] {report['throughput']['sent_per_s']} ev/s sent, {accepted} accepted, "
+          f"{results[429]} rejected, {report['requests']['errors']} errors")
+    for name in ("http", "decision", "decoy"):
+        s = lat[name]
+        if s["count"]:
+            print(f"[loadtest] {name:8} n={s['count']:<6} p50={s['p50']}ms p95={s['p95']}ms p99={s['p99']}ms max={s['max']}ms")
+    for name, r in resources.items():
+        print(f"[loadtest] {name:8} cpu avg={r['cpu_pct_avg']}% max={r['cpu_pct_max']}% rss max={r['rss_mb_max']}MB")
+    print(f"[loadtest] report written to {out}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            print(compare(report, json.load(fh)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the decision hot path: safe_response, random_template, local_generate,
+write_decision and the full decide(), plus the primitives they lean on (hashing,
+mimetypes, JSON encoding). The redaction engine is compared with the legacy per-term
+safe_response scan at 6 and 500 indicators, and common/codec.py with the stdlib json it
+replaces. Everything runs in-process against a throwaway HOME, so the real logs are never
+touched.
+
+decide() runs with FYP_PROFILE=1, and its per-stage histogram is printed after the
+timings, which shows where a decision's time goes. A JSON report is written for diffing
+between releases (--baseline prints the deltas).
+
+    python3 sim/microbench.py
+    python3 sim/microbench.py -n 20000 --only safe_response_20k,local_generate
+    python3 sim/microbench.py --baseline sim/reports/microbench-prev.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import datetime
+import platform
+import mimetypes
+import contextlib
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_env(workdir, templates):
+    """Point every path the AI module derives from HOME / FYP_* at `workdir`; call before importing it."""
+    os.environ["HOME"] = workdir
+    os.environ["FYP_PROJECT_ROOT"] = os.path.join(workdir, "FYP-Project")
+    os.environ["FYP_PROFILE"] = "1"
+    os.environ.setdefault("FYP_ROTATE_MAX_BYTES", "0")
+    tpl_dir = os.path.join(workdir, "FYP-Project", "config", "templates")
+    os.makedirs(tpl_dir, exist_ok=True)
+    cats = ["auth.failed", "session", "port", "generic"]
+    for i in range(templates):
+        with open(os.path.join(tpl_dir, f"{cats[i % len(cats)]}_bench_{i:03d}.tpl"), "w") as fh:
+            fh.write(f"Template {i}\n" + "lorem ipsum dolor sit amet\n" * 20)
+    os.environ["FYP_TEMPLATE_DIR"] = tpl_dir
+    sys.path.insert(0, os.path.join(REPO, "code"))
+    sys.path.insert(0, os.path.join(REPO, "code", "ai_module"))
+
+def timed(fn, n, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(n):
+        t0 = clock()
+        fn()
+        samples.append(clock() - t0)
+    samples.sort()
+    total = sum(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] / 1000.0
+    return {
+        "n": n,
+        "ops_per_s": round(n / (total / 1e9), 1),
+        "mean_us": round(total / n / 1000.0, 2),
+        "p50_us": round(pick(0.50), 2),
+        "p90_us": round(pick(0.90), 2),
+        "p99_us": round(pick(0.99), 2),
+        "max_us": round(samples[-1] / 1000.0, 2),
+    }
+
+def legacy_safe_response(text, banned):
+    """safe_response before the compiled engine: one lowercase + `in` scan per term."""
+    if text is None:
+        return ""
+    s = str(text)
+    for b in banned:
+        if b.lower() in s.lower():
+            return "[REDACTED: sensitive content]"
+    return s
+
+def indicator_set(n, rng):
+    """`n` synthetic indicators: mostly literals (hostnames, key names) plus some token regexes."""
+    literals = [f"{rng.choice(['db', 'vault', 'ci', 'ldap', 'jump'])}{i}.corp.internal" if i % 2 else f"svc_key_{i:04d}"
+                for i in range(n - n // 10)]
+    regexes = [rf"tok{i}_[a-z0-9]{{24}}" for i in range(n // 10)]
+    return literals, regexes
+
+def build_benchmarks(gen):
+    rng = random.Random(7)
+    short_text = "Generated admin note: rotate the API keys after lockout. Contact it-admin@corp.local.\n" * 3
+    long_text = ("Internal change log entry with benign content and dummy identifiers. " * 300)
+    hit_text = long_text + " -----BEGIN dummy block"
+    events = [{"eventid": rng.choice(["auth.failed", "session.connect", "port.scan"]),
+               "src_ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"}
+              for _ in range(4096)]
+    counter = iter(range(1 << 62))
+    ev = lambda: events[next(counter) % len(events)]
+    rec = gen.decide({"eventid": "auth.failed", "src_ip": "10.0.0.1"})
+    sample_resp = gen.local_generate({"eventid": "auth.failed", "src_ip": "10.0.0.2"})
+    import redaction
+    lits, rxs = indicator_set(500, rng)
+    terms_500 = redaction.BUILTIN_TERMS + lits
+    whole_500 = redaction.Redactor(redaction.BUILTIN_TERMS + lits, rxs, mode="whole")
+    mask_500 = redaction.Redactor(redaction.BUILTIN_TERMS + lits, rxs, mode="mask")
+    builtin = redaction.BUILTIN_TERMS
+    from common import codec
+    line = json.dumps(rec)
+    framed = codec.frame(rec)
+
+    return {
+        "md5_gen_id": lambda: hashlib.md5(b"10.0.0.1abcdef1700000000.123").hexdigest()[:8],
+        "sha1_token": lambda: hashlib.sha1(b"10.0.0.1deadbeef").hexdigest()[:8],
+        "mimetypes_guess": lambda: mimetypes.guess_type("create_decoy_file_10.0.0.1_20250101000000_abcd1234.txt"),
+        "json_compact": lambda: json.dumps(rec),
+        "json_pretty": lambda: json.dumps(rec, indent=2),
+        "json_loads": lambda: json.loads(line),
+        "codec_dumps": lambda: codec.encode_record(rec, "jsonl"),
+        "codec_pretty": lambda: codec.dumps_pretty(rec),
+        "codec_loads": lambda: codec.loads(line),
+        "codec_frame": lambda: codec.frame(rec),
+        "codec_frame_loads": lambda: codec.loads(framed),
+        "safe_response_short": lambda: gen.safe_response(short_text),
+        "safe_response_20k": lambda: gen.safe_response(long_text),
+        "safe_response_20k_hit": lambda: gen.safe_response(hit_text),
+        "legacy_safe_response_short": lambda: legacy_safe_response(short_text, builtin),
+        "legacy_safe_response_20k": lambda: legacy_safe_response(long_text, builtin),
+        "legacy_redact_500_20k": lambda: legacy_safe_response(long_text, terms_500),
+        "redact_500_whole_20k": lambda: whole_500.redact(long_text),
+        "redact_500_mask_20k": lambda: mask_500.redact(long_text),
+        "random_template": lambda: gen.random_template(ev()["eventid"]),
+        "local_generate": lambda: gen.local_generate(ev()),
+        "local_generate_same_ip": lambda: gen.local_generate({"eventid": "auth.failed", "src_ip": "10.9.9.9"}),
+        "write_decision": lambda: gen.write_decision(ev(), dict(sample_resp, meta=dict(sample_resp["meta"]))),
+        "decide": lambda: gen.decide(ev()),
+    }
+
+def compare(report, baseline):
+    lines = [f"{'benchmark':28} {'base p50 us':>12} {'p50 us':>10} {'change':>9}"]
+    for name, cur in report["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if not old or not old.get("p50_us"):
+            continue
+        change = (cur["p50_us"] - old["p50_us"]) / old["p50_us"] * 100.0
+        flag = "  !" if change >= 10 else ""
+        lines.append(f"{name:28} {old['p50_us']:12.2f} {cur['p50_us']:10.2f} {change:+8.1f}%{flag}")
+    return "\n".join(lines)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("-n", type=int, default=5000, help="iterations per benchmark")
+    ap.add_argument("--warmup", type=int, default=200)
+    ap.add_argument("--templates", type=int, default=40, help="templates in the benchmark registry")
+    ap.add_argument("--only", help="comma-separated benchmark names")
+    ap.add_argument("--out", help="report path (default sim/reports/microbench-<time>.json)")
+    ap.add_argument("--baseline", help="earlier report to compare against")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fyp-microbench-")
+    setup_env(workdir, args.templates)
+    import generate_deception_action as gen
+    from common import codec, profiling
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        benches = build_benchmarks(gen)
+    selected = args.only.split(",") if args.only else list(benches)
+    unknown = [b for b in selected if b not in benches]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}; choose from {', '.join(benches)}")
+
+    results = {}
+    stages = {}
+    # write_decision / decide print every decision; keep that cost but not the terminal output
+    with open(os.devnull, "w") as devnull:
+        for name in selected:
+            profiling.histograms.reset()
+            with contextlib.redirect_stdout(devnull):
+                results[name] = timed(benches[name], args.n, args.warmup)
+            if name == "decide":
+                stages = profiling.histograms.snapshot()
+            print(f"{name:28} {results[name]['ops_per_s']:>12.0f} ops/s  p50 {results[name]['p50_us']:>9.2f} us"
+                  f"  p99 {results[name]['p99_us']:>9.2f} us")
+    if stages:
+        print("\ndecide() stages (FYP_PROFILE histograms, ms):")
+        total = stages.get("total", {}).get("mean_ms") or 0
+        for stage, h in sorted(stages.items(), key=lambda kv: -(kv[1]["mean_ms"] or 0)):
+            share = f"{100.0 * h['mean_ms'] / total:5.1f}%" if total and stage != "total" else "      "
+            print(f"  {stage:18} mean {h['mean_ms']:8.4f}  p50<={h['p50_ms']}  p99<={h['p99_ms']}  {share}")
+
+    report = {
+        "tool": "sim/microbench.py",
+        "version": 1,
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"n": args.n, "warmup": args.warmup, "templates": args.templates,
+                   "codec": codec.BACKEND, "frame_payload": codec.PACK_TAG.decode()},
+        "benchmarks": results,
+        "decide_stages": {k: {f: v[f] for f in ("count", "mean_ms", "p50_ms", "p90_ms", "p99_ms")}
+                          for k, v in stages.items()},
+    }
+    out = args.out or os.path.join(REPO, "sim", "reports",
+                                   "microbench-" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(f"\nreport written to {out}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            print(compare(report, json.load(fh)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Offline replay: runs recorded events through coalescing and local_generate at full speed,
+once per decision policy, and reports per-policy aggregates for comparison.
+
+Input is received_logs.json (its closed rotation segments included), a single segment
+archive (.gz/.zst), or a JSONL of raw Cowrie events. Events are sharded by src_ip so that
+every attacker's events are decided in log order by one worker of a process pool. Event
+timestamps drive the coalescing windows and attacker heat instead of the wall clock. The
+RNG is seeded per (seed, src_ip, decision number), so a run gives the same decisions for
+the same input and seed, whatever the worker count.
+
+A policy is a name plus FYP_* overrides applied in its workers, e.g.
+    --policy current --policy strict:FYP_COALESCE_WINDOW=120,FYP_COALESCE_DECOY_RATE=2
+Decisions go to <out>/<policy>.jsonl and the aggregates to <out>/summary.json. Nothing is
+written to the live logs, counters or history.
+
+    python3 sim/replay.py ~/FYP-Project/code/webhook/received_logs.json
+    python3 sim/replay.py archive.jsonl.gz --workers 8 --seed 7 --policy a --policy b:FYP_ATTACKER_HEAT_HALF_LIFE=300
+"""
+
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+import datetime
+import platform
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, "code"))
+from common import codec, history, procstats, rotation
+
+DEFAULT_SHARDS = 64
+
+_worker = {}
+
+def read_events(paths, limit=0):
+    """(epoch seconds, event) in log order; records without a timestamp reuse the previous one."""
+    n = 0
+    ts = 0.0
+    for path in paths:
+        if path.endswith((".gz", ".zst")):
+            def records(p=path):
+                with rotation.open_segment(p) as fh:
+                    for raw, _ in codec.iter_raw(fh):
+                        yield raw
+        else:
+            records = lambda p=path: rotation.iter_lines(p)
+        for raw in records():
+            obj = codec.safe_loads(raw)
+            if not isinstance(obj, dict):
+                continue
+            data = obj.get("data") if isinstance(obj.get("data"), dict) else obj
+            ts = history.parse_ts(obj.get("timestamp")) or history.parse_ts(data.get("timestamp")) or ts
+            yield ts, data
+            n += 1
+            if limit and n >= limit:
+                return
+
+def shard_of(event, shards):
+    return zlib.crc32(str(event.get("src_ip", "")).encode("utf-8", errors="replace")) % shards
+
+def parse_policy(spec):
+    name, _, overrides = spec.partition(":")
+    env = {}
+    for item in filter(None, overrides.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep or not key.startswith("FYP_"):
+            raise ValueError(f"policy {name}: expected FYP_NAME=value, got {item!r}")
+        env[key] = value
+    return name, env
+
+def init_worker(env, seed):
+    """Apply the policy's overrides before the decision modules read their settings."""
+    os.environ.update(env)
+    # replays are local and leave no snapshot behind; LLM output is not reproducible
+    os.environ["FYP_AI_MODE"] = "local"
+    os.environ["FYP_ATTACKER_SNAPSHOT"] = ""
+    os.environ["FYP_DECOY_POOL"] = "0"
+    sys.path.insert(0, os.path.join(REPO, "code", "webhook"))
+    sys.path.insert(0, os.path.join(REPO, "code", "ai_module"))
+    import generate_deception_action
+    import attacker_state
+    import coalesce
+    _worker.update(gen=generate_deception_action, attackers=attacker_state, coalesce=coalesce, seed=seed)
+
+def replay_shard(events):
+    """Decisions for one shard (every event of its attackers, in log order) and its coalescing stats."""
+    gen = _worker["gen"]
+    seed = _worker["seed"]
+    # a fresh attacker store per shard keeps the result independent of which worker ran it
+    _worker["attackers"]._store = _worker["attackers"].AttackerStore(snapshot_path="")
+    clock = [0.0]
+    decided = collections.Counter()
+    out = []
+
+    def decide(ev):
+        ip = ev.get("src_ip")
+        decided[ip] += 1
+        random.seed(f"{seed}:{ip}:{decided[ip]}")
+        resp = gen.local_generate(ev, now=clock[0])
+        meta = resp["meta"]
+        attacker = meta.get("attacker") or {}
+        out.append({
+            "ts": clock[0],
+            "src_ip": ip,
+            "eventid": resp["incoming_eventid"],
+            "selected_action": resp["selected_action"],
+            "confidence": resp["confidence"],
+            "engage_duration_min": meta["engage_duration_min"],
+            "template": meta["template_file"],
+            "prompt": resp["prompt"],
+            "level": attacker.get("level", 0),
+            "escalated": attacker.get("escalated", False),
+            "coalesced": (ev.get("coalesced") or {}).get("count", 1),
+            "redacted": gen.safe_response(resp["text"]) != resp["text"],
+        })
+
+    coalescer = _worker["coalesce"].Coalescer(decide, background=False)
+    last_flush = None
+    for ts, event in events:
+        clock[0] = ts
+        # the live flusher runs about once a second
+        if coalescer.window > 0 and (last_flush is None or ts - last_flush >= 1.0):
+            coalescer.flush(now=ts)
+            last_flush = ts
+        coalescer.offer(event, now=ts)
+    # let held events out as the windows and token buckets would have over time
+    step = max(coalescer.window, 1.0)
+    for _ in range(10000):
+        if not coalescer.stats()["held"]:
+            break
+        clock[0] += step
+        coalescer.flush(now=clock[0])
+    return out, coalescer.stats()
+
+def distribution(values):
+    vals = sorted(values)
+    if not vals:
+        return {"count": 0}
+    pick = lambda q: vals[min(len(vals) - 1, int(q * len(vals)))]
+    return {"count": len(vals), "mean": round(sum(vals) / len(vals), 3), "min": vals[0], "p50": pick(0.5),
+            "p90": pick(0.9), "p99": pick(0.99), "max": vals[-1]}
+
+def histogram(values, width):
+    counts = collections.Counter(int(v // width) for v in values)
+    return {f"{k * width:g}-{(k + 1) * width:g}": counts[k] for k in sorted(counts)}
+
+# coalescer stats that add up across shards; the rest (window, rate, burst) are the policy's settings
+COALESCE_COUNTERS = ("received", "emitted", "coalesced_events", "rate_limited", "evicted_emitted", "keys", "held")
+
+def aggregate(records, events, shard_stats, elapsed):
+    decoys = collections.Counter(r["src_ip"] for r in records if r["selected_action"] == "create_decoy_file")
+    confidence = [r["confidence"] for r in records]
+    engage = [r["engage_duration_min"] for r in records]
+    # every shard ran the same policy, so its settings are reported once
+    settings = {k: v for k, v in (shard_stats[0] if shard_stats else {}).items() if k not in COALESCE_COUNTERS}
+    return {
+        "events": events,
+        "decisions": len(records),
+        "attackers": len({r["src_ip"] for r in records}),
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(events / elapsed, 1) if elapsed else None,
+        "decisions_per_s": round(len(records) / elapsed, 1) if elapsed else None,
+        "decoys_per_attacker": distribution(decoys.values()),
+        "confidence": dict(distribution(confidence), histogram=histogram(confidence, 0.05)),
+        "engage_duration_min": dict(distribution(engage), histogram=histogram(engage, 5)),
+        "escalated": sum(1 for r in records if r["escalated"]),
+        "redacted": sum(1 for r in records if r["redacted"]),
+        "by_level": dict(collections.Counter(r["level"] for r in records)),
+        "by_eventid": dict(collections.Counter(r["eventid"] for r in records).most_common(20)),
+        "templates": dict(collections.Counter(r["template"] for r in records).most_common(20)),
+        "coalesce": dict(settings, **procstats.merge([{k: st.get(k, 0) for k in COALESCE_COUNTERS}
+                                                      for st in shard_stats])),
+    }
+
+def run_policy(name, env, shards, args):
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=init_worker,
+                             initargs=(env, args.seed)) as pool:
+        results = list(pool.map(replay_shard, shards))
+    elapsed = time.perf_counter() - t0
+    records = [r for recs, _ in results for r in recs]
+    path = os.path.join(args.out, f"{name}.jsonl")
+    with open(path, "wb") as fh:
+        fh.write(codec.encode_records(records))
+    summary = aggregate(records, sum(len(s) for s in shards), [st for _, st in results], elapsed)
+    return dict(summary, overrides=env, output=path)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("inputs", nargs="+", help="received_logs.json, a segment archive or a raw Cowrie JSONL")
+    ap.add_argument("--policy", action="append", default=[], help="name[:FYP_X=v,FYP_Y=w] (repeatable)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="src_ip partitions handed to the pool")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--limit", type=int, default=0, help="replay only the first N events")
+    ap.add_argument("--out", help="output directory (default sim/reports/replay-<time>)")
+    args = ap.parse_args()
+    try:
+        policies = [parse_policy(p) for p in args.policy or ["current"]]
+    except ValueError as e:
+        ap.error(str(e))
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    args.out = args.out or os.path.join(REPO, "sim", "reports", f"replay-{stamp}")
+    os.makedirs(args.out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    shards = [[] for _ in range(max(1, args.shards))]
+    for ts, event in read_events(args.inputs, args.limit):
+        shards[shard_of(event, len(shards))].append((ts, event))
+    n = sum(len(s) for s in shards)
+    print(f"[replay] read {n} events in {time.perf_counter() - t0:.1f}s")
+    if not n:
+        return
+
+    report = {
+        "tool": "sim/replay.py",
+        "version": 1,
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"inputs": args.inputs, "workers": args.workers, "shards": args.shards, "seed": args.seed,
+                   "limit": args.limit},
+        "policies": {},
+    }
+    print(f"{'policy':16} {'decisions':>9} {'events/s':>10} {'decoys/att':>10} {'p90':>5} "
+          f"{'conf':>6} {'engage p50':>10} {'p90':>6}")
+    for name, env in policies:
+        s = report["policies"][name] = run_policy(name, env, shards, args)
+        print(f"{name:16} {s['decisions']:9d} {s['events_per_s']:10.1f} {s['decoys_per_attacker'].get('mean', 0):10.2f} "
+              f"{s['decoys_per_attacker'].get('p90', 0):5} {s['confidence'].get('mean', 0):6.3f} "
+              f"{s['engage_duration_min'].get('p50', 0):10} {s['engage_duration_min'].get('p90', 0):6}")
+    with open(os.path.join(args.out, "summary.json"), "w") as fh:
+        fh.write(codec.dumps_pretty(report) + "\n")
+    print(f"[replay] decisions and summary.json in {args.out}")
+
+if __name__ == "__main__":
+    main()